@@ -8,15 +8,22 @@ import os
 import json
 import shutil
 import uuid
+import time
 import socket
+import threading
+import mimetypes
+try:
+    import fcntl
+except ImportError:  # Windows：没有平滑重载，不需要后台服务锁
+    fcntl = None
 from datetime import datetime
-from flask import Flask, render_template, request, send_file, jsonify
-from werkzeug.exceptions import RequestEntityTooLarge
 from urllib.parse import quote
+from flask import Flask, Response, render_template, request, send_file, jsonify, url_for
+from werkzeug.exceptions import RequestEntityTooLarge
 import config
 
 # 导入自定义模块
-from src import utils, path_utils, file_info, file_tree, search, pdf_utils
+from src import utils, path_utils, file_info, file_tree, search, pdf_utils, metadata_index, watcher, thumbnail, chunked_upload, http_utils, pdf_cache, content_index, name_index, storage_stats, trash, jobs, zip_stream, blob_store, text_preview, log_follow, compression, assets
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = config.MAX_CONTENT_LENGTH
@@ -26,6 +33,391 @@ app.config['SECRET_KEY'] = config.SECRET_KEY
 # 确保上传目录存在
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# 回收站目录（回收站条目的原始路径和名称，启动时迁移旧的 .meta 文件）
+TRASH_FOLDER = os.path.join(app.config['UPLOAD_FOLDER'], '.trash')
+trash_catalog = trash.TrashCatalog(config.TRASH_CATALOG, TRASH_FOLDER)
+
+# 元数据索引（文件树、搜索、统计直接查询索引）
+metadata_db = metadata_index.MetadataIndex(config.INDEX_DATABASE, app.config['UPLOAD_FOLDER'],
+                                           trash_lookup=trash_catalog.get)
+
+# 内存文件名索引（由元数据索引的变更通知维护）
+name_db = name_index.NameIndex(regex_timeout=config.SEARCH_REGEX_TIMEOUT)
+
+# 存储统计（由元数据索引的变更通知增量维护）
+stats = storage_stats.StorageStats()
+
+# 全文内容索引（后台线程增量更新）
+content_db = content_index.ContentIndex(config.CONTENT_INDEX_DATABASE, app.config['UPLOAD_FOLDER'],
+                                        max_file_size=config.CONTENT_INDEX_MAX_FILE_SIZE,
+                                        chunk_size=config.CONTENT_INDEX_CHUNK_SIZE)
+
+# 缩略图生成与缓存
+thumbnails = thumbnail.ThumbnailService(config.THUMBNAIL_CACHE_FOLDER, config.THUMBNAIL_CACHE_MAX_SIZE,
+                                        workers=config.THUMBNAIL_WORKERS, quality=config.THUMBNAIL_QUALITY)
+
+# PDF转JPG（转换结果缓存，同一PDF的并发请求共享一次转换）
+pdf_converter = pdf_cache.PdfConverter(config.PDF_CACHE_FOLDER, config.PDF_CACHE_MAX_SIZE,
+                                       dpi=config.PDF_DPI, quality=config.PDF_JPEG_QUALITY,
+                                       batch_size=config.PDF_BATCH_PAGES, workers=config.PDF_WORKERS)
+
+# 大文本文件分页预览（行索引按LRU缓存）
+text_pages = text_preview.TextPreview(max_indexes=config.TEXT_PREVIEW_INDEX_CACHE, max_lines=config.TEXT_PREVIEW_MAX_LINES,
+                                      max_bytes=config.TEXT_PREVIEW_MAX_BYTES,
+                                      max_line_bytes=config.TEXT_PREVIEW_MAX_LINE_BYTES)
+
+# 日志跟随（同一文件的所有订阅者共享一个后台检查）
+log_followers = log_follow.FollowManager(poll_interval=config.FOLLOW_POLL_INTERVAL,
+                                         buffer_bytes=config.FOLLOW_BUFFER_BYTES,
+                                         max_streams=config.FOLLOW_MAX_STREAMS)
+
+# 去重存储（内容相同的上传文件只保存一份，路径为硬链接），未启用时为None
+dedup_store = blob_store.BlobStore(config.BLOB_FOLDER, min_size=config.DEDUP_MIN_SIZE) if config.DEDUP_ENABLED else None
+
+# 后台删除任务（清空回收站、永久删除文件夹，重启后继续；删除完成后唤醒去重存储回收不再引用的数据）
+purge_jobs = jobs.JobManager(config.JOB_FOLDER, workers=config.JOB_DELETE_WORKERS,
+                             on_finished=(lambda job: dedup_store.request_collect()) if dedup_store else None)
+
+# 响应压缩（文件树、搜索结果、文本预览等JSON和文本响应），未启用时为None
+compressor = compression.ResponseCompressor(encodings=config.COMPRESSION_ENCODINGS, levels=config.COMPRESSION_LEVELS,
+                                            min_size=config.COMPRESSION_MIN_SIZE,
+                                            stream_size=config.COMPRESSION_STREAM_SIZE) if config.COMPRESSION_ENABLED else None
+
+# 构建后的静态资源（带内容哈希的JS/CSS，python build_assets.py 生成）
+asset_manifest = assets.AssetManifest(app.static_folder, os.path.join(app.root_path, config.ASSET_BUILD_FOLDER))
+
+# 分片上传（断点续传）
+chunked_uploads = chunked_upload.ChunkedUploadManager(config.UPLOAD_TEMP_FOLDER, chunk_size=config.UPLOAD_CHUNK_SIZE,
+                                                      expire_seconds=config.UPLOAD_SESSION_EXPIRE,
+                                                      blob_store=dedup_store)
+
+
+# ==================== 索引维护 ====================
+
+def index_refresh(*rel_paths):
+    """磁盘上的条目新增或修改后，同步刷新元数据索引，并登记全文索引更新"""
+    for rel_path in rel_paths:
+        try:
+            metadata_db.refresh(rel_path)
+        except Exception as e:
+            app.logger.warning(f'刷新索引失败 {rel_path}: {e}')
+    content_db.schedule(*rel_paths)
+
+
+def index_remove(*rel_paths):
+    """条目从磁盘上移走后，同步从元数据索引中删除，并登记全文索引更新"""
+    for rel_path in rel_paths:
+        try:
+            metadata_db.remove(rel_path)
+        except Exception as e:
+            app.logger.warning(f'删除索引失败 {rel_path}: {e}')
+    content_db.schedule(*rel_paths)
+
+
+def apply_fs_changes(changes):
+    """处理文件系统监听到的变化（包括绕过Web界面直接写入上传目录的修改）"""
+    for kind, rel_path in changes:
+        if kind == watcher.REMOVED:
+            index_remove(rel_path)
+        else:
+            index_refresh(rel_path)
+
+
+def load_indexes():
+    """订阅元数据索引的变更以维护文件名索引和存储统计，然后做启动校对扫描"""
+    metadata_db.add_listener(name_db.apply)
+    metadata_db.add_listener(stats.apply)
+    metadata_db.reconcile()
+
+
+fs_watcher = None
+# 后台服务锁文件，持有期间保持打开，进程退出时由系统释放
+server_lock = None
+
+
+def acquire_server_lock(blocking):
+    """
+    获取后台服务锁（SERVER_LOCK_FILE 上的排他锁）
+
+    Args:
+        blocking: 是否等待其他进程释放
+
+    Returns:
+        bool: 是否获得
+    """
+    global server_lock
+    if fcntl is None:
+        return True
+    lock_dir = os.path.dirname(config.SERVER_LOCK_FILE)
+    if lock_dir:
+        os.makedirs(lock_dir, exist_ok=True)
+    lock_file = open(config.SERVER_LOCK_FILE, 'a')
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return False
+    server_lock = lock_file
+    return True
+
+
+def start_background_services():
+    """
+    启动后台服务：文件系统监听、元数据索引的启动校对扫描、文件名索引、存储统计、全文索引、未完成的删除任务和去重存储回收
+
+    平滑重载时旧工作进程在处理完当前请求之前仍在运行后台服务，新工作进程等它退出、释放锁之后再启动，
+    避免两个进程同时监听、写索引和执行删除任务
+    """
+    if acquire_server_lock(blocking=False):
+        run_background_services()
+        return
+    app.logger.warning('后台服务锁被其他进程持有（平滑重载中的旧工作进程），等待其退出后启动后台服务')
+
+    def wait_and_start():
+        acquire_server_lock(blocking=True)
+        app.logger.info('已获得后台服务锁，启动后台服务')
+        run_background_services()
+
+    threading.Thread(target=wait_and_start, name='server-lock', daemon=True).start()
+
+
+def run_background_services():
+    global fs_watcher
+    # 先启动监听，校对扫描期间发生的变化会在扫描完成后回放
+    try:
+        fs_watcher = watcher.create_watcher(app.config['UPLOAD_FOLDER'], mode=config.WATCHER_MODE,
+                                            poll_interval=config.WATCHER_POLL_INTERVAL,
+                                            debounce=config.WATCHER_DEBOUNCE)
+        if fs_watcher:
+            fs_watcher.add_listener(apply_fs_changes)
+            fs_watcher.add_listener(lambda changes: log_followers.wake())
+            fs_watcher.start()
+    except Exception as e:
+        app.logger.warning(f'启动文件系统监听失败: {e}')
+    threading.Thread(target=load_indexes, name='index-reconcile', daemon=True).start()
+    stats.start(metadata_db, config.STATS_RECONCILE_INTERVAL)
+    content_db.start()
+    purge_jobs.resume()
+    if dedup_store:
+        dedup_store.start(config.BLOB_GC_INTERVAL)
+
+
+# ==================== 条目操作（单个和批量接口共用） ====================
+
+class OperationError(Exception):
+    """单个条目的操作失败，status 为建议返回的HTTP状态码"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def move_entry(source_path, target_folder):
+    """
+    把文件或文件夹移动到目标文件夹并更新索引
+
+    Returns:
+        str: 移动后的相对路径
+
+    Raises:
+        OperationError: 路径无效、不存在或目标位置已有同名条目
+    """
+    if not source_path:
+        raise OperationError('源路径不能为空')
+    
+    source_full = os.path.join(app.config['UPLOAD_FOLDER'], source_path)
+    if not path_utils.get_relative_path(source_full, app.config['UPLOAD_FOLDER']):
+        raise OperationError('无效的源路径')
+    
+    if not os.path.exists(source_full):
+        raise OperationError('源文件或文件夹不存在', 404)
+    
+    item_name = os.path.basename(source_path)
+    
+    if target_folder:
+        if source_path.startswith(target_folder + '/') or source_path == target_folder:
+            raise OperationError('不能移动到自己的子文件夹中')
+        
+        target_full = os.path.join(app.config['UPLOAD_FOLDER'], target_folder, item_name)
+        new_rel_path = os.path.join(target_folder, item_name)
+        if not path_utils.get_relative_path(target_full, app.config['UPLOAD_FOLDER']):
+            raise OperationError('无效的目标路径')
+        os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], target_folder), exist_ok=True)
+    else:
+        target_full = os.path.join(app.config['UPLOAD_FOLDER'], item_name)
+        new_rel_path = item_name
+    
+    if os.path.exists(target_full):
+        raise OperationError('目标位置已存在同名文件或文件夹')
+    
+    shutil.move(source_full, target_full)
+    index_remove(source_path)
+    index_refresh(new_rel_path)
+    return new_rel_path
+
+
+def trash_entry(item_path):
+    """
+    把文件或文件夹移入回收站并更新索引
+
+    Returns:
+        str: 回收站条目的 undo_id
+
+    Raises:
+        OperationError: 路径无效或不存在
+    """
+    if not item_path:
+        raise OperationError('路径不能为空')
+    
+    itempath = os.path.join(app.config['UPLOAD_FOLDER'], item_path)
+    
+    if not path_utils.get_relative_path(itempath, app.config['UPLOAD_FOLDER']):
+        raise OperationError('无效的路径')
+    
+    if not os.path.exists(itempath):
+        raise OperationError('文件或文件夹不存在', 404)
+    
+    # 移动到临时目录（用于撤销）
+    os.makedirs(TRASH_FOLDER, exist_ok=True)
+    
+    undo_id = str(uuid.uuid4())
+    temp_path = os.path.join(TRASH_FOLDER, undo_id)
+    
+    # 先把原始信息登记到回收站目录
+    metadata = {
+        'original_path': item_path,
+        'original_name': os.path.basename(itempath),
+        'is_dir': os.path.isdir(itempath),
+        'deleted_at': datetime.now().isoformat()
+    }
+    trash_catalog.add(undo_id, metadata)
+    
+    try:
+        shutil.move(itempath, temp_path)
+    except Exception:
+        trash_catalog.remove(undo_id)
+        raise
+    index_remove(item_path)
+    index_refresh(f'.trash/{undo_id}')
+    return undo_id
+
+
+def restore_entry(undo_id):
+    """
+    把回收站条目恢复到原始位置并更新索引
+
+    Returns:
+        str: 恢复后的相对路径
+
+    Raises:
+        OperationError: 条目或元数据不存在，或原始位置已被占用
+    """
+    if not undo_id:
+        raise OperationError('参数不完整')
+    
+    temp_path = os.path.join(TRASH_FOLDER, undo_id)
+    
+    if not os.path.exists(temp_path):
+        raise OperationError('文件不存在', 404)
+    
+    metadata = trash_catalog.get(undo_id)
+    if metadata is None:
+        raise OperationError('元数据不存在', 404)
+    
+    original_path = metadata.get('original_path', '')
+    if not original_path:
+        raise OperationError('原始路径信息缺失')
+    
+    restore_path = os.path.join(app.config['UPLOAD_FOLDER'], original_path)
+    
+    parent_dir = os.path.dirname(restore_path)
+    if parent_dir:
+        os.makedirs(parent_dir, exist_ok=True)
+    
+    if os.path.exists(restore_path):
+        raise OperationError('目标位置已存在同名文件或文件夹')
+    
+    shutil.move(temp_path, restore_path)
+    trash_catalog.remove(undo_id)
+    index_remove(f'.trash/{undo_id}')
+    index_refresh(original_path)
+    return original_path
+
+
+# ==================== 上传辅助 ====================
+
+def resolve_upload_path(filename, target_folder=''):
+    """
+    确定上传文件的保存位置（目标文件夹不存在时创建，同名文件已存在时添加时间戳）
+
+    Returns:
+        tuple: (文件绝对路径, 相对路径)
+    """
+    filename = utils.safe_filename(filename)
+    target_path = app.config['UPLOAD_FOLDER']
+    if target_folder:
+        target_path = os.path.join(app.config['UPLOAD_FOLDER'], target_folder)
+        if not path_utils.get_relative_path(target_path, app.config['UPLOAD_FOLDER']):
+            raise ValueError('无效的文件夹路径')
+    os.makedirs(target_path, exist_ok=True)
+
+    # 如果文件已存在，添加时间戳
+    if os.path.exists(os.path.join(target_path, filename)):
+        name, ext = os.path.splitext(filename)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"{name}_{timestamp}{ext}"
+
+    filepath = os.path.join(target_path, filename)
+    rel_path = os.path.join(target_folder, filename) if target_folder else filename
+    return filepath, rel_path
+
+
+def save_upload(file, filepath):
+    """保存上传的文件（启用去重存储时边写入边计算哈希，内容已存在时只创建硬链接）"""
+    if dedup_store:
+        dedup_store.save_stream(file.stream, filepath)
+    else:
+        file.save(filepath)
+
+
+def resolve_pdf_path(file_path):
+    """
+    检查PDF请求的路径
+
+    Returns:
+        str: PDF文件绝对路径
+
+    Raises:
+        ValueError: 路径无效或不是PDF
+        FileNotFoundError: 文件不存在
+    """
+    if not file_path:
+        raise ValueError('文件路径不能为空')
+    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], file_path)
+    if not path_utils.get_relative_path(pdf_path, app.config['UPLOAD_FOLDER']):
+        raise ValueError('无效的文件路径')
+    if not os.path.isfile(pdf_path):
+        raise FileNotFoundError('文件不存在')
+    if not pdf_utils.is_pdf_file(pdf_path):
+        raise ValueError('文件不是PDF格式')
+    return pdf_path
+
+
+def parse_pdf_render_args(params):
+    """读取按页渲染的分辨率和格式参数（params 为查询参数或JSON请求体）"""
+    try:
+        dpi = int(params.get('dpi') or config.PDF_PREVIEW_DPI)
+    except (TypeError, ValueError):
+        raise ValueError('无效的分辨率')
+    if dpi < 36 or dpi > config.PDF_PREVIEW_MAX_DPI:
+        raise ValueError(f'分辨率需要在 36~{config.PDF_PREVIEW_MAX_DPI} 之间')
+    fmt = str(params.get('format') or 'jpeg').lower()
+    if fmt == 'jpg':
+        fmt = 'jpeg'
+    if fmt not in pdf_cache.PAGE_FORMATS:
+        raise ValueError('不支持的图片格式')
+    return dpi, fmt
+
 
 # ==================== 路由处理 ====================
 
@@ -35,32 +427,287 @@ def index():
     return render_template('index.html')
 
 
+@app.context_processor
+def inject_asset_url():
+    """模板中的 asset_url(path)：有最新的构建结果时返回带哈希的地址，否则返回源文件"""
+    def asset_url(path):
+        built = asset_manifest.lookup(path)
+        if built:
+            return url_for('serve_asset', filename=built)
+        return url_for('static', filename=path)
+    return {'asset_url': asset_url}
+
+
+@app.route('/assets/<path:filename>', methods=['GET'])
+def serve_asset(filename):
+    """构建后的静态资源（文件名带内容哈希，可以永久缓存），浏览器支持时发送预压缩版本"""
+    try:
+        found = asset_manifest.resolve(filename, request.accept_encodings)
+        if found is None:
+            return jsonify({'success': False, 'error': '文件不存在'}), 404
+        full_path, encoding = found
+        headers = {'Vary': 'Accept-Encoding'}
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return http_utils.file_response(request, full_path, mimetype=mimetypes.guess_type(filename)[0],
+                                        cache_control=f'public, max-age={config.ASSET_MAX_AGE}, immutable',
+                                        extra_headers=headers)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/tree', methods=['GET'])
 def get_tree():
     """获取文件树结构"""
     try:
         upload_folder = app.config['UPLOAD_FOLDER']
-        tree = file_tree.build_tree(upload_folder)
+        if metadata_db.ready:
+            tree = metadata_db.build_tree()
+        else:
+            tree = file_tree.build_tree(upload_folder, trash_lookup=trash_catalog.get)
         return jsonify({'success': True, 'tree': tree})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/list', methods=['GET'])
+def list_directory():
+    """按需列出目录内容（分页、服务端排序）"""
+    try:
+        dir_path = request.args.get('path', '').strip().strip('/')
+        cursor = request.args.get('cursor', '').strip() or None
+        sort = request.args.get('sort', 'name')
+        order = request.args.get('order', 'asc')
+        try:
+            depth = int(request.args.get('depth', 1))
+            limit = int(request.args.get('limit', config.LIST_PAGE_SIZE))
+        except ValueError:
+            return jsonify({'success': False, 'error': '无效的分页参数'}), 400
+        depth = max(1, min(depth, config.LIST_MAX_DEPTH))
+        limit = max(1, min(limit, config.LIST_MAX_PAGE_SIZE))
+        
+        upload_folder = app.config['UPLOAD_FOLDER']
+        directory = os.path.join(upload_folder, dir_path)
+        if not path_utils.get_relative_path(directory, upload_folder):
+            return jsonify({'success': False, 'error': '无效的文件夹路径'}), 400
+        
+        if not os.path.isdir(directory):
+            return jsonify({'success': False, 'error': '文件夹不存在'}), 404
+        
+        try:
+            if metadata_db.ready:
+                listing = metadata_db.list_directory(dir_path, depth=depth, limit=limit,
+                                                     cursor=cursor, sort=sort, order=order)
+            else:
+                listing = file_tree.list_directory(upload_folder, dir_path, depth=depth, limit=limit,
+                                                   cursor=cursor, sort=sort, order=order,
+                                                   trash_lookup=trash_catalog.get)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        return jsonify({
+            'success': True,
+            'path': dir_path,
+            'items': listing['items'],
+            'next_cursor': listing['next_cursor'],
+            'total': listing['total']
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/folders', methods=['GET'])
+def get_folders():
+    """获取文件夹树（仅文件夹，用于选择目标位置）"""
+    try:
+        upload_folder = app.config['UPLOAD_FOLDER']
+        if metadata_db.ready:
+            folders = metadata_db.build_folder_tree()
+        else:
+            folders = file_tree.build_folder_tree(upload_folder)
+        return jsonify({'success': True, 'folders': folders})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def parse_search_filters(params):
+    """
+    解析文件名搜索的过滤参数：type、ext（逗号分隔）、kind（file/folder）、min_size、max_size、
+    after、before（时间戳或 YYYY-MM-DD）
+
+    Raises:
+        ValueError: 参数无效
+    """
+    def parse_list(name):
+        return {item.strip().lower() for item in params.get(name, '').split(',') if item.strip()}
+
+    def parse_int(name):
+        value = params.get(name, '').strip()
+        if not value:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f'无效的{name}参数')
+
+    def parse_time(name):
+        value = params.get(name, '').strip()
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').timestamp()
+        except ValueError:
+            raise ValueError(f'无效的{name}参数')
+
+    kind = params.get('kind', '').strip() or None
+    if kind not in (None, 'file', 'folder'):
+        raise ValueError('无效的kind参数')
+    exts = {ext if ext.startswith('.') else '.' + ext for ext in parse_list('ext')}
+    return name_index.make_filter(types=parse_list('type'), exts=exts, kind=kind,
+                                  min_size=parse_int('min_size'), max_size=parse_int('max_size'),
+                                  after=parse_time('after'), before=parse_time('before'))
+
+
 @app.route('/api/search', methods=['GET'])
 def search_files():
-    """搜索文件和文件夹"""
+    """搜索文件和文件夹（mode：substring / prefix / glob / regex / fuzzy，支持过滤和分页）"""
     try:
         query = request.args.get('q', '').strip()
         if not query:
             return jsonify({'success': False, 'error': '搜索关键词不能为空'}), 400
-        
-        upload_folder = app.config['UPLOAD_FOLDER']
-        results = search.search_files(upload_folder, query)
-        
+        mode = request.args.get('mode', 'substring')
+        try:
+            filters = parse_search_filters(request.args)
+            offset = max(0, int(request.args.get('offset', 0)))
+            limit = int(request.args.get('limit', config.SEARCH_PAGE_SIZE))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        limit = max(1, min(limit, config.SEARCH_MAX_PAGE_SIZE))
+
+        if name_db.ready:
+            try:
+                page = name_db.search(query, mode, filters, offset, limit)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            results, has_more = page['results'], page['has_more']
+        elif mode != 'substring' or filters is not None:
+            return jsonify({'success': False, 'error': '文件名索引正在建立，请稍后重试'}), 503
+        else:
+            # 文件名索引尚未建立时按包含匹配搜索
+            upload_folder = app.config['UPLOAD_FOLDER']
+            if metadata_db.ready:
+                results = metadata_db.search(query)
+            else:
+                results = search.search_files(upload_folder, query, trash_lookup=trash_catalog.get)
+            results, has_more = results[offset:offset + limit], len(results) > offset + limit
+
         return jsonify({
             'success': True,
             'results': results,
-            'count': len(results)
+            'count': len(results),
+            'has_more': has_more,
+            'next_offset': offset + len(results) if has_more else None
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/search/stream', methods=['GET'])
+def search_files_stream():
+    """
+    流式搜索文件和文件夹：以NDJSON格式边找边返回，每行一个结果，最后一行为
+    {"done": true, "count": N, "truncated": bool}（正则或通配符扫描超时时附带 error）；客户端断开时停止搜索
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'success': False, 'error': '搜索关键词不能为空'}), 400
+        mode = request.args.get('mode', 'substring')
+        try:
+            filters = parse_search_filters(request.args)
+            max_results = int(request.args.get('limit', config.SEARCH_STREAM_MAX_RESULTS))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        max_results = max(1, min(max_results, config.SEARCH_STREAM_MAX_RESULTS))
+
+        if name_db.ready:
+            try:
+                matches = name_db.iter_search(query, mode, filters)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+        elif mode != 'substring' or filters is not None:
+            return jsonify({'success': False, 'error': '文件名索引正在建立，请稍后重试'}), 503
+        else:
+            # 文件名索引尚未建立时逐个目录扫描，结果按扫描顺序返回
+            matches = search.iter_search_files(app.config['UPLOAD_FOLDER'], query, heartbeat=True,
+                                               trash_lookup=trash_catalog.get)
+
+        def generate():
+            count = 0
+            truncated = False
+            error = None
+            pending = []
+            last_flush = time.monotonic()
+            try:
+                try:
+                    for info in matches:
+                        if info is not None:
+                            if count >= max_results:
+                                truncated = True
+                                break
+                            pending.append(json.dumps(info, ensure_ascii=False) + '\n')
+                            count += 1
+                        # 攒够64个结果或距上次发送超过0.1秒时发送一批，减少小块写入；第一个结果立即发送
+                        now = time.monotonic()
+                        if pending and (count == 1 or len(pending) >= 64 or now - last_flush >= 0.1):
+                            yield ''.join(pending)
+                            pending = []
+                            last_flush = now
+                except name_index.QueryTimeout as e:
+                    # 已发送的结果仍然有效，结束行说明搜索没有完成
+                    truncated = True
+                    error = str(e)
+                done = {'done': True, 'count': count, 'truncated': truncated}
+                if error:
+                    done['error'] = error
+                pending.append(json.dumps(done, ensure_ascii=False) + '\n')
+                yield ''.join(pending)
+            finally:
+                # 客户端断开时WSGI服务器会关闭响应，这里随之停止扫描
+                close = getattr(matches, 'close', None)
+                if close:
+                    close()
+
+        return Response(generate(), mimetype='application/x-ndjson',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/search/content', methods=['GET'])
+def search_content():
+    """搜索文件内容（全文索引），结果按相关度排序并附带匹配片段"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'success': False, 'error': '搜索关键词不能为空'}), 400
+        try:
+            limit = int(request.args.get('limit', config.CONTENT_SEARCH_LIMIT))
+        except ValueError:
+            return jsonify({'success': False, 'error': '无效的limit参数'}), 400
+        limit = max(1, min(limit, config.CONTENT_SEARCH_LIMIT))
+
+        results = content_db.search(query, limit)
+        return jsonify({
+            'success': True,
+            'results': results,
+            'count': len(results),
+            # 首次全量索引尚未完成时结果可能不完整
+            'indexing': not content_db.ready
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -68,10 +715,16 @@ def search_files():
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
-    """获取存储空间统计"""
+    """获取存储空间统计（总量、回收站与正常文件、按顶层文件夹和按类型的分布）"""
     try:
+        if stats.ready:
+            return jsonify(dict(stats.snapshot(), success=True))
+        # 索引尚未建立时只返回总大小
         upload_folder = app.config['UPLOAD_FOLDER']
-        total_size = utils.get_total_size(upload_folder)
+        if metadata_db.ready:
+            total_size = metadata_db.total_size()
+        else:
+            total_size = utils.get_total_size(upload_folder)
         return jsonify({
             'success': True,
             'total_size': total_size,
@@ -125,34 +778,14 @@ def upload_file():
         return jsonify({'success': False, 'error': '文件名不能为空'}), 400
     
     if file and utils.allowed_file(file.filename):
-        filename = utils.safe_filename(file.filename)
-        
-        # 确定目标目录
-        if target_folder:
-            target_path = os.path.join(app.config['UPLOAD_FOLDER'], target_folder)
-            if not path_utils.get_relative_path(target_path, app.config['UPLOAD_FOLDER']):
-                return jsonify({'success': False, 'error': '无效的文件夹路径'}), 400
-            os.makedirs(target_path, exist_ok=True)
-            filepath = os.path.join(target_path, filename)
-            rel_path = os.path.join(target_folder, filename)
-        else:
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            rel_path = filename
-        
-        # 如果文件已存在，添加时间戳
-        if os.path.exists(filepath):
-            name, ext = os.path.splitext(filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{name}_{timestamp}{ext}"
-            if target_folder:
-                filepath = os.path.join(target_path, filename)
-                rel_path = os.path.join(target_folder, filename)
-            else:
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                rel_path = filename
+        try:
+            filepath, rel_path = resolve_upload_path(file.filename, target_folder)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
         try:
-            file.save(filepath)
+            save_upload(file, filepath)
+            index_refresh(rel_path)
             file_info_data = file_info.get_file_info(filepath, rel_path)
             return jsonify({
                 'success': True,
@@ -165,6 +798,136 @@ def upload_file():
     return jsonify({'success': False, 'error': '不允许的文件类型'}), 400
 
 
+@app.route('/api/upload/init', methods=['POST'])
+def init_chunked_upload():
+    """初始化分片上传，返回上传ID和已收到的分片（用于断点续传）"""
+    try:
+        data = request.get_json() or {}
+        filename = (data.get('name') or '').strip()
+        target_folder = (data.get('folder') or '').strip()
+        size = data.get('size')
+
+        if not filename:
+            return jsonify({'success': False, 'error': '文件名不能为空'}), 400
+        if not utils.allowed_file(filename):
+            return jsonify({'success': False, 'error': '不允许的文件类型'}), 400
+        if not isinstance(size, int) or size < 0:
+            return jsonify({'success': False, 'error': '无效的文件大小'}), 400
+        if target_folder:
+            target_path = os.path.join(app.config['UPLOAD_FOLDER'], target_folder)
+            if not path_utils.get_relative_path(target_path, app.config['UPLOAD_FOLDER']):
+                return jsonify({'success': False, 'error': '无效的文件夹路径'}), 400
+
+        session = chunked_uploads.create(filename, target_folder, size)
+        return jsonify({'success': True, 'upload': session, 'parallel': config.UPLOAD_PARALLEL_CHUNKS})
+    except chunked_upload.UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'初始化上传失败: {str(e)}'}), 500
+
+
+@app.route('/api/upload/check', methods=['POST'])
+def check_upload():
+    """
+    上传前检查服务器是否已有相同内容（秒传）
+
+    只提供 size 时返回 candidate：是否可能已有这个大小的文件，为False时不必计算哈希；
+    同时提供 sha256 且内容已存在时直接在目标位置创建文件，返回 exists=True 和文件信息，不需要再上传数据
+    """
+    try:
+        data = request.get_json() or {}
+        filename = (data.get('name') or '').strip()
+        target_folder = (data.get('folder') or '').strip()
+        size = data.get('size')
+        digest = (data.get('sha256') or '').strip().lower()
+
+        if not filename:
+            return jsonify({'success': False, 'error': '文件名不能为空'}), 400
+        if not utils.allowed_file(filename):
+            return jsonify({'success': False, 'error': '不允许的文件类型'}), 400
+        if not isinstance(size, int) or size < 0:
+            return jsonify({'success': False, 'error': '无效的文件大小'}), 400
+        if digest and not blob_store.is_valid_digest(digest):
+            return jsonify({'success': False, 'error': '无效的SHA-256'}), 400
+
+        if not dedup_store or not dedup_store.may_exist(size):
+            return jsonify({'success': True, 'exists': False, 'candidate': False})
+        if not digest:
+            return jsonify({'success': True, 'exists': False, 'candidate': True})
+
+        try:
+            filepath, rel_path = resolve_upload_path(filename, target_folder)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if not dedup_store.link(digest, size, filepath):
+            return jsonify({'success': True, 'exists': False, 'candidate': True})
+
+        index_refresh(rel_path)
+        return jsonify({
+            'success': True,
+            'exists': True,
+            'message': '文件秒传成功',
+            'file': file_info.get_file_info(filepath, rel_path)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/upload/<upload_id>', methods=['GET'])
+def get_chunked_upload(upload_id):
+    """查询分片上传进度"""
+    try:
+        return jsonify({'success': True, 'upload': chunked_uploads.status(upload_id), 'parallel': config.UPLOAD_PARALLEL_CHUNKS})
+    except chunked_upload.UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/upload/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def put_upload_chunk(upload_id, index):
+    """上传一个分片，请求体为分片的原始数据"""
+    try:
+        size = chunked_uploads.write_chunk(upload_id, index, request.stream, request.content_length)
+        return jsonify({'success': True, 'index': index, 'size': size})
+    except chunked_upload.UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'分片上传失败: {str(e)}'}), 500
+
+
+@app.route('/api/upload/<upload_id>/complete', methods=['POST'])
+def complete_chunked_upload(upload_id):
+    """所有分片上传完成后合并为最终文件"""
+    try:
+        filepath, rel_path = chunked_uploads.finalize(
+            upload_id, lambda meta: resolve_upload_path(meta['filename'], meta['folder']))
+        index_refresh(rel_path)
+        return jsonify({
+            'success': True,
+            'message': '文件上传成功',
+            'file': file_info.get_file_info(filepath, rel_path)
+        })
+    except chunked_upload.UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'上传失败: {str(e)}'}), 500
+
+
+@app.route('/api/upload/<upload_id>', methods=['DELETE'])
+def abort_chunked_upload(upload_id):
+    """取消分片上传并删除已上传的分片"""
+    try:
+        chunked_uploads.abort(upload_id)
+        return jsonify({'success': True, 'message': '上传已取消'})
+    except chunked_upload.UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/create-folder', methods=['POST'])
 def create_folder():
     """创建文件夹"""
@@ -194,6 +957,7 @@ def create_folder():
             return jsonify({'success': False, 'error': '文件夹已存在'}), 400
         
         os.makedirs(target_path, exist_ok=True)
+        index_refresh(rel_path)
         folder_info_data = file_info.get_folder_info(target_path, rel_path)
         
         return jsonify({
@@ -243,6 +1007,8 @@ def rename_item():
             return jsonify({'success': False, 'error': '该名称已存在'}), 400
         
         os.rename(source_path, new_full_path)
+        index_remove(item_path)
+        index_refresh(new_path)
         
         if os.path.isdir(new_full_path):
             item_info_data = file_info.get_folder_info(new_full_path, new_path)
@@ -288,6 +1054,7 @@ def create_file():
         os.makedirs(os.path.dirname(target_path) if parent_folder else app.config['UPLOAD_FOLDER'], exist_ok=True)
         with open(target_path, 'w', encoding='utf-8') as f:
             f.write('')
+        index_refresh(rel_path)
         
         file_info_data = file_info.get_file_info(target_path, rel_path)
         
@@ -308,36 +1075,12 @@ def move_item():
         source_path = data.get('source', '').strip()
         target_folder = data.get('target', '').strip()
         
-        if not source_path:
-            return jsonify({'success': False, 'error': '源路径不能为空'}), 400
-        
-        source_full = os.path.join(app.config['UPLOAD_FOLDER'], source_path)
-        if not path_utils.get_relative_path(source_full, app.config['UPLOAD_FOLDER']):
-            return jsonify({'success': False, 'error': '无效的源路径'}), 400
-        
-        if not os.path.exists(source_full):
-            return jsonify({'success': False, 'error': '源文件或文件夹不存在'}), 404
-        
-        item_name = os.path.basename(source_path)
-        
-        if target_folder:
-            if source_path.startswith(target_folder + '/') or source_path == target_folder:
-                return jsonify({'success': False, 'error': '不能移动到自己的子文件夹中'}), 400
-            
-            target_full = os.path.join(app.config['UPLOAD_FOLDER'], target_folder, item_name)
-            new_rel_path = os.path.join(target_folder, item_name)
-            if not path_utils.get_relative_path(target_full, app.config['UPLOAD_FOLDER']):
-                return jsonify({'success': False, 'error': '无效的目标路径'}), 400
-            os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], target_folder), exist_ok=True)
-        else:
-            target_full = os.path.join(app.config['UPLOAD_FOLDER'], item_name)
-            new_rel_path = item_name
-        
-        if os.path.exists(target_full):
-            return jsonify({'success': False, 'error': '目标位置已存在同名文件或文件夹'}), 400
-        
-        shutil.move(source_full, target_full)
+        try:
+            new_rel_path = move_entry(source_path, target_folder)
+        except OperationError as e:
+            return jsonify({'success': False, 'error': str(e)}), e.status
         
+        target_full = os.path.join(app.config['UPLOAD_FOLDER'], new_rel_path)
         if os.path.isdir(target_full):
             item_info_data = file_info.get_folder_info(target_full, new_rel_path)
         else:
@@ -352,9 +1095,31 @@ def move_item():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def zip_response(items, download_name):
+    """
+    边打包边发送的ZIP下载响应（不知道总长度，使用分块传输，不支持断点续传）
+
+    Args:
+        items: (绝对路径, 包内名称) 列表
+        download_name: 下载文件名
+    """
+    def generate():
+        try:
+            yield from zip_stream.stream_zip(items)
+        except Exception as e:
+            # 响应头已经发出，只能中断传输，客户端会收到不完整的ZIP
+            app.logger.error(f'打包下载失败 {download_name}: {e}')
+            raise
+
+    return Response(generate(), mimetype='application/zip', headers={
+        'Content-Disposition': http_utils.content_disposition(download_name),
+        'Cache-Control': 'no-store'
+    })
+
+
 @app.route('/api/download', methods=['GET'])
 def download_file():
-    """下载文件"""
+    """下载文件（文件夹打包为ZIP下载）"""
     try:
         file_path = request.args.get('path', '')
         if not file_path:
@@ -365,33 +1130,25 @@ def download_file():
         if not path_utils.get_relative_path(filepath, app.config['UPLOAD_FOLDER']):
             return jsonify({'success': False, 'error': '无效的文件路径'}), 400
         
+        if os.path.isdir(filepath):
+            rel_path = path_utils.get_relative_path(filepath, app.config['UPLOAD_FOLDER'])
+            if rel_path == '.':
+                return jsonify({'success': False, 'error': '不能下载整个网盘'}), 400
+            folder_name = os.path.basename(rel_path)
+            return zip_response([(filepath, folder_name)], f'{folder_name}.zip')
+        
         if not os.path.exists(filepath) or not os.path.isfile(filepath):
             return jsonify({'success': False, 'error': '文件不存在'}), 404
         
+        # 支持断点续传（Range）和条件请求（ETag / Last-Modified）
         filename = os.path.basename(filepath)
-        
-        # 处理中文文件名编码问题
-        # HTTP头必须使用ASCII或latin-1编码，中文需要使用RFC 5987标准
-        safe_filename = filename
-        if any(ord(c) > 127 for c in filename):
-            # 创建ASCII安全的fallback文件名
-            try:
-                ascii_chars = ''.join(c if ord(c) < 128 else '_' for c in filename)
-                safe_filename = ascii_chars if ascii_chars else 'download'
-            except:
-                safe_filename = 'download'
-        
-        response = send_file(
-            filepath,
+        response = http_utils.file_response(
+            request, filepath,
+            mimetype=mimetypes.guess_type(filename)[0],
             as_attachment=True,
-            download_name=safe_filename  # 使用ASCII安全的文件名
+            download_name=filename
         )
         
-        # 确保中文文件名正确显示（使用RFC 5987标准）
-        if any(ord(c) > 127 for c in filename):
-            encoded_filename = quote(filename.encode('utf-8'))
-            response.headers['Content-Disposition'] = f'attachment; filename="{safe_filename}"; filename*=UTF-8\'\'{encoded_filename}'
-        
         return response
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -399,8 +1156,7 @@ def download_file():
 
 @app.route('/api/pdf-to-jpg', methods=['POST'])
 def pdf_to_jpg():
-    """将PDF文件转换为JPG图片并打包为ZIP下载"""
-    zip_path = None
+    """将PDF文件转换为JPG图片并打包为ZIP下载（边转换边发送）"""
     try:
         data = request.get_json()
         file_path = data.get('path', '').strip()
@@ -419,76 +1175,102 @@ def pdf_to_jpg():
         if not pdf_utils.is_pdf_file(pdf_path):
             return jsonify({'success': False, 'error': '文件不是PDF格式'}), 400
         
-        # 生成ZIP文件路径（使用临时目录）
-        import tempfile
-        import uuid
         pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
-        # 使用UUID确保文件名唯一，避免并发冲突
-        unique_id = str(uuid.uuid4())[:8]
-        temp_dir = tempfile.gettempdir()
-        zip_filename = f"{pdf_name}_images_{unique_id}.zip"
-        zip_path = os.path.join(temp_dir, zip_filename)
+        download_name = f"{pdf_name}_images.zip"
         
-        # 转换PDF为JPG并打包
-        pdf_utils.pdf_to_jpg_zip(pdf_path, zip_path, dpi=200)
+        # 已经转换过的PDF直接返回缓存（支持断点续传）
+        cached_path = pdf_converter.cached_zip(pdf_path)
+        if cached_path:
+            return http_utils.file_response(request, cached_path, mimetype='application/zip',
+                                            as_attachment=True, download_name=download_name)
         
-        if not os.path.exists(zip_path):
-            return jsonify({'success': False, 'error': '转换失败'}), 500
+        # 开始发送前先读取页数，poppler缺失或文件损坏时仍可以返回JSON错误
+        page_count = pdf_utils.get_page_count(pdf_path)
+        if page_count == 0:
+            return jsonify({'success': False, 'error': 'PDF没有页面'}), 400
         
-        # 返回ZIP文件
-        download_filename = f"{pdf_name}_images.zip"
+        def generate():
+            try:
+                yield from pdf_converter.stream_zip(pdf_path, page_count)
+            except Exception as e:
+                # 响应头已经发出，只能中断传输，客户端会收到不完整的ZIP
+                app.logger.error(f'PDF转JPG失败 {file_path}: {e}')
+                raise
         
-        # 处理中文文件名编码问题
-        # HTTP头必须使用ASCII或latin-1编码，中文需要使用RFC 5987标准
-        # 先创建一个ASCII安全的fallback文件名
-        safe_filename = 'images.zip'
+        return Response(generate(), mimetype='application/zip', headers={
+            'Content-Disposition': http_utils.content_disposition(download_name),
+            'Cache-Control': 'no-store'
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/pdf/info', methods=['GET'])
+def pdf_info():
+    """获取PDF页数等信息（不渲染页面）"""
+    try:
+        pdf_path = resolve_pdf_path(request.args.get('path', '').strip())
+        info = pdf_utils.get_pdf_info(pdf_path)
+        return jsonify({'success': True, **info})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/pdf/page', methods=['GET'])
+def pdf_page():
+    """渲染PDF的单页图片（path、page、dpi、format=jpeg|png）"""
+    try:
+        pdf_path = resolve_pdf_path(request.args.get('path', '').strip())
+        dpi, fmt = parse_pdf_render_args(request.args)
         try:
-            # 尝试提取ASCII字符作为fallback
-            ascii_chars = ''.join(c if ord(c) < 128 else '' for c in pdf_name)
-            if ascii_chars:
-                safe_filename = f"{ascii_chars}_images.zip"
-        except:
-            pass
-        
-        # 构建Content-Disposition头
-        if any(ord(c) > 127 for c in download_filename):
-            # 使用RFC 5987标准编码中文文件名
-            encoded_filename = quote(download_filename.encode('utf-8'))
-            # filename必须是ASCII，filename*用于UTF-8编码的文件名
-            content_disposition = f'attachment; filename="{safe_filename}"; filename*=UTF-8\'\'{encoded_filename}'
-        else:
-            content_disposition = f'attachment; filename="{download_filename}"'
-        
-        response = send_file(
-            zip_path,
-            as_attachment=True,
-            download_name=safe_filename,  # 使用ASCII安全的文件名
-            mimetype='application/zip'
-        )
-        
-        # 设置Content-Disposition头（确保使用ASCII安全的值）
-        response.headers['Content-Disposition'] = content_disposition
-        
-        # 设置Content-Type
-        response.headers['Content-Type'] = 'application/zip'
-        
-        # 使用after_request钩子清理临时文件
-        @response.call_on_close
-        def cleanup():
-            if zip_path and os.path.exists(zip_path):
-                try:
-                    os.unlink(zip_path)
-                except:
-                    pass
-        
-        return response
+            page = int(request.args.get('page', 1))
+        except ValueError:
+            return jsonify({'success': False, 'error': '无效的页码'}), 400
+        if page < 1 or page > pdf_converter.page_count(pdf_path):
+            return jsonify({'success': False, 'error': '页码超出范围'}), 400
+
+        image_path, mimetype = pdf_converter.get_page(pdf_path, page, dpi, fmt)
+        # 缓存键包含源文件版本，URL相同而内容变化时ETag也会变化
+        return http_utils.file_response(request, image_path, mimetype=mimetype,
+                                        cache_control='private, max-age=3600')
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/pdf/pages', methods=['POST'])
+def pdf_render_pages():
+    """预先渲染一个页码范围（一次 pdftoppm 调用），之后按页请求直接命中缓存"""
+    try:
+        data = request.get_json() or {}
+        pdf_path = resolve_pdf_path((data.get('path') or '').strip())
+        dpi, fmt = parse_pdf_render_args(data)
+        try:
+            first = int(data.get('first', 1))
+            last = int(data.get('last', first))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': '无效的页码'}), 400
+
+        page_count = pdf_converter.page_count(pdf_path)
+        first = max(first, 1)
+        last = min(last, page_count, first + config.PDF_RENDER_MAX_PAGES - 1)
+        if first > last:
+            return jsonify({'success': False, 'error': '页码超出范围'}), 400
+
+        rendered = pdf_converter.render_range(pdf_path, first, last, dpi, fmt)
+        return jsonify({'success': True, 'first': first, 'last': last, 'rendered': rendered})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
     except Exception as e:
-        # 确保出错时也清理临时文件
-        if zip_path and os.path.exists(zip_path):
-            try:
-                os.unlink(zip_path)
-            except:
-                pass
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -529,7 +1311,8 @@ def save_edited_image():
         target_path = os.path.join(app.config['UPLOAD_FOLDER'], new_file_path)
         
         # 保存文件
-        file.save(target_path)
+        save_upload(file, target_path)
+        index_refresh(new_file_path)
         
         # 获取文件信息
         file_info_data = file_info.get_file_info(target_path, new_file_path)
@@ -576,42 +1359,36 @@ def preview_file():
                 '.ico': 'image/x-icon'
             }
             mimetype = mime_types.get(ext, 'image/jpeg')
-            response = send_file(filepath, mimetype=mimetype)
             # 添加CORS头，允许跨域加载图片
-            response.headers['Access-Control-Allow-Origin'] = '*'
-            response.headers['Cache-Control'] = 'public, max-age=3600'
-            return response
+            return http_utils.file_response(request, filepath, mimetype=mimetype,
+                                            cache_control='public, max-age=3600',
+                                            extra_headers={'Access-Control-Allow-Origin': '*'})
         elif file_info_data['type'] == 'text':
+            # 编码根据开头的样本判断；大文件只返回第一页（paged），其余部分通过 /api/preview/text 按页读取
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                return jsonify({
-                    'success': True,
-                    'type': 'text',
-                    'content': content,
-                    'filename': file_info_data['name']
-                })
-            except UnicodeDecodeError:
-                try:
-                    with open(filepath, 'r', encoding='gbk') as f:
-                        content = f.read()
-                    return jsonify({
-                        'success': True,
-                        'type': 'text',
-                        'content': content,
-                        'filename': file_info_data['name']
-                    })
-                except:
-                    return jsonify({
-                        'success': False,
-                        'error': '无法读取文件内容（可能是二进制文件）'
-                    }), 400
+                if file_info_data['size'] <= config.TEXT_PREVIEW_INLINE_SIZE:
+                    encoding, content = text_preview.read_text(filepath)
+                    paged = False
+                else:
+                    page = text_pages.read(filepath)
+                    encoding, content, paged = page['encoding'], '\n'.join(page['lines']), True
+            except text_preview.TextPreviewError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            return jsonify({
+                'success': True,
+                'type': 'text',
+                'content': content,
+                'filename': file_info_data['name'],
+                'encoding': encoding,
+                'paged': paged
+            })
         elif file_info_data['type'] == 'pdf':
-            return send_file(filepath, mimetype='application/pdf')
+            return http_utils.file_response(request, filepath, mimetype='application/pdf')
         elif file_info_data['type'] == 'video':
-            return send_file(filepath, mimetype=f'video/{ext[1:]}')
+            # 视频拖动进度条时浏览器会发送Range请求
+            return http_utils.file_response(request, filepath, mimetype=f'video/{ext[1:]}')
         elif file_info_data['type'] == 'audio':
-            return send_file(filepath, mimetype=f'audio/{ext[1:]}')
+            return http_utils.file_response(request, filepath, mimetype=f'audio/{ext[1:]}')
         else:
             return jsonify({
                 'success': False,
@@ -621,6 +1398,135 @@ def preview_file():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/preview/text', methods=['GET'])
+def preview_text_page():
+    """
+    按页读取文本文件：line（从0开始）和 count 按行读取，或 offset 和 length 按字节范围读取
+    （从 offset 所在行的行首开始）
+    """
+    try:
+        file_path = request.args.get('path', '')
+        if not file_path:
+            return jsonify({'success': False, 'error': '文件路径不能为空'}), 400
+
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], file_path)
+        if not path_utils.get_relative_path(filepath, app.config['UPLOAD_FOLDER']):
+            return jsonify({'success': False, 'error': '无效的文件路径'}), 400
+        if not os.path.isfile(filepath):
+            return jsonify({'success': False, 'error': '文件不存在'}), 404
+
+        try:
+            args = {name: int(request.args[name]) for name in ('line', 'count', 'offset', 'length')
+                    if request.args.get(name, '') != ''}
+        except ValueError:
+            return jsonify({'success': False, 'error': '无效的行号或字节范围'}), 400
+        if any(value < 0 for value in args.values()):
+            return jsonify({'success': False, 'error': '无效的行号或字节范围'}), 400
+
+        try:
+            page = text_pages.read(filepath, **args)
+        except text_preview.TextPreviewError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        return jsonify({'success': True, 'path': file_path, 'size_human': utils.format_size(page['size']), **page})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/follow', methods=['GET'])
+def follow_file():
+    """
+    跟随正在写入的文本文件（Server-Sent Events）：先发送 start 事件和文件末尾的内容，之后推送新追加的内容
+
+    断线重连时浏览器通过 Last-Event-ID（或参数 resume）带回 "inode:偏移量"，文件没有被截断或轮转时从该位置继续
+    """
+    try:
+        file_path = request.args.get('path', '')
+        if not file_path:
+            return jsonify({'success': False, 'error': '文件路径不能为空'}), 400
+
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], file_path)
+        if not path_utils.get_relative_path(filepath, app.config['UPLOAD_FOLDER']):
+            return jsonify({'success': False, 'error': '无效的文件路径'}), 400
+        if not os.path.isfile(filepath):
+            return jsonify({'success': False, 'error': '文件不存在'}), 404
+
+        try:
+            follower = log_followers.open(os.path.abspath(filepath))
+        except log_follow.FollowError as e:
+            return jsonify({'success': False, 'error': str(e)}), e.status
+
+        try:
+            resume = request.headers.get('Last-Event-ID') or request.args.get('resume', '')
+            ino, _, offset = resume.partition(':')
+            if ino.isdigit() and offset.isdigit() and int(ino) == follower.ino and int(offset) <= follower.end:
+                start = {'offset': int(offset), 'line': None, 'resumed': True}
+            else:
+                # 从文件末尾附近的一个行首开始，行号来自分页预览的行索引
+                page = text_pages.read(filepath, offset=max(0, follower.end - config.FOLLOW_TAIL_BYTES), length=1)
+                start = {'offset': page['offset'], 'line': page['line'], 'resumed': False}
+        except Exception:
+            log_followers.close(follower)
+            raise
+
+        def generate():
+            yield log_follow.format_event('start', dict(start, encoding=follower.encoding),
+                                          f"{follower.ino}:{start['offset']}")
+            for event, data, event_id in follower.events(start['offset'], heartbeat=config.FOLLOW_HEARTBEAT):
+                if event == 'ping':
+                    # 注释行：保持连接，客户端已断开时写入失败，响应随之关闭
+                    yield ': ping\n\n'
+                else:
+                    yield log_follow.format_event(event, data, event_id)
+
+        response = Response(generate(), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        # 响应关闭时（包括还没开始发送就断开）取消订阅
+        response.call_on_close(lambda: log_followers.close(follower))
+        return response
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/thumbnail', methods=['GET'])
+def get_thumbnail():
+    """获取图片缩略图（按尺寸分档，缓存在磁盘上）"""
+    try:
+        file_path = request.args.get('path', '')
+        if not file_path:
+            return jsonify({'success': False, 'error': '文件路径不能为空'}), 400
+        
+        try:
+            size = int(request.args.get('size', 64))
+        except ValueError:
+            return jsonify({'success': False, 'error': '无效的缩略图尺寸'}), 400
+        
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], file_path)
+        
+        if not path_utils.get_relative_path(filepath, app.config['UPLOAD_FOLDER']):
+            return jsonify({'success': False, 'error': '无效的文件路径'}), 400
+        
+        if not os.path.exists(filepath) or not os.path.isfile(filepath):
+            return jsonify({'success': False, 'error': '文件不存在'}), 404
+        
+        ext = os.path.splitext(filepath)[1].lower()
+        if file_info.get_file_type(ext) != 'image':
+            return jsonify({'success': False, 'error': '该文件不是图片'}), 400
+        
+        if ext == '.svg':
+            # 矢量图无需生成缩略图
+            response = send_file(filepath, mimetype='image/svg+xml')
+        else:
+            fmt = thumbnails.choose_format(request.headers.get('Accept'), request.args.get('format'))
+            thumb_path, mimetype = thumbnails.get_thumbnail(filepath, file_path, size, fmt)
+            response = send_file(thumb_path, mimetype=mimetype)
+            response.headers['Vary'] = 'Accept'
+        # URL只由路径决定，文件被替换后内容会变：每次都向服务器验证，未修改时按ETag返回304
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'生成缩略图失败: {str(e)}'}), 500
+
+
 @app.route('/api/delete', methods=['DELETE'])
 def delete_item():
     """删除文件或文件夹"""
@@ -628,42 +1534,19 @@ def delete_item():
         data = request.get_json()
         item_path = data.get('path', '')
         
-        if not item_path:
-            return jsonify({'success': False, 'error': '路径不能为空'}), 400
-        
+        # 移走之前记录条目信息（路径无效或不存在时由 trash_entry 返回错误）
         itempath = os.path.join(app.config['UPLOAD_FOLDER'], item_path)
+        item_info_data = None
+        if item_path and path_utils.get_relative_path(itempath, app.config['UPLOAD_FOLDER']) and os.path.exists(itempath):
+            if os.path.isdir(itempath):
+                item_info_data = file_info.get_folder_info(itempath, item_path)
+            else:
+                item_info_data = file_info.get_file_info(itempath, item_path)
         
-        if not path_utils.get_relative_path(itempath, app.config['UPLOAD_FOLDER']):
-            return jsonify({'success': False, 'error': '无效的路径'}), 400
-        
-        if not os.path.exists(itempath):
-            return jsonify({'success': False, 'error': '文件或文件夹不存在'}), 404
-        
-        is_dir = os.path.isdir(itempath)
-        if is_dir:
-            item_info_data = file_info.get_folder_info(itempath, item_path)
-        else:
-            item_info_data = file_info.get_file_info(itempath, item_path)
-        
-        # 移动到临时目录（用于撤销）
-        temp_dir = os.path.join(app.config['UPLOAD_FOLDER'], '.trash')
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        undo_id = str(uuid.uuid4())
-        temp_path = os.path.join(temp_dir, undo_id)
-        
-        # 保存原始信息到元数据文件
-        metadata = {
-            'original_path': item_path,
-            'original_name': item_info_data['name'],
-            'is_dir': is_dir,
-            'deleted_at': datetime.now().isoformat()
-        }
-        metadata_path = os.path.join(temp_dir, undo_id + '.meta')
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, ensure_ascii=False)
-        
-        shutil.move(itempath, temp_path)
+        try:
+            undo_id = trash_entry(item_path)
+        except OperationError as e:
+            return jsonify({'success': False, 'error': str(e)}), e.status
         
         return jsonify({
             'success': True, 
@@ -682,39 +1565,12 @@ def restore_item():
         data = request.get_json()
         undo_id = data.get('undo_id', '')
         
-        if not undo_id:
-            return jsonify({'success': False, 'error': '参数不完整'}), 400
-        
-        temp_dir = os.path.join(app.config['UPLOAD_FOLDER'], '.trash')
-        temp_path = os.path.join(temp_dir, undo_id)
-        metadata_path = os.path.join(temp_dir, undo_id + '.meta')
-        
-        if not os.path.exists(temp_path):
-            return jsonify({'success': False, 'error': '文件不存在'}), 404
-        
-        if not os.path.exists(metadata_path):
-            return jsonify({'success': False, 'error': '元数据文件不存在'}), 404
-        
-        with open(metadata_path, 'r', encoding='utf-8') as f:
-            metadata = json.load(f)
-        
-        original_path = metadata.get('original_path', '')
-        if not original_path:
-            return jsonify({'success': False, 'error': '原始路径信息缺失'}), 400
+        try:
+            original_path = restore_entry(undo_id)
+        except OperationError as e:
+            return jsonify({'success': False, 'error': str(e)}), e.status
         
         restore_path = os.path.join(app.config['UPLOAD_FOLDER'], original_path)
-        
-        parent_dir = os.path.dirname(restore_path)
-        if parent_dir:
-            os.makedirs(parent_dir, exist_ok=True)
-        
-        if os.path.exists(restore_path):
-            return jsonify({'success': False, 'error': '目标位置已存在同名文件或文件夹'}), 400
-        
-        shutil.move(temp_path, restore_path)
-        if os.path.exists(metadata_path):
-            os.remove(metadata_path)
-        
         if os.path.isdir(restore_path):
             item_info_data = file_info.get_folder_info(restore_path, original_path)
         else:
@@ -733,31 +1589,22 @@ def restore_item():
 def restore_all():
     """恢复回收站中的所有文件"""
     try:
-        temp_dir = os.path.join(app.config['UPLOAD_FOLDER'], '.trash')
-        if not os.path.exists(temp_dir):
+        entries = trash_catalog.items()
+        if not entries:
             return jsonify({'success': True, 'message': '回收站为空', 'restored_count': 0})
         
-        restored_count = 0
+        restored = []
+        restored_paths = []
         failed_count = 0
         
-        for entry in os.listdir(temp_dir):
-            if entry.endswith('.meta'):
-                continue
-            
-            entry_path = os.path.join(temp_dir, entry)
-            metadata_path = entry_path + '.meta'
-            
-            if not os.path.exists(metadata_path):
+        # 元数据直接从回收站目录读取，恢复完成后一次性更新目录和索引
+        for undo_id, metadata in entries:
+            entry_path = os.path.join(TRASH_FOLDER, undo_id)
+            original_path = metadata.get('original_path', '')
+            if not original_path or not os.path.exists(entry_path):
                 continue
             
             try:
-                with open(metadata_path, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                
-                original_path = metadata.get('original_path', '')
-                if not original_path:
-                    continue
-                
                 restore_path = os.path.join(app.config['UPLOAD_FOLDER'], original_path)
                 
                 if os.path.exists(restore_path):
@@ -769,16 +1616,20 @@ def restore_all():
                     os.makedirs(parent_dir, exist_ok=True)
                 
                 shutil.move(entry_path, restore_path)
-                os.remove(metadata_path)
-                restored_count += 1
+                restored.append(undo_id)
+                restored_paths.append(original_path)
             except Exception as e:
                 failed_count += 1
                 continue
         
+        trash_catalog.remove(*restored)
+        index_remove(*(f'.trash/{undo_id}' for undo_id in restored))
+        index_refresh(*restored_paths)
+        
         return jsonify({
             'success': True,
-            'message': f'成功恢复 {restored_count} 个项目',
-            'restored_count': restored_count,
+            'message': f'成功恢复 {len(restored)} 个项目',
+            'restored_count': len(restored),
             'failed_count': failed_count
         })
     except Exception as e:
@@ -787,28 +1638,23 @@ def restore_all():
 
 @app.route('/api/empty-trash', methods=['POST'])
 def empty_trash():
-    """清空回收站"""
+    """清空回收站：条目立即移出回收站，文件在后台任务中删除"""
     try:
-        temp_dir = os.path.join(app.config['UPLOAD_FOLDER'], '.trash')
-        if not os.path.exists(temp_dir):
-            return jsonify({'success': True, 'message': '回收站已为空'})
+        entries = os.listdir(TRASH_FOLDER) if os.path.exists(TRASH_FOLDER) else []
+        if not entries:
+            return jsonify({'success': True, 'message': '回收站已为空', 'deleted_count': 0})
         
-        deleted_count = 0
-        for entry in os.listdir(temp_dir):
-            entry_path = os.path.join(temp_dir, entry)
-            try:
-                if os.path.isdir(entry_path):
-                    shutil.rmtree(entry_path)
-                else:
-                    os.remove(entry_path)
-                deleted_count += 1
-            except:
-                pass
+        total = metadata_db.count_subtree('.trash')
+        job = purge_jobs.purge('empty-trash', [os.path.join(TRASH_FOLDER, entry) for entry in entries],
+                               total=total, size=metadata_db.get_size('.trash'))
+        trash_catalog.remove(*entries)
+        index_refresh('.trash')
         
         return jsonify({
             'success': True,
-            'message': f'已清空回收站，删除了 {deleted_count} 个项目',
-            'deleted_count': deleted_count
+            'message': f'正在清空回收站，共 {len(entries)} 个项目',
+            'deleted_count': len(entries),
+            'job': job.to_dict()
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -816,7 +1662,7 @@ def empty_trash():
 
 @app.route('/api/permanent-delete', methods=['DELETE'])
 def permanent_delete():
-    """永久删除回收站中的文件"""
+    """永久删除回收站中的文件（文件夹在后台任务中删除）"""
     try:
         data = request.get_json()
         undo_id = data.get('undo_id', '')
@@ -824,22 +1670,49 @@ def permanent_delete():
         if not undo_id:
             return jsonify({'success': False, 'error': '参数不完整'}), 400
         
-        temp_dir = os.path.join(app.config['UPLOAD_FOLDER'], '.trash')
-        temp_path = os.path.join(temp_dir, undo_id)
-        metadata_path = os.path.join(temp_dir, undo_id + '.meta')
+        temp_path = os.path.join(TRASH_FOLDER, undo_id)
         
         if not os.path.exists(temp_path):
             return jsonify({'success': False, 'error': '文件不存在'}), 404
         
+        job = None
         if os.path.isdir(temp_path):
-            shutil.rmtree(temp_path)
+            rel_path = f'.trash/{undo_id}'
+            job = purge_jobs.purge('permanent-delete', [temp_path], total=metadata_db.count_subtree(rel_path),
+                                   size=metadata_db.get_size(rel_path))
         else:
+            # 还有其他硬链接（去重存储中的数据）时，删除后可能需要回收
+            shared = os.stat(temp_path).st_nlink > 1
             os.remove(temp_path)
+            if shared and dedup_store:
+                dedup_store.request_collect()
         
-        if os.path.exists(metadata_path):
-            os.remove(metadata_path)
+        trash_catalog.remove(undo_id)
+        index_remove(f'.trash/{undo_id}')
         
-        return jsonify({'success': True, 'message': '永久删除成功'})
+        return jsonify({'success': True, 'message': '永久删除成功', 'job': job.to_dict() if job else None})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """后台任务列表（active=1 时只返回进行中的任务）"""
+    try:
+        active_only = request.args.get('active', '') in ('1', 'true')
+        return jsonify({'success': True, 'jobs': purge_jobs.list(active_only)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """查询后台任务的状态和进度"""
+    try:
+        job = purge_jobs.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': '任务不存在'}), 404
+        return jsonify({'success': True, 'job': job})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -859,6 +1732,223 @@ def undo_delete():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+# ==================== 批量操作 ====================
+
+def parse_batch_items(data, key):
+    """
+    读取批量请求中的条目列表
+
+    Raises:
+        ValueError: 参数无效或条目过多
+    """
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items or not all(isinstance(item, str) for item in items):
+        raise ValueError(f'{key} 必须是非空的字符串列表')
+    if len(items) > config.BATCH_MAX_ITEMS:
+        raise ValueError(f'单次最多操作 {config.BATCH_MAX_ITEMS} 个条目')
+    return [item.strip() for item in items]
+
+
+def run_batch(items, operation):
+    """
+    逐个执行操作，单个条目失败不影响其他条目
+
+    Args:
+        operation: (item) -> dict，返回该条目结果中的附加字段，失败时抛出异常
+
+    Returns:
+        list: 每个条目的结果 {'item', 'success', 'error'?, ...}
+    """
+    results = []
+    for item in items:
+        try:
+            result = dict(operation(item) or {}, item=item, success=True)
+        except OperationError as e:
+            result = {'item': item, 'success': False, 'error': str(e), 'status': e.status}
+        except Exception as e:
+            result = {'item': item, 'success': False, 'error': str(e), 'status': 500}
+        results.append(result)
+    return results
+
+
+def tree_delta(removed, added):
+    """
+    批量操作后的文件树变化，前端据此就地更新而不重新加载整棵树
+
+    Args:
+        removed: 被移走的路径
+        added: 新出现的路径
+
+    Returns:
+        dict: {'removed': [路径], 'added': [条目信息], 'updated': [大小变化的祖先文件夹信息]}，
+              索引不可用时返回None（前端重新加载）
+    """
+    if not metadata_db.ready:
+        return None
+    ancestors = set()
+    for path in removed + added:
+        parent = os.path.dirname(path)
+        while parent:
+            ancestors.add(parent)
+            parent = os.path.dirname(parent)
+    ancestors.difference_update(removed)
+    return {
+        'removed': removed,
+        'added': [info for info in map(metadata_db.get_info, added) if info is not None],
+        # 按路径排序，父文件夹在子文件夹之前（新建的父文件夹先插入）
+        'updated': [info for info in map(metadata_db.get_info, sorted(ancestors)) if info is not None]
+    }
+
+
+def batch_response(results, removed, added):
+    succeeded = sum(1 for result in results if result['success'])
+    return jsonify({
+        'success': True,
+        'results': results,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'delta': tree_delta(removed, added)
+    })
+
+
+@app.route('/api/batch/move', methods=['POST'])
+def batch_move():
+    """批量移动：{sources: [路径], target: 目标文件夹}，返回每个条目的结果和文件树变化"""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            sources = parse_batch_items(data, 'sources')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        target_folder = str(data.get('target', '')).strip()
+        
+        removed, added = [], []
+        
+        def move(source_path):
+            new_rel_path = move_entry(source_path, target_folder)
+            removed.append(source_path)
+            added.append(new_rel_path)
+            return {'path': new_rel_path}
+        
+        return batch_response(run_batch(sources, move), removed, added)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/batch/delete', methods=['POST'])
+def batch_delete():
+    """批量删除（移入回收站）：{paths: [路径]}，每个成功的条目返回 undo_id"""
+    try:
+        try:
+            paths = parse_batch_items(request.get_json(silent=True), 'paths')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        removed, added = [], []
+        
+        def delete(item_path):
+            undo_id = trash_entry(item_path)
+            removed.append(item_path)
+            added.append(f'.trash/{undo_id}')
+            return {'undo_id': undo_id}
+        
+        return batch_response(run_batch(paths, delete), removed, added)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/batch/restore', methods=['POST'])
+def batch_restore():
+    """批量恢复回收站条目：{undo_ids: [...]}，每个成功的条目返回恢复后的路径"""
+    try:
+        try:
+            undo_ids = parse_batch_items(request.get_json(silent=True), 'undo_ids')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        removed, added = [], []
+        
+        def restore(undo_id):
+            original_path = restore_entry(undo_id)
+            removed.append(f'.trash/{undo_id}')
+            added.append(original_path)
+            return {'path': original_path}
+        
+        return batch_response(run_batch(undo_ids, restore), removed, added)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/batch/download', methods=['POST'])
+def batch_download():
+    """批量下载：{paths: [路径]}，校验每个条目并返回下载地址（文件夹的地址下载ZIP）"""
+    try:
+        try:
+            paths = parse_batch_items(request.get_json(silent=True), 'paths')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        def check(file_path):
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], file_path)
+            if not path_utils.get_relative_path(filepath, app.config['UPLOAD_FOLDER']):
+                raise OperationError('无效的文件路径')
+            if not os.path.isfile(filepath) and not os.path.isdir(filepath):
+                raise OperationError('文件不存在', 404)
+            return {'url': f'/api/download?path={quote(file_path)}'}
+        
+        results = run_batch(paths, check)
+        succeeded = sum(1 for result in results if result['success'])
+        return jsonify({'success': True, 'results': results, 'succeeded': succeeded,
+                        'failed': len(results) - succeeded})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/batch/download-zip', methods=['POST'])
+def batch_download_zip():
+    """
+    把选中的多个文件和文件夹打包为一个ZIP下载
+
+    接受JSON {paths: [路径]} 或表单字段 paths（可重复，页面用表单提交以便浏览器直接保存响应）
+    """
+    try:
+        data = request.get_json(silent=True) or {'paths': request.form.getlist('paths')}
+        try:
+            paths = parse_batch_items(data, 'paths')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        # 开始发送前校验全部条目，出错时仍可以返回JSON错误
+        items = []
+        used_names = set()
+        for file_path in paths:
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], file_path)
+            rel_path = path_utils.get_relative_path(filepath, app.config['UPLOAD_FOLDER'])
+            if not rel_path or rel_path == '.':
+                return jsonify({'success': False, 'error': f'无效的文件路径: {file_path}'}), 400
+            if not os.path.exists(filepath):
+                return jsonify({'success': False, 'error': f'文件不存在: {file_path}'}), 404
+            items.append((filepath, zip_stream.unique_arcname(os.path.basename(rel_path), used_names)))
+        
+        if len(items) == 1:
+            download_name = f'{items[0][1]}.zip'
+        else:
+            download_name = f"download_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        return zip_response(items, download_name)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# ==================== 响应压缩 ====================
+
+@app.after_request
+def compress_response(response):
+    """按 Accept-Encoding 压缩响应（文件响应和SSE不压缩）"""
+    if compressor is None:
+        return response
+    return compressor.apply(request, response)
+
+
 # ==================== 错误处理 ====================
 
 @app.errorhandler(RequestEntityTooLarge)
@@ -906,4 +1996,8 @@ if __name__ == '__main__':
     ========================================
     """)
     
+    # 调试模式下重载器会启动两个进程，只在实际处理请求的子进程中启动后台服务
+    if not config.DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
+    
     app.run(host=config.HOST, port=config.PORT, debug=config.DEBUG)
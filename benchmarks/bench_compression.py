@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响应压缩测试
+在临时目录中生成测试数据，在进程内启动应用，分别以不压缩和每种可用的压缩算法请求各接口，
+报告接口耗时、压缩后的响应大小、节省的字节比例和压缩一次响应的CPU时间。
+响应大小按实际发送方式测量（流式搜索每个数据块压缩后立即刷新，比整体压缩略大）。
+
+用法:
+    python benchmarks/bench_compression.py [--folders 50] [--files 200] [--repeat 5]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src import compression  # noqa: E402
+
+
+def make_dataset(upload_folder, folders, files_per_folder):
+    """生成测试数据：若干文件夹的小文件、一个小文本文件和一个大日志文件"""
+    for i in range(folders):
+        folder = os.path.join(upload_folder, f'project_{i:03d}')
+        os.makedirs(folder)
+        for j in range(files_per_folder):
+            with open(os.path.join(folder, f'report_{j:04d}.txt'), 'w') as f:
+                f.write(f'{i}-{j}\n' * (j % 50 + 1))
+    with open(os.path.join(upload_folder, 'notes.txt'), 'w', encoding='utf-8') as f:
+        f.write('网盘压缩测试 notes line\n' * 20000)
+    with open(os.path.join(upload_folder, 'server.log'), 'w', encoding='utf-8') as f:
+        for i in range(500000):
+            f.write(f'2024-01-01 12:{i // 60 % 60:02d}:{i % 60:02d} INFO request {i} handled in {i % 97} ms\n')
+
+
+def routes(folders):
+    return [
+        ('文件树', '/api/tree'),
+        ('目录列表', f'/api/list?path=project_{folders // 2:03d}&limit=1000'),
+        ('文件名搜索', '/api/search?q=report_00&limit=1000'),
+        ('流式搜索', '/api/search/stream?q=report_00'),
+        ('文本预览', '/api/preview?path=notes.txt'),
+        ('文本分页', '/api/preview/text?path=server.log&line=250000'),
+    ]
+
+
+def median(timings):
+    timings = sorted(timings)
+    return timings[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='响应压缩测试')
+    parser.add_argument('--folders', type=int, default=50, help='文件夹数')
+    parser.add_argument('--files', type=int, default=200, help='每个文件夹的文件数')
+    parser.add_argument('--repeat', type=int, default=5, help='每项测量重复次数')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_compression_')
+    try:
+        make_dataset(os.path.join(workdir, 'uploads'), args.folders, args.files)
+        # 上传目录和内部数据目录都是相对路径，落在测试目录中
+        os.chdir(workdir)
+        import app as webapp
+        webapp.start_background_services()
+        # 等待启动时的索引（包括全文索引）完成，避免后台线程影响计时
+        while not (webapp.metadata_db.ready and webapp.stats.ready and webapp.name_db.ready and webapp.content_db.ready):
+            time.sleep(0.1)
+        client = webapp.app.test_client()
+
+        encodings = [e for e in webapp.config.COMPRESSION_ENCODINGS if e in compression.ENCODERS]
+        webapp.compressor = compression.ResponseCompressor(encodings=encodings, levels=webapp.config.COMPRESSION_LEVELS,
+                                                           min_size=0)
+        print(f'可用算法: {", ".join(encodings)}（级别 {webapp.compressor.levels}）\n')
+        header = f"{'接口':<10}{'原始大小':>12}{'接口耗时':>10}"
+        for encoding in encodings:
+            header += f"{encoding + ' 大小':>14}{'节省':>8}{'压缩CPU':>10}"
+        print(header)
+
+        def request_time(url):
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                body = client.get(url, headers={'Accept-Encoding': 'identity'}).get_data()
+                timings.append(time.perf_counter() - start)
+            return body, median(timings)
+
+        def compress_time(body, encoding):
+            level = webapp.compressor.levels[encoding]
+            timings = []
+            for _ in range(args.repeat):
+                start = time.process_time()
+                compression.compress(body, encoding, level)
+                timings.append(time.process_time() - start)
+            return median(timings)
+
+        for label, url in routes(args.folders):
+            # 预热：第一次请求包含建立缓存等开销
+            client.get(url).get_data()
+            body, elapsed = request_time(url)
+            line = f'{label:<10}{len(body):>12,}{elapsed * 1000:>8.1f}ms'
+            for encoding in encodings:
+                response = client.get(url, headers={'Accept-Encoding': encoding})
+                assert response.headers.get('Content-Encoding') == encoding
+                compressed = len(response.get_data())
+                line += f'{compressed:>14,}{1 - compressed / len(body):>8.1%}{compress_time(body, encoding) * 1000:>8.1f}ms'
+            print(line)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
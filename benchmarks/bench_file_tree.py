@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件树构建性能测试
+对比旧实现（每个目录单独 os.walk 统计大小）与新实现（单次 scandir 自底向上汇总）
+
+用法:
+    python benchmarks/bench_file_tree.py [--deep-depth 12] [--wide-dirs 200] [--repeat 3]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import file_tree  # noqa: E402
+from src.file_info import get_file_info, get_folder_info  # noqa: E402
+
+
+def legacy_build_tree(directory, base_path=''):
+    """旧版实现：每个目录调用 get_folder_info（内部完整 os.walk 一次）"""
+    items = []
+    try:
+        entries = sorted(os.listdir(directory), key=str.lower)
+        for entry in entries:
+            entry_path = os.path.join(directory, entry)
+            rel_path = os.path.join(base_path, entry) if base_path else entry
+            if entry.endswith('.meta'):
+                continue
+            if os.path.isdir(entry_path):
+                folder_info = get_folder_info(entry_path, rel_path)
+                folder_info['children'] = legacy_build_tree(entry_path, rel_path)
+                items.append(folder_info)
+            else:
+                items.append(get_file_info(entry_path, rel_path))
+    except Exception:
+        pass
+    return items
+
+
+def make_deep_tree(root, depth, files_per_level):
+    """生成一条深度为 depth 的目录链，每层放 files_per_level 个文件"""
+    current = root
+    for level in range(depth):
+        for i in range(files_per_level):
+            with open(os.path.join(current, f'file_{level}_{i}.txt'), 'wb') as f:
+                f.write(b'x' * (i + 1))
+        current = os.path.join(current, f'level_{level}')
+        os.makedirs(current)
+
+
+def make_wide_tree(root, dirs, files_per_dir):
+    """生成 dirs 个两层目录，每个目录放 files_per_dir 个文件"""
+    for d in range(dirs):
+        folder = os.path.join(root, f'dir_{d:04d}', 'sub')
+        os.makedirs(folder)
+        for i in range(files_per_dir):
+            with open(os.path.join(folder, f'file_{i:04d}.bin'), 'wb') as f:
+                f.write(b'x' * (i + 1))
+
+
+def timed(func, directory, repeat):
+    """返回多次运行中的最短耗时和最后一次结果"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(directory)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_case(name, root, repeat):
+    legacy_time, legacy_result = timed(legacy_build_tree, root, repeat)
+    new_time, new_result = timed(file_tree.build_tree, root, repeat)
+    same = json.dumps(legacy_result, sort_keys=True) == json.dumps(new_result, sort_keys=True)
+    speedup = legacy_time / new_time if new_time else float('inf')
+    print(f"{name:<8} 旧实现: {legacy_time * 1000:10.1f} ms   新实现: {new_time * 1000:10.1f} ms   "
+          f"加速: {speedup:6.1f}x   结果一致: {same}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='文件树构建性能测试')
+    parser.add_argument('--deep-depth', type=int, default=12, help='深层树的深度')
+    parser.add_argument('--deep-files', type=int, default=200, help='深层树每层的文件数')
+    parser.add_argument('--wide-dirs', type=int, default=200, help='宽树的目录数')
+    parser.add_argument('--wide-files', type=int, default=50, help='宽树每个目录的文件数')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数（取最短耗时）')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='clouddisk_bench_')
+    try:
+        deep_root = os.path.join(workdir, 'deep')
+        wide_root = os.path.join(workdir, 'wide')
+        os.makedirs(deep_root)
+        os.makedirs(wide_root)
+        make_deep_tree(deep_root, args.deep_depth, args.deep_files)
+        make_wide_tree(wide_root, args.wide_dirs, args.wide_files)
+
+        run_case('deep', deep_root, args.repeat)
+        run_case('wide', wide_root, args.repeat)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
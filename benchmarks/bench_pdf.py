@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF转JPG性能测试
+用 Pillow 生成不同页数的PDF，分别以单进程和多进程并行方式转换，报告每秒处理的页数
+
+需要安装 poppler（pdftoppm、pdfinfo）。
+
+用法:
+    python benchmarks/bench_pdf.py [--pages 10 50 200] [--workers 1 4 8] [--dpi 200]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw  # noqa: E402
+from src import pdf_utils  # noqa: E402
+
+
+def make_pdf(path, pages):
+    """生成 pages 页的A4 PDF，每页绘制一些图形和文字，避免渲染结果过于简单"""
+    images = []
+    for page in range(pages):
+        img = Image.new('RGB', (1240, 1754), 'white')
+        draw = ImageDraw.Draw(img)
+        for i in range(40):
+            y = 40 + i * 42
+            draw.rectangle([60, y, 60 + (page * 37 + i * 53) % 1100, y + 20], fill=(i * 6, 120, 255 - i * 6))
+            draw.text((70, y + 22), f'page {page + 1} line {i + 1}', fill='black')
+        images.append(img)
+    images[0].save(path, 'PDF', resolution=150, save_all=True, append_images=images[1:])
+
+
+def run_case(pdf_path, pages, workers, args):
+    start = time.perf_counter()
+    total_bytes = 0
+    count = 0
+    for _, data in pdf_utils.iter_jpg_pages(pdf_path, dpi=args.dpi, quality=args.quality,
+                                            batch_size=args.batch, page_count=pages, workers=workers):
+        total_bytes += len(data)
+        count += 1
+    elapsed = time.perf_counter() - start
+    print(f"{pages:>6} 页   进程数: {workers:>3}   耗时: {elapsed:8.2f} s   "
+          f"速度: {count / elapsed:8.2f} 页/秒   输出: {total_bytes / (1024 * 1024):8.1f} MB")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PDF转JPG性能测试')
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 50, 200], help='测试文档的页数')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1],
+                        help='并行渲染的进程数')
+    parser.add_argument('--dpi', type=int, default=200, help='输出分辨率')
+    parser.add_argument('--quality', type=int, default=95, help='JPEG质量')
+    parser.add_argument('--batch', type=int, default=8, help='每批渲染的页数')
+    args = parser.parse_args()
+
+    if not pdf_utils.find_poppler_path():
+        print('未找到 pdftoppm，请先安装 poppler')
+        sys.exit(1)
+
+    workdir = tempfile.mkdtemp(prefix='clouddisk_bench_pdf_')
+    try:
+        for pages in args.pages:
+            pdf_path = os.path.join(workdir, f'doc_{pages}.pdf')
+            make_pdf(pdf_path, pages)
+            baseline = None
+            for workers in sorted(set(args.workers)):
+                elapsed = run_case(pdf_path, pages, workers, args)
+                if baseline is None:
+                    baseline = elapsed
+                elif elapsed:
+                    print(f"{'':>29}相对 {sorted(set(args.workers))[0]} 进程加速: {baseline / elapsed:.1f}x")
+            print()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件名搜索性能测试
+生成指定数量的随机条目（不写磁盘），直接灌入内存文件名索引，报告各种匹配方式的查询耗时
+
+用法:
+    python benchmarks/bench_search.py [--entries 1000000] [--repeat 5] [--limit 100]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.name_index import NameIndex, make_filter  # noqa: E402
+from src.file_info import get_file_type  # noqa: E402
+
+WORDS = ['report', '照片', 'invoice', 'backup', '项目', 'draft', 'final', 'data', 'notes', 'IMG']
+EXTS = ['.txt', '.jpg', '.pdf', '.mp4', '.py', '.md', '']
+
+QUERIES = [
+    ('包含', 'report_123', 'substring', None),
+    ('包含（无结果）', 'zzzz', 'substring', None),
+    ('包含（中文）', '项目_42', 'substring', None),
+    ('前缀', 'invoice_99', 'prefix', None),
+    ('通配符', '*_1234?.jpg', 'glob', None),
+    ('通配符（固定前缀）', 'draft_1?3*.pdf', 'glob', None),
+    ('正则', r'^draft_\d{5}\.pdf$', 'regex', None),
+    ('模糊', 'rpt12', 'fuzzy', None),
+    ('模糊（稀疏）', 'iv123', 'fuzzy', None),
+    ('包含+过滤', 'invoice', 'substring', make_filter(exts={'.pdf'}, min_size=900 * 1024 * 1024)),
+]
+
+
+def make_rows(count):
+    """生成 count 个条目，分布在1000个文件夹中"""
+    random.seed(42)
+    rows = []
+    for i in range(count):
+        ext = random.choice(EXTS)
+        name = f'{random.choice(WORDS)}_{random.randint(0, 99999)}{ext}'
+        rows.append({
+            'path': f'dir{i % 1000}/{i}_{name}', 'name': name, 'is_dir': 0,
+            'size': random.randint(0, 1024 ** 3), 'mtime': 1.7e9 + i,
+            'type': get_file_type(ext), 'ext': ext, 'hidden': 0, 'undo_id': None, 'original_path': None
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='文件名搜索性能测试')
+    parser.add_argument('--entries', type=int, default=1000000, help='条目数')
+    parser.add_argument('--repeat', type=int, default=5, help='每个查询重复次数')
+    parser.add_argument('--limit', type=int, default=100, help='每页结果数')
+    args = parser.parse_args()
+
+    rows = make_rows(args.entries)
+    index = NameIndex()
+    start = time.perf_counter()
+    index.apply([], rows, reset=True)
+    while not index.ready:
+        time.sleep(0.05)
+    print(f'建立索引: {args.entries} 个条目，耗时 {time.perf_counter() - start:.2f} s\n')
+
+    for label, query, mode, filters in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            page = index.search(query, mode, filters, 0, args.limit)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"{label:<12} {query:<20} 结果: {len(page['results']):>4}{'+' if page['has_more'] else ' '}  "
+              f"中位数: {timings[len(timings) // 2] * 1000:7.1f} ms   最慢: {timings[-1] * 1000:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
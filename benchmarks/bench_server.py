@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务器负载测试
+在临时目录中生成测试数据，用 server.py 启动指定的服务器，
+以多个保持连接的客户端并发请求目录列表、文本预览、图片预览和文件下载，输出吞吐量和延迟。
+
+也可以用 --url 测试已经运行的服务器（需要通过 --text/--image/--download 指定已存在的文件）。
+
+用法:
+    python benchmarks/bench_server.py [--backends gunicorn,waitress,werkzeug] [--threads 16]
+                                      [--concurrency 32] [--duration 10]
+    python benchmarks/bench_server.py --url http://127.0.0.1:8000 --download big.bin --text a.txt --image a.png
+"""
+import os
+import sys
+import time
+import shutil
+import signal
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit, quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_dataset(upload_folder, folders, files_per_folder, download_mb):
+    """生成测试数据：若干文件夹的小文件、一个文本文件、一张图片和一个大文件"""
+    for i in range(folders):
+        folder = os.path.join(upload_folder, f'folder_{i:03d}')
+        os.makedirs(folder)
+        for j in range(files_per_folder):
+            with open(os.path.join(folder, f'file_{j:04d}.txt'), 'w') as f:
+                f.write(f'{i}-{j}\n' * 20)
+    with open(os.path.join(upload_folder, 'preview.txt'), 'w', encoding='utf-8') as f:
+        f.write('网盘负载测试 preview line\n' * 4000)
+    with open(os.path.join(upload_folder, 'preview.png'), 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n' + os.urandom(200 * 1024))
+    with open(os.path.join(upload_folder, 'download.bin'), 'wb') as f:
+        block = os.urandom(1024 * 1024)
+        for _ in range(download_mb):
+            f.write(block)
+    return {'text': 'preview.txt', 'image': 'preview.png', 'download': 'download.bin'}
+
+
+def wait_until_ready(host, port, timeout=60):
+    """等待服务器开始接受连接并完成索引"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request('GET', '/api/stats')
+            response = conn.getresponse()
+            body = response.read()
+            conn.close()
+            # 统计就绪（返回了回收站等分布）说明启动时的索引扫描已经完成
+            if response.status == 200 and b'"trash"' in body:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def start_server(backend, workdir, port, threads):
+    """在测试目录中启动 server.py（上传目录和内部数据目录都是相对路径，落在测试目录中）"""
+    cmd = [sys.executable, os.path.join(ROOT, 'server.py'), '--backend', backend,
+           '--host', '127.0.0.1', '--port', str(port), '--threads', str(threads)]
+    return subprocess.Popen(cmd, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=True)
+
+
+def stop_server(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=30)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def run_load(host, port, path, concurrency, duration):
+    """
+    多个客户端线程在保持连接上循环请求同一路径
+
+    Returns:
+        dict: requests、errors、bytes、latencies（秒）
+    """
+    stop_at = time.monotonic() + duration
+    lock = threading.Lock()
+    totals = {'requests': 0, 'errors': 0, 'bytes': 0, 'latencies': []}
+
+    def client():
+        conn = http.client.HTTPConnection(host, port, timeout=60)
+        latencies = []
+        requests = errors = received = 0
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                while True:
+                    chunk = response.read(256 * 1024)
+                    if not chunk:
+                        break
+                    received += len(chunk)
+                if response.status != 200:
+                    errors += 1
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=60)
+                continue
+            latencies.append(time.perf_counter() - start)
+            requests += 1
+        conn.close()
+        with lock:
+            totals['requests'] += requests
+            totals['errors'] += errors
+            totals['bytes'] += received
+            totals['latencies'].extend(latencies)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return totals
+
+
+def report(label, totals, duration):
+    latencies = sorted(totals['latencies']) or [0]
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"  {label:<10} {totals['requests'] / duration:9.1f} 请求/s  {totals['bytes'] / duration / 1024 ** 2:8.1f} MB/s  "
+          f"p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  错误 {totals['errors']}")
+
+
+def run_scenarios(host, port, files, args):
+    scenarios = [
+        ('目录列表', '/api/list?path='),
+        ('子目录', '/api/list?path=folder_000'),
+        ('文本预览', f"/api/preview?path={quote(files['text'])}"),
+        ('图片预览', f"/api/preview?path={quote(files['image'])}"),
+        ('下载', f"/api/download?path={quote(files['download'])}"),
+    ]
+    for label, path in scenarios:
+        report(label, run_load(host, port, path, args.concurrency, args.duration), args.duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='服务器负载测试')
+    parser.add_argument('--backends', default='gunicorn,waitress,werkzeug', help='依次测试的服务器')
+    parser.add_argument('--threads', type=int, default=16, help='服务器线程数')
+    parser.add_argument('--concurrency', type=int, default=32, help='并发客户端数')
+    parser.add_argument('--duration', type=float, default=10, help='每个场景的持续时间（秒）')
+    parser.add_argument('--folders', type=int, default=50, help='生成的文件夹数')
+    parser.add_argument('--files', type=int, default=100, help='每个文件夹的文件数')
+    parser.add_argument('--download-mb', type=int, default=20, help='下载文件大小（MB）')
+    parser.add_argument('--url', help='测试已经运行的服务器，不启动服务器')
+    parser.add_argument('--text', help='--url 模式下预览的文本文件')
+    parser.add_argument('--image', help='--url 模式下预览的图片')
+    parser.add_argument('--download', help='--url 模式下下载的文件')
+    args = parser.parse_args()
+
+    if args.url:
+        url = urlsplit(args.url)
+        files = {'text': args.text, 'image': args.image, 'download': args.download}
+        if not all(files.values()):
+            parser.error('--url 模式需要指定 --text、--image 和 --download')
+        print(f'{args.url}（并发 {args.concurrency}）')
+        run_scenarios(url.hostname, url.port or 80, files, args)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='bench_server_')
+    try:
+        files = make_dataset(os.path.join(workdir, 'uploads'), args.folders, args.files, args.download_mb)
+        for backend in args.backends.split(','):
+            port = free_port()
+            process = start_server(backend, workdir, port, args.threads)
+            try:
+                if not wait_until_ready('127.0.0.1', port):
+                    print(f'{backend}: 服务器未能启动')
+                    continue
+                print(f'{backend}（{args.threads} 个线程，并发 {args.concurrency}）')
+                run_scenarios('127.0.0.1', port, files, args)
+            finally:
+                stop_server(process)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
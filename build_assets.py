@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态资源构建脚本
+压缩 static/ 中的JS和CSS，生成带内容哈希的文件名和 .br/.gz 预压缩版本，写入 config.ASSET_BUILD_FOLDER。
+页面随后引用构建结果（长期缓存）；没有构建或源文件在构建后被修改时引用源文件。
+
+每次部署（修改了JS或CSS之后）运行一次，运行中的服务器无需重启。
+
+用法:
+    python build_assets.py
+"""
+import os
+import sys
+import config
+from src import assets
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    static_folder = os.path.join(ROOT, 'static')
+    output_folder = os.path.join(ROOT, config.ASSET_BUILD_FOLDER)
+    if assets.rjsmin is None or assets.rcssmin is None:
+        print('未安装 rjsmin 或 rcssmin，对应的文件不压缩空白和注释（pip install rjsmin rcssmin）')
+    manifest = assets.build(static_folder, output_folder)
+    for path, entry in manifest.items():
+        sizes = entry['sizes']
+        line = f"{path:<16} {entry['source_size']:>9,} -> {entry['file']:<28} {sizes['identity']:>9,}"
+        for encoding in ('br', 'gzip'):
+            if encoding in sizes:
+                line += f'  {encoding}: {sizes[encoding]:>8,}'
+        print(line)
+    print(f'已写入 {output_folder}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
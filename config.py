@@ -10,6 +10,28 @@ HOST = '0.0.0.0'  # 监听所有网络接口，支持局域网访问
 PORT = 8000       # 服务端口
 DEBUG = True      # 调试模式，生产环境建议设置为False
 
+# 生产服务器配置（python server.py，不使用调试模式）
+SERVER_BACKEND = 'auto'          # auto：优先gunicorn，其次waitress，都未安装时用Werkzeug多线程服务器
+SERVER_THREADS = 16              # 处理请求的线程数（单个工作进程，索引等状态保存在进程内）
+SERVER_KEEPALIVE = 5             # 保持连接等待下一个请求的秒数
+SERVER_TIMEOUT = 120             # 工作进程无响应多少秒后重启（gunicorn）/ 空闲连接关闭时间（waitress）
+SERVER_GRACEFUL_TIMEOUT = 30     # 重载和停止时等待正在处理的请求完成的秒数
+SERVER_BACKLOG = 2048            # 等待接受的连接队列长度
+SERVER_PID_FILE = 'data/server.pid'   # 主进程PID文件（python server.py reload/stop 使用）
+SERVER_LOCK_FILE = 'data/server.lock' # 后台服务锁文件：平滑重载时新工作进程等旧进程退出后再启动后台服务
+SERVER_ACCESS_LOG = False        # 是否输出访问日志
+
+# 响应压缩配置（JSON和文本响应按 Accept-Encoding 压缩，图片、视频、下载等文件不压缩）
+COMPRESSION_ENABLED = True                        # 是否压缩响应
+COMPRESSION_ENCODINGS = ('zstd', 'br', 'gzip')    # 按偏好排列的算法，br、zstd 需要安装 brotli、zstandard
+COMPRESSION_LEVELS = {'gzip': 6, 'br': 4, 'zstd': 3}   # 各算法的压缩级别（动态响应不宜过高）
+COMPRESSION_MIN_SIZE = 1024                       # 小于该大小（字节）的响应不压缩
+COMPRESSION_STREAM_SIZE = 1024 * 1024             # 超过该大小的响应分块压缩、边压缩边发送
+
+# 静态资源构建配置（python build_assets.py 生成压缩、带内容哈希和预压缩版本的JS/CSS）
+ASSET_BUILD_FOLDER = 'static/dist'       # 构建结果目录（相对项目目录）
+ASSET_MAX_AGE = 365 * 24 * 3600          # 构建结果的浏览器缓存时间（秒），内容变化时文件名随之变化
+
 # 文件管理配置
 UPLOAD_FOLDER = 'uploads'  # 文件上传目录
 MAX_CONTENT_LENGTH = 1024 * 1024 * 1024  # 最大上传文件大小（字节），默认1GB
@@ -17,6 +39,89 @@ MAX_CONTENT_LENGTH = 1024 * 1024 * 1024  # 最大上传文件大小（字节）
 # 例如：500MB = 500 * 1024 * 1024
 # 例如：2GB = 2 * 1024 * 1024 * 1024
 
+# 内部数据配置
+DATA_FOLDER = 'data'                       # 内部数据目录（索引、缓存等），不对用户展示
+INDEX_DATABASE = 'data/metadata.db'        # 元数据索引数据库（文件树、搜索、统计使用）
+TRASH_CATALOG = 'data/trash.jsonl'         # 回收站目录文件（每个回收站条目的原始路径和名称）
+
+# 分片上传配置（断点续传，单个文件不受 MAX_CONTENT_LENGTH 限制，只限制单个分片请求）
+UPLOAD_TEMP_FOLDER = 'data/uploads'     # 未完成上传的临时目录，建议与上传目录在同一文件系统以便原子重命名
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024     # 分片大小（字节）
+UPLOAD_PARALLEL_CHUNKS = 4              # 浏览器同时上传的分片数
+UPLOAD_SESSION_EXPIRE = 24 * 3600       # 未完成的上传保留时间（秒），超时后清理
+
+# 去重存储配置（内容相同的上传文件只保存一份，各路径为硬链接；支持秒传）
+# 启用后去重的文件变为指向共享数据的只读硬链接：不能原地编辑，从外部修改（如rsync到上传目录）会改变所有副本
+DEDUP_ENABLED = False           # 是否启用去重存储（默认关闭）
+BLOB_FOLDER = 'data/blobs'      # 去重数据目录，必须与上传目录在同一文件系统（否则退化为普通存储）
+DEDUP_MIN_SIZE = 64 * 1024      # 参与去重和秒传检查的最小文件大小（字节）
+BLOB_GC_INTERVAL = 3600         # 回收不再引用的数据的间隔（秒），永久删除后也会立即回收
+
+# 批量操作配置
+BATCH_MAX_ITEMS = 1000        # 单个批量请求最多操作的条目数
+
+# 后台删除任务配置（清空回收站、永久删除文件夹）
+JOB_FOLDER = 'data/jobs'      # 任务目录，待删除的条目先重命名到这里，需要与上传目录在同一文件系统
+JOB_DELETE_WORKERS = 8        # 并行删除文件的线程数（所有任务共用）
+
+# PDF转JPG配置
+PDF_DPI = 200              # 输出图片分辨率
+PDF_JPEG_QUALITY = 95      # 输出JPEG质量
+PDF_BATCH_PAGES = 8        # 每批渲染的页数，决定转换时的峰值内存和临时磁盘占用
+PDF_WORKERS = 4            # 并行渲染的 pdftoppm 进程数（所有请求共用），可设为CPU核数；设为1则单进程转换
+PDF_CACHE_FOLDER = 'data/pdf_cache'            # 转换结果（ZIP包和单页图片）缓存目录
+PDF_CACHE_MAX_SIZE = 2 * 1024 * 1024 * 1024   # 转换结果缓存最大占用（字节），超出后按LRU淘汰
+
+# PDF按页浏览配置
+PDF_PREVIEW_DPI = 110        # 按页浏览默认分辨率
+PDF_PREVIEW_MAX_DPI = 300    # 允许请求的最大分辨率
+PDF_RENDER_MAX_PAGES = 10    # 单次预渲染最多的页数
+
+# 文本预览配置（大文件按页读取，不整体读入内存）
+TEXT_PREVIEW_INLINE_SIZE = 1024 * 1024        # 不超过该大小的文本 /api/preview 返回全部内容，更大的只返回第一页
+TEXT_PREVIEW_MAX_LINES = 2000                 # 分页接口每次最多返回的行数
+TEXT_PREVIEW_MAX_BYTES = 1024 * 1024          # 分页接口每次最多返回的字节数
+TEXT_PREVIEW_MAX_LINE_BYTES = 64 * 1024       # 单行超过该长度时截断显示
+TEXT_PREVIEW_INDEX_CACHE = 32                 # 缓存行索引的文件数
+
+# 日志跟随配置（文本浏览器中的"实时跟随"，通过Server-Sent Events推送新追加的内容）
+FOLLOW_POLL_INTERVAL = 1.0              # 检查被跟随文件的间隔（秒），文件系统监听到修改时立即检查
+FOLLOW_TAIL_BYTES = 64 * 1024           # 开始跟随时先发送文件末尾的字节数
+FOLLOW_BUFFER_BYTES = 1024 * 1024       # 每个被跟随的文件在内存中保留的最近追加的数据
+FOLLOW_MAX_STREAMS = 8                  # 同时跟随的连接数上限（每个连接占用一个服务器线程）
+FOLLOW_HEARTBEAT = 15                   # 没有新内容时发送心跳的间隔（秒）
+
+# 文件名搜索配置（内存索引，支持包含/前缀/通配符/正则/模糊匹配）
+SEARCH_PAGE_SIZE = 100        # 每页默认结果数
+SEARCH_MAX_PAGE_SIZE = 1000   # 每页最大结果数
+SEARCH_STREAM_MAX_RESULTS = 1000   # 流式搜索最多返回的结果数
+SEARCH_REGEX_TIMEOUT = 5.0         # 正则和通配符匹配单次搜索扫描的最长时间（秒），超时后停止并提示简化表达式
+
+# 存储统计配置（计数器随每次修改增量更新）
+STATS_RECONCILE_INTERVAL = 600   # 用元数据索引校对统计计数器的间隔（秒）
+
+# 全文搜索配置
+CONTENT_INDEX_DATABASE = 'data/content.db'        # 全文索引数据库
+CONTENT_INDEX_MAX_FILE_SIZE = 4 * 1024 ** 3       # 每个文件最多索引的字节数，超出部分不参与搜索（搜索结果中会标出）
+CONTENT_INDEX_CHUNK_SIZE = 4 * 1024 * 1024        # 大文件按行边界分块索引，每块的最大字节数
+CONTENT_SEARCH_LIMIT = 50                         # 单次内容搜索最多返回的结果数
+
+# 缩略图配置
+THUMBNAIL_CACHE_FOLDER = 'data/thumbnails'        # 缩略图缓存目录
+THUMBNAIL_CACHE_MAX_SIZE = 512 * 1024 * 1024      # 缩略图缓存最大占用（字节），超出后按LRU淘汰
+THUMBNAIL_WORKERS = 4                             # 同时生成缩略图的线程数
+THUMBNAIL_QUALITY = 80                            # 缩略图编码质量
+
+# 文件系统监听配置（保持索引与直接写入uploads/的修改同步，例如rsync）
+WATCHER_MODE = 'auto'        # auto：优先inotify，不可用时轮询；也可设为 inotify / polling / off
+WATCHER_POLL_INTERVAL = 5    # 轮询方式的扫描间隔（秒）
+WATCHER_DEBOUNCE = 0.5       # 事件合并时间窗口（秒）
+
+# 目录列表配置（/api/list 按需分页加载）
+LIST_PAGE_SIZE = 200       # 每页默认条目数
+LIST_MAX_PAGE_SIZE = 1000  # 每页最大条目数
+LIST_MAX_DEPTH = 3         # 单次请求最多展开的层数
+
 # 安全配置
 SECRET_KEY = 'your-secret-key-here-change-in-production'  # Flask会话密钥，生产环境请修改
 
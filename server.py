@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生产服务器入口
+app.py 直接运行时使用Werkzeug开发服务器（调试模式、自动重载），只适合开发；
+生产环境使用本脚本启动多线程服务器，按以下顺序选择可用的服务器：
+    gunicorn（Linux/macOS，gthread工作进程，支持平滑重载）
+    waitress（纯Python，Windows可用）
+    Werkzeug多线程服务器（未安装上面两者时的退化方案，不开启调试和自动重载）
+
+索引、文件系统监听、回收站目录、删除任务、日志跟随等状态保存在进程内，因此只启动一个工作进程，并发由线程处理；
+PDF渲染、缩略图生成等耗CPU的工作本身已经在子进程和线程池中执行。
+平滑重载时新旧工作进程会同时运行一段时间，后台服务由锁文件（SERVER_LOCK_FILE）保证同一时间只在一个进程中运行。
+
+用法:
+    python server.py                        # 按配置启动
+    python server.py --threads 32 --port 9000
+    python server.py reload                 # 平滑重载：新工作进程启动后旧进程处理完当前请求再退出（gunicorn），
+                                            # 新进程在旧进程退出后才启动后台服务
+    python server.py stop                   # 停止：等待正在处理的请求完成
+"""
+import os
+import sys
+import signal
+import socket
+import argparse
+import config
+
+# 已安装的服务器，auto 时按顺序选择
+BACKENDS = ('gunicorn', 'waitress', 'werkzeug')
+
+
+def detect_backend():
+    """选择第一个可用的服务器"""
+    for backend in BACKENDS[:-1]:
+        try:
+            __import__(backend)
+            return backend
+        except ImportError:
+            continue
+    return 'werkzeug'
+
+
+def get_local_ip():
+    try:
+        return socket.gethostbyname(socket.gethostname())
+    except OSError:
+        return 'localhost'
+
+
+def print_banner(args, backend):
+    print(f"""
+    ========================================
+    Web网盘服务已启动（生产模式）
+    ========================================
+    本地访问: http://127.0.0.1:{args.port}
+    局域网访问: http://{get_local_ip()}:{args.port}
+    上传目录: {config.UPLOAD_FOLDER}
+    服务器: {backend}，{args.threads} 个线程
+    ========================================
+    """)
+
+
+def ensure_parent(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def write_pid_file(path):
+    ensure_parent(path)
+    with open(path, 'w') as f:
+        f.write(f'{os.getpid()}\n')
+
+
+def remove_pid_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# ==================== gunicorn ====================
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    def post_worker_init(worker):
+        # 后台服务（文件系统监听、索引、删除任务）在工作进程中启动，不能在主进程启动后再fork
+        from app import start_background_services
+        start_background_services()
+
+    class Server(BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': f'{args.host}:{args.port}',
+                # 索引、监听、删除任务等状态保存在进程内，多个工作进程之间无法共享
+                'workers': 1,
+                'worker_class': 'gthread',
+                'threads': args.threads,
+                'keepalive': args.keepalive,
+                'timeout': args.timeout,
+                'graceful_timeout': args.graceful_timeout,
+                'backlog': config.SERVER_BACKLOG,
+                'pidfile': config.SERVER_PID_FILE,
+                'accesslog': '-' if config.SERVER_ACCESS_LOG else None,
+                # 应用在工作进程中导入：平滑重载时新工作进程加载新代码，SQLite连接也不会跨fork共享
+                'preload_app': False,
+                'post_worker_init': post_worker_init,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import app
+            return app
+
+    ensure_parent(config.SERVER_PID_FILE)
+    Server().run()
+
+
+# ==================== waitress / Werkzeug ====================
+
+def run_waitress(args):
+    import waitress
+    from app import app, start_background_services
+
+    start_background_services()
+    write_pid_file(config.SERVER_PID_FILE)
+    try:
+        # waitress 没有单独的保持连接时间，空闲连接在 channel_timeout 后关闭
+        waitress.serve(app, host=args.host, port=args.port, threads=args.threads,
+                       channel_timeout=args.timeout, backlog=config.SERVER_BACKLOG,
+                       connection_limit=max(100, args.threads * 8), ident='clouddisk')
+    finally:
+        remove_pid_file(config.SERVER_PID_FILE)
+
+
+def run_werkzeug(args):
+    from werkzeug.serving import make_server
+    from app import app, start_background_services
+
+    print('未安装 gunicorn 或 waitress，使用Werkzeug多线程服务器（pip install gunicorn 以获得更好的性能）')
+    start_background_services()
+    server = make_server(args.host, args.port, app, threaded=True)
+
+    def shutdown(signum, frame):
+        # serve_forever 所在线程不能直接调用 shutdown，交给另一个线程
+        import threading
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    write_pid_file(config.SERVER_PID_FILE)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        remove_pid_file(config.SERVER_PID_FILE)
+
+
+# ==================== 控制命令 ====================
+
+def send_signal(sig):
+    """向运行中的服务器主进程发送信号"""
+    try:
+        with open(config.SERVER_PID_FILE, 'r') as f:
+            pid = int(f.read().strip())
+    except (OSError, ValueError):
+        print(f'找不到运行中的服务器（{config.SERVER_PID_FILE} 不存在）')
+        return 1
+    try:
+        os.kill(pid, sig)
+    except ProcessLookupError:
+        print(f'进程 {pid} 已不存在')
+        remove_pid_file(config.SERVER_PID_FILE)
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Web网盘生产服务器')
+    parser.add_argument('command', nargs='?', default='serve', choices=['serve', 'reload', 'stop'],
+                        help='serve 启动（默认）/ reload 平滑重载 / stop 停止')
+    parser.add_argument('--backend', default=config.SERVER_BACKEND, choices=('auto',) + BACKENDS,
+                        help='服务器，默认按配置')
+    parser.add_argument('--host', default=config.HOST)
+    parser.add_argument('--port', type=int, default=config.PORT)
+    parser.add_argument('--threads', type=int, default=config.SERVER_THREADS, help='处理请求的线程数')
+    parser.add_argument('--keepalive', type=int, default=config.SERVER_KEEPALIVE, help='保持连接的秒数')
+    parser.add_argument('--timeout', type=int, default=config.SERVER_TIMEOUT, help='超时秒数')
+    parser.add_argument('--graceful-timeout', type=int, default=config.SERVER_GRACEFUL_TIMEOUT,
+                        help='重载和停止时等待请求完成的秒数')
+    args = parser.parse_args()
+
+    if args.command == 'reload':
+        if not hasattr(signal, 'SIGHUP'):
+            print('当前平台不支持平滑重载')
+            return 1
+        return send_signal(signal.SIGHUP)
+    if args.command == 'stop':
+        return send_signal(signal.SIGTERM)
+
+    backend = detect_backend() if args.backend == 'auto' else args.backend
+    print_banner(args, backend)
+    if backend == 'gunicorn':
+        run_gunicorn(args)
+    elif backend == 'waitress':
+        run_waitress(args)
+    else:
+        run_werkzeug(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态资源构建模块
+构建（python build_assets.py）：压缩JS和CSS（去掉注释和空白），按内容哈希命名，例如 js/main.3f2a9c1b0d.js，
+同时生成 .br/.gz 预压缩版本（构建时使用最高压缩级别，运行时不再压缩），最后写入清单 manifest.json。
+
+运行：模板通过 asset_url() 取得资源地址，清单中有构建结果时返回带哈希的地址（可以永久缓存，
+内容变化时地址随之变化），否则返回源文件。源文件在构建后被修改（大小或修改时间与清单记录的不同）时
+也返回源文件，开发时不会用到过期的构建结果。
+
+压缩JS和CSS需要安装 rjsmin、rcssmin，未安装时构建结果与源文件相同（仍然带哈希和预压缩版本）。
+"""
+import os
+import json
+import hashlib
+import threading
+from werkzeug.security import safe_join
+from . import compression
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+# 参与构建的资源（相对 static 目录）
+ASSETS = ('js/main.js', 'css/main.css')
+
+# 文件名中内容哈希的长度
+HASH_LENGTH = 10
+
+# 预压缩版本：(编码, 扩展名, 压缩级别)，br 需要安装 brotli
+PRECOMPRESSED = (('br', '.br', 11), ('gzip', '.gz', 9))
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def minify(path, data):
+    """
+    压缩JS或CSS
+
+    Returns:
+        bytes: 压缩后的内容（没有对应的压缩工具时原样返回）
+    """
+    ext = os.path.splitext(path)[1]
+    if ext == '.js' and rjsmin is not None:
+        return rjsmin.jsmin(data.decode('utf-8'), keep_bang_comments=True).encode('utf-8')
+    if ext == '.css' and rcssmin is not None:
+        return rcssmin.cssmin(data.decode('utf-8'), keep_bang_comments=True).encode('utf-8')
+    return data
+
+
+def hashed_name(path, data):
+    """在扩展名前加入内容哈希：js/main.js -> js/main.<哈希>.js"""
+    base, ext = os.path.splitext(path)
+    return f'{base}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}'
+
+
+def _write_atomic(full_path, data):
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    tmp_path = f'{full_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, full_path)
+
+
+def _read_manifest(output_folder):
+    try:
+        with open(os.path.join(output_folder, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _files_of(manifest):
+    """清单中引用的所有文件（包括预压缩版本）"""
+    files = set()
+    for entry in manifest.values():
+        files.add(entry['file'])
+        files.update(entry['file'] + ext for ext in entry['encodings'].values())
+    return files
+
+
+def build(static_folder, output_folder, assets=ASSETS):
+    """
+    构建静态资源，写入带哈希的文件、预压缩版本和清单
+
+    上一次构建的文件保留到下一次构建（部署时已经打开旧页面的浏览器仍然能加载旧资源），更早的删除。
+
+    Returns:
+        dict: 清单 {源路径: {file, size, source_size, source_mtime_ns, encodings: {编码: 扩展名}, sizes}}
+    """
+    manifest = {}
+    for path in assets:
+        source_path = os.path.join(static_folder, path)
+        st = os.stat(source_path)
+        with open(source_path, 'rb') as f:
+            data = minify(path, f.read())
+        name = hashed_name(path, data)
+        _write_atomic(os.path.join(output_folder, name), data)
+        encodings, sizes = {}, {'identity': len(data)}
+        for encoding, ext, level in PRECOMPRESSED:
+            if encoding not in compression.ENCODERS:
+                continue
+            compressed = compression.compress(data, encoding, level)
+            # 压缩后没有变小的不保留
+            if len(compressed) < len(data):
+                _write_atomic(os.path.join(output_folder, name + ext), compressed)
+                encodings[encoding] = ext
+                sizes[encoding] = len(compressed)
+        manifest[path] = {
+            'file': name,
+            'size': len(data),
+            'source_size': st.st_size,
+            'source_mtime_ns': st.st_mtime_ns,
+            'encodings': encodings,
+            'sizes': sizes,
+        }
+
+    keep = _files_of(manifest) | _files_of(_read_manifest(output_folder)) | {MANIFEST_NAME}
+    # 清单最后写入：运行中的服务器看到新清单时引用的文件都已经存在
+    _write_atomic(os.path.join(output_folder, MANIFEST_NAME),
+                  json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+    for root, _, names in os.walk(output_folder):
+        for filename in names:
+            rel_path = os.path.relpath(os.path.join(root, filename), output_folder).replace(os.sep, '/')
+            if rel_path not in keep:
+                os.remove(os.path.join(root, filename))
+    return manifest
+
+
+class AssetManifest:
+    """运行时读取构建清单（清单文件被重新构建时自动重新加载）"""
+
+    def __init__(self, static_folder, output_folder):
+        self.static_folder = static_folder
+        self.output_folder = output_folder
+        self._lock = threading.Lock()
+        self._manifest = {}
+        self._loaded_mtime = None
+
+    def _load(self):
+        try:
+            mtime = os.stat(os.path.join(self.output_folder, MANIFEST_NAME)).st_mtime_ns
+        except OSError:
+            mtime = None
+        with self._lock:
+            if mtime != self._loaded_mtime:
+                self._manifest = _read_manifest(self.output_folder) if mtime else {}
+                self._loaded_mtime = mtime
+            return self._manifest
+
+    def lookup(self, path):
+        """
+        取得源文件对应的构建结果
+
+        Returns:
+            str: 带哈希的文件名（相对构建目录）；没有构建或源文件在构建后被修改时返回None
+        """
+        entry = self._load().get(path)
+        if entry is None:
+            return None
+        try:
+            st = os.stat(os.path.join(self.static_folder, path))
+        except OSError:
+            return None
+        if st.st_size != entry['source_size'] or st.st_mtime_ns != entry['source_mtime_ns']:
+            return None
+        return entry['file']
+
+    def resolve(self, filename, accept_encodings):
+        """
+        选择要发送的文件：客户端接受时返回预压缩版本
+        （上一次构建的文件也可以访问，部署时已经打开旧页面的浏览器仍然能加载）
+
+        Args:
+            filename: 带哈希的文件名（相对构建目录）
+            accept_encodings: 请求的 Accept-Encoding（werkzeug Accept 对象）
+
+        Returns:
+            tuple: (绝对路径, Content-Encoding 或 None)；文件不存在时返回None
+        """
+        full_path = safe_join(self.output_folder, filename)
+        if full_path is None or filename == MANIFEST_NAME or not os.path.isfile(full_path):
+            return None
+        variants = {encoding: full_path + ext for encoding, ext, _ in PRECOMPRESSED if os.path.isfile(full_path + ext)}
+        encoding = accept_encodings.best_match(list(variants)) if variants else None
+        if encoding is not None:
+            return variants[encoding], encoding
+        return full_path, None
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+去重存储模块
+上传的文件在写入时计算SHA-256，内容相同的文件只保存一份：数据保存在 <blob目录>/<哈希前两位>/<哈希>，
+上传目录中的每个路径都是它的硬链接。上传目录中的文件仍然是普通文件，文件树、下载、预览等无需改动。
+
+引用计数就是文件系统的硬链接数：移入回收站、恢复、移动和重命名只是改名，不影响引用；
+永久删除和清空回收站删除路径后链接数减一。链接数只剩1（只剩blob自身）的blob由垃圾回收删除。
+
+去重的文件是只读的（所有副本共用同一份数据），本程序从不原地修改文件。
+blob目录必须与上传目录在同一文件系统；无法创建硬链接时（跨文件系统、文件系统不支持、链接数达到上限）
+退化为普通存储，这个文件不参与去重。
+"""
+import os
+import time
+import errno
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# 每次从上传流读取的块大小
+READ_BLOCK_SIZE = 1024 * 1024
+
+# 无法创建硬链接时退化为普通存储的错误
+LINK_UNSUPPORTED = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP}
+
+# 进程的 umask（mkstemp 创建的文件权限为0600，改为与普通写入的文件一致）
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def is_valid_digest(digest):
+    return isinstance(digest, str) and len(digest) == 64 and all(c in '0123456789abcdef' for c in digest)
+
+
+class BlobStore:
+    """按内容哈希保存上传文件，上传目录中的路径以硬链接引用"""
+
+    def __init__(self, blob_folder, min_size=64 * 1024):
+        self.blob_folder = blob_folder
+        # 小于该大小的文件不去重（硬链接节省不了多少空间，浏览器端也不值得计算哈希）
+        self.min_size = min_size
+        self.staging_folder = os.path.join(blob_folder, 'tmp')
+        self._lock = threading.Lock()
+        # blob 大小 -> 数量，用于上传前快速判断有没有可能已经存在
+        self._sizes = Counter()
+        self.ready = False
+        self._wakeup = threading.Event()
+        os.makedirs(self.staging_folder, exist_ok=True)
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_folder, digest[:2], digest)
+
+    def accepts(self, size):
+        """该大小的文件是否参与去重"""
+        return size is not None and size >= self.min_size
+
+    def may_exist(self, size):
+        """是否可能已经有这个大小的blob（启动扫描完成前总是返回True）"""
+        if not self.accepts(size):
+            return False
+        with self._lock:
+            return not self.ready or self._sizes[size] > 0
+
+    # ==================== 写入 ====================
+
+    def save_stream(self, stream, target_path):
+        """
+        把上传流写入目标路径，写入时计算哈希，内容已存在时只创建硬链接
+
+        Returns:
+            str: 内容的SHA-256（小文件不去重时返回None）
+        """
+        hasher = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.staging_folder)
+        try:
+            os.fchmod(fd, 0o666 & ~_UMASK)
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    block = stream.read(READ_BLOCK_SIZE)
+                    if not block:
+                        break
+                    hasher.update(block)
+                    f.write(block)
+            size = os.path.getsize(tmp_path)
+            if not self.accepts(size):
+                self._place(tmp_path, target_path)
+                return None
+            digest = hasher.hexdigest()
+            self.commit(tmp_path, digest, target_path)
+            return digest
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _place(src_path, target_path):
+        """把文件移动到目标位置（跨文件系统时复制）"""
+        try:
+            os.replace(src_path, target_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            staging_path = f'{target_path}.{os.getpid()}.uploading'
+            shutil.copyfile(src_path, staging_path)
+            os.replace(staging_path, target_path)
+            os.remove(src_path)
+
+    def commit(self, data_path, digest, target_path):
+        """
+        把已经算好哈希的数据文件存入blob目录并链接到目标路径（数据文件会被移走或删除）
+
+        Returns:
+            bool: 内容是否已经存在（只创建了硬链接，没有占用新空间）
+        """
+        blob_path = self._blob_path(digest)
+        with self._lock:
+            if os.path.exists(blob_path):
+                try:
+                    os.link(blob_path, target_path)
+                    os.remove(data_path)
+                    return True
+                except OSError as e:
+                    if e.errno not in LINK_UNSUPPORTED:
+                        raise
+                    self._place(data_path, target_path)
+                    return False
+
+            size = os.path.getsize(data_path)
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            self._place(data_path, blob_path)
+            # 所有路径共用同一份数据，设为只读，防止在外部原地修改一个路径而改变所有副本
+            os.chmod(blob_path, 0o444 & ~_UMASK)
+            try:
+                os.link(blob_path, target_path)
+            except OSError as e:
+                if e.errno not in LINK_UNSUPPORTED:
+                    # 没有被引用的blob留给垃圾回收
+                    self._sizes[size] += 1
+                    raise
+                # 不支持硬链接：数据直接作为普通文件
+                self._place(blob_path, target_path)
+                return False
+            self._sizes[size] += 1
+            return False
+
+    def link(self, digest, size, target_path):
+        """
+        秒传：内容已存在时直接链接到目标路径
+
+        Returns:
+            bool: 是否已链接（不存在、大小不符或无法创建硬链接时返回False，需要正常上传）
+        """
+        if not is_valid_digest(digest) or not self.accepts(size):
+            return False
+        blob_path = self._blob_path(digest)
+        with self._lock:
+            try:
+                if os.stat(blob_path).st_size != size:
+                    return False
+                os.link(blob_path, target_path)
+            except FileNotFoundError:
+                return False
+            except OSError as e:
+                if e.errno not in LINK_UNSUPPORTED:
+                    raise
+                return False
+        return True
+
+    # ==================== 垃圾回收 ====================
+
+    def _iter_blobs(self):
+        try:
+            prefixes = os.listdir(self.blob_folder)
+        except FileNotFoundError:
+            return
+        for prefix in prefixes:
+            if len(prefix) != 2:
+                continue
+            try:
+                with os.scandir(os.path.join(self.blob_folder, prefix)) as it:
+                    for entry in it:
+                        if is_valid_digest(entry.name):
+                            yield entry.path
+            except NotADirectoryError:
+                continue
+
+    def scan(self):
+        """启动时统计现有blob的大小，清理上次运行留下的临时文件"""
+        for name in os.listdir(self.staging_folder):
+            try:
+                os.remove(os.path.join(self.staging_folder, name))
+            except OSError:
+                pass
+        sizes = Counter()
+        for blob_path in self._iter_blobs():
+            try:
+                sizes[os.stat(blob_path).st_size] += 1
+            except FileNotFoundError:
+                continue
+        with self._lock:
+            self._sizes = sizes
+            self.ready = True
+
+    def collect(self):
+        """
+        删除不再被任何路径引用的blob（硬链接数为1）
+
+        Returns:
+            tuple: (删除的blob数, 释放的字节数)
+        """
+        removed = freed = 0
+        for blob_path in self._iter_blobs():
+            # 与写入互斥：检查链接数和删除之间不会有新的链接
+            with self._lock:
+                try:
+                    st = os.stat(blob_path)
+                    if st.st_nlink > 1:
+                        continue
+                    os.remove(blob_path)
+                except FileNotFoundError:
+                    continue
+                self._sizes[st.st_size] -= 1
+                if self._sizes[st.st_size] <= 0:
+                    del self._sizes[st.st_size]
+            removed += 1
+            freed += st.st_size
+        if removed:
+            logger.info(f'去重存储回收了 {removed} 个不再引用的blob，释放 {freed} 字节')
+        return removed, freed
+
+    def request_collect(self):
+        """删除文件后调用，唤醒后台线程尽快回收"""
+        self._wakeup.set()
+
+    def start(self, interval):
+        """后台线程：启动扫描，然后定期（或被唤醒时）回收"""
+        def run():
+            self.scan()
+            while True:
+                try:
+                    self.collect()
+                except Exception as e:
+                    logger.warning(f'去重存储回收失败: {e}')
+                self._wakeup.wait(interval)
+                self._wakeup.clear()
+                # 合并短时间内的多次唤醒（例如删除任务逐批完成）
+                time.sleep(1)
+
+        threading.Thread(target=run, name='blob-gc', daemon=True).start()
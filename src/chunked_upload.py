@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分片上传模块
+支持断点续传的分片上传协议：初始化 -> 并发上传编号分片 -> 查询进度 -> 完成（原子重命名到目标位置）。
+
+每个上传会话在临时目录中占用一个子目录：
+    meta.json   会话信息（文件名、目标文件夹、大小、分片大小）
+    data.part   预分配的数据文件，各分片按偏移量直接写入，可以乱序、并发到达
+    chunks      分片位图，每个分片一个字节，写入完成后置 1
+
+启用去重存储时，分片到达后按顺序计算SHA-256（刚写入的分片还在页缓存中，读取很快），
+完成上传时数据交给去重存储；哈希状态只保存在内存中，服务重启后完成上传时从头计算。
+"""
+import os
+import json
+import time
+import uuid
+import errno
+import shutil
+import hashlib
+import threading
+
+# 每次从请求流读取的块大小
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """分片上传错误，status 为建议返回的HTTP状态码"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ChunkedUploadManager:
+    """分片上传会话管理"""
+
+    def __init__(self, temp_folder, chunk_size=8 * 1024 * 1024, expire_seconds=24 * 3600, blob_store=None):
+        self.temp_folder = temp_folder
+        self.chunk_size = chunk_size
+        self.expire_seconds = expire_seconds
+        # 去重存储（BlobStore），为None时完成上传直接重命名到目标位置
+        self.blob_store = blob_store
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        # upload_id -> [sha256对象, 下一个要计算的分片编号]
+        self._hashers = {}
+        os.makedirs(temp_folder, exist_ok=True)
+
+    # ==================== 会话存储 ====================
+
+    def _session_dir(self, upload_id):
+        # upload_id 来自URL，只接受本模块生成的十六进制ID，防止路径穿越
+        if not upload_id or len(upload_id) != 32 or any(c not in '0123456789abcdef' for c in upload_id):
+            raise UploadError('无效的上传ID', 400)
+        return os.path.join(self.temp_folder, upload_id)
+
+    def _lock_for(self, upload_id):
+        with self._locks_lock:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def _load(self, upload_id):
+        session_dir = self._session_dir(upload_id)
+        try:
+            with open(os.path.join(session_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadError('上传会话不存在或已过期', 404)
+
+    def _received(self, upload_id, total_chunks):
+        """读取分片位图，返回已收到的分片编号列表"""
+        if total_chunks == 0:
+            return []
+        with open(os.path.join(self._session_dir(upload_id), 'chunks'), 'rb') as f:
+            bitmap = f.read(total_chunks)
+        return [i for i, flag in enumerate(bitmap) if flag]
+
+    # ==================== 协议操作 ====================
+
+    def create(self, filename, folder, size, chunk_size=None):
+        """
+        初始化上传会话
+
+        Returns:
+            dict: 会话状态
+        """
+        if size < 0:
+            raise UploadError('无效的文件大小')
+        chunk_size = chunk_size or self.chunk_size
+        total_chunks = (size + chunk_size - 1) // chunk_size
+
+        free_space = shutil.disk_usage(self.temp_folder).free
+        if size > free_space:
+            raise UploadError('服务器磁盘空间不足', 507)
+
+        self.cleanup_expired()
+
+        upload_id = uuid.uuid4().hex
+        session_dir = self._session_dir(upload_id)
+        os.makedirs(session_dir)
+
+        # 预分配数据文件和分片位图，之后各分片按偏移量写入
+        with open(os.path.join(session_dir, 'data.part'), 'wb') as f:
+            f.truncate(size)
+        with open(os.path.join(session_dir, 'chunks'), 'wb') as f:
+            f.write(b'\0' * total_chunks)
+
+        meta = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'folder': folder,
+            'size': size,
+            'chunk_size': chunk_size,
+            'total_chunks': total_chunks,
+            'created_at': time.time()
+        }
+        with open(os.path.join(session_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        return self.status(upload_id)
+
+    def status(self, upload_id):
+        """查询上传进度"""
+        meta = self._load(upload_id)
+        received = self._received(upload_id, meta['total_chunks'])
+        return dict(meta, received=received, complete=len(received) == meta['total_chunks'])
+
+    def write_chunk(self, upload_id, index, stream, length):
+        """
+        写入一个分片（可以并发调用，不同分片写入不同偏移量）
+
+        Args:
+            upload_id: 上传ID
+            index: 分片编号（从0开始）
+            stream: 请求体数据流
+            length: 请求体长度（Content-Length）
+        """
+        meta = self._load(upload_id)
+        if index < 0 or index >= meta['total_chunks']:
+            raise UploadError('分片编号超出范围')
+
+        offset = index * meta['chunk_size']
+        expected = min(meta['chunk_size'], meta['size'] - offset)
+        if length is not None and length != expected:
+            raise UploadError(f'分片大小错误：应为 {expected} 字节，实际 {length} 字节')
+
+        session_dir = self._session_dir(upload_id)
+        written = 0
+        fd = os.open(os.path.join(session_dir, 'data.part'), os.O_WRONLY)
+        try:
+            while written < expected:
+                block = stream.read(min(READ_BLOCK_SIZE, expected - written))
+                if not block:
+                    break
+                os.pwrite(fd, block, offset + written)
+                written += len(block)
+            if written != expected:
+                raise UploadError('分片数据不完整，请重试')
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        # 数据落盘后再标记分片完成
+        bitmap_fd = os.open(os.path.join(session_dir, 'chunks'), os.O_WRONLY)
+        try:
+            os.pwrite(bitmap_fd, b'\1', index)
+        finally:
+            os.close(bitmap_fd)
+
+        if self.blob_store and self.blob_store.accepts(meta['size']):
+            with self._lock_for(upload_id):
+                self._advance_hash(upload_id, meta)
+        return expected
+
+    def _advance_hash(self, upload_id, meta):
+        """按顺序计算已连续到达的分片的哈希（调用方持有该上传的锁）"""
+        hasher = self._hashers.setdefault(upload_id, [hashlib.sha256(), 0])
+        received = set(self._received(upload_id, meta['total_chunks']))
+        if hasher[1] not in received:
+            return hasher[0]
+        fd = os.open(os.path.join(self._session_dir(upload_id), 'data.part'), os.O_RDONLY)
+        try:
+            while hasher[1] in received:
+                offset = hasher[1] * meta['chunk_size']
+                end = min(offset + meta['chunk_size'], meta['size'])
+                while offset < end:
+                    block = os.pread(fd, min(READ_BLOCK_SIZE, end - offset), offset)
+                    if not block:
+                        raise UploadError('分片数据不完整，请重试', 500)
+                    hasher[0].update(block)
+                    offset += len(block)
+                hasher[1] += 1
+        finally:
+            os.close(fd)
+        return hasher[0]
+
+    def finalize(self, upload_id, resolve_target):
+        """
+        完成上传：检查所有分片都已到达，然后把数据文件原子地重命名到目标位置（或交给去重存储）
+
+        Args:
+            upload_id: 上传ID
+            resolve_target: resolve_target(meta) -> (目标绝对路径, 相对路径)，在加锁后调用，
+                            用于处理同名文件等情况
+
+        Returns:
+            tuple: (目标绝对路径, 相对路径)
+        """
+        with self._lock_for(upload_id):
+            meta = self._load(upload_id)
+            received = self._received(upload_id, meta['total_chunks'])
+            missing = meta['total_chunks'] - len(received)
+            if missing:
+                raise UploadError(f'还有 {missing} 个分片未上传', 409)
+
+            target_path, rel_path = resolve_target(meta)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            part_path = os.path.join(self._session_dir(upload_id), 'data.part')
+            if self.blob_store and self.blob_store.accepts(meta['size']):
+                digest = self._advance_hash(upload_id, meta).hexdigest()
+                self.blob_store.commit(part_path, digest, target_path)
+                self.abort(upload_id)
+                return target_path, rel_path
+            try:
+                os.replace(part_path, target_path)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                # 临时目录与上传目录不在同一文件系统时无法原子重命名，先复制到目标目录再重命名
+                staging_path = f'{target_path}.{upload_id}.uploading'
+                shutil.copyfile(part_path, staging_path)
+                os.replace(staging_path, target_path)
+
+            self.abort(upload_id)
+            return target_path, rel_path
+
+    def abort(self, upload_id):
+        """取消上传并删除临时数据"""
+        shutil.rmtree(self._session_dir(upload_id), ignore_errors=True)
+        with self._locks_lock:
+            self._locks.pop(upload_id, None)
+        self._hashers.pop(upload_id, None)
+
+    def cleanup_expired(self):
+        """删除超过保留时间仍未完成的上传会话"""
+        now = time.time()
+        try:
+            entries = os.listdir(self.temp_folder)
+        except OSError:
+            return
+        for entry in entries:
+            session_dir = os.path.join(self.temp_folder, entry)
+            try:
+                if now - os.path.getmtime(os.path.join(session_dir, 'chunks')) > self.expire_seconds:
+                    shutil.rmtree(session_dir, ignore_errors=True)
+            except OSError:
+                continue
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响应压缩模块
+根据请求的 Accept-Encoding 协商压缩算法（zstd、br、gzip），压缩文件树、搜索结果、文本预览等JSON和文本响应。
+
+- 小于 min_size 的响应不压缩（压缩后节省不了几个字节，还要多花CPU）
+- 超过 stream_size 的响应分块压缩，边压缩边发送（chunked），不需要等整个响应压缩完
+- 流式响应（例如NDJSON流式搜索）每个数据块压缩后立即刷新，客户端仍然能边收边处理
+- send_file/file_response 返回的文件（direct_passthrough：图片、视频、PDF、ZIP等，以及206范围响应）
+  和 Server-Sent Events 不压缩
+
+brotli 和 zstd 需要安装可选依赖（pip install brotli zstandard），未安装时只使用gzip。
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 分块压缩大响应时每块的大小
+BLOCK_SIZE = 256 * 1024
+
+# 默认压缩的内容类型（不含已经压缩过的图片、视频、压缩包，也不含 text/event-stream）
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'text/xml', 'text/csv', 'text/markdown',
+    'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml', 'image/svg+xml',
+}
+
+
+class _GzipEncoder:
+    def __init__(self, level):
+        # wbits=31：gzip格式（带头部和校验）
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, level):
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._obj.process(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+    def finish(self):
+        return self._obj.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, level):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._obj.flush()
+
+
+ENCODERS = {'gzip': _GzipEncoder}
+if brotli is not None:
+    ENCODERS['br'] = _BrotliEncoder
+if zstandard is not None:
+    ENCODERS['zstd'] = _ZstdEncoder
+
+# 未配置级别时使用的默认级别（在压缩率和CPU开销之间折中，适合动态响应）
+DEFAULT_LEVELS = {'gzip': 6, 'br': 4, 'zstd': 3}
+
+
+def compress(data, encoding, level=None):
+    """用指定算法一次性压缩数据"""
+    encoder = ENCODERS[encoding](DEFAULT_LEVELS[encoding] if level is None else level)
+    return encoder.compress(data) + encoder.finish()
+
+
+class ResponseCompressor:
+    """按 Accept-Encoding 压缩响应，在 after_request 中调用"""
+
+    def __init__(self, encodings=('zstd', 'br', 'gzip'), levels=None, min_size=1024,
+                 stream_size=1024 * 1024, mimetypes=None):
+        # 按服务器偏好排列的可用算法（客户端对多个算法的权重相同时选择靠前的）
+        self.encodings = [e for e in encodings if e in ENCODERS]
+        self.levels = dict(DEFAULT_LEVELS, **(levels or {}))
+        self.min_size = min_size
+        self.stream_size = stream_size
+        self.mimetypes = set(mimetypes or COMPRESSIBLE_MIMETYPES)
+
+    def _encoder(self, encoding):
+        return ENCODERS[encoding](self.levels[encoding])
+
+    def _compressible(self, response):
+        if response.direct_passthrough or response.mimetype not in self.mimetypes:
+            return False
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if 'Content-Encoding' in response.headers or 'no-transform' in response.headers.get('Cache-Control', ''):
+            return False
+        return True
+
+    def apply(self, request, response):
+        """
+        压缩响应（不需要压缩时原样返回）
+
+        Returns:
+            Response
+        """
+        if not self.encodings or not self._compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            body = self._compress_stream(response.response, encoding)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            if len(data) > self.stream_size:
+                body = self._compress_blocks(data, encoding)
+            else:
+                compressed = compress(data, encoding, self.levels[encoding])
+                if len(compressed) >= len(data):
+                    return response
+                response.set_data(compressed)
+                body = None
+
+        if body is not None:
+            # 分块发送，长度事先未知
+            response.response = body
+            response.headers.pop('Content-Length', None)
+        response.headers['Content-Encoding'] = encoding
+        # 压缩后的内容与原内容不同，强ETag需要区分
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f'{etag}-{encoding}')
+        return response
+
+    def _compress_blocks(self, data, encoding):
+        """大响应分块压缩，压缩好一块发送一块"""
+        encoder = self._encoder(encoding)
+        view = memoryview(data)
+        for start in range(0, len(data), BLOCK_SIZE):
+            chunk = encoder.compress(view[start:start + BLOCK_SIZE])
+            if chunk:
+                yield chunk
+        yield encoder.finish()
+
+    def _compress_stream(self, body, encoding):
+        """流式响应：每个数据块压缩后立即刷新"""
+        encoder = self._encoder(encoding)
+        try:
+            for chunk in body:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                if chunk:
+                    yield encoder.compress(chunk) + encoder.flush()
+            yield encoder.finish()
+        finally:
+            # 客户端断开时关闭原来的生成器，让它释放资源
+            if hasattr(body, 'close'):
+                body.close()
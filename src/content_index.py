@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全文内容索引模块
+使用 SQLite FTS5（trigram 分词）为文本文件建立倒排索引，支持任意子串匹配（包括中日韩文字，
+不需要分词词典）、bm25 相关度排序和匹配片段摘要。
+
+大文件（例如GB级的日志）按行边界分成若干块（chunks），每块是一个全文索引文档，整个文件都可以搜索；
+搜索结果按文件合并，片段取自相关度最高的块。重新索引时偏移和内容摘要都没有变化的块保留原来的索引，
+只在末尾追加内容的日志只需要写入新增的部分。
+
+trigram 只能查找3个字符以上的词，而中文词大多只有1～2个字。另有一个短词索引 content_grams：
+每块中出现过的所有1～2个字符的子串（去重，编码为十六进制token）各记一次，只记录所在的块不记录位置，
+索引很小；1～2个字符的词直接查这个索引，不需要扫描文件内容。
+
+索引在独立的数据库文件中维护，由后台线程增量更新：上传、重命名、移动、删除等操作以及文件系统监听
+只需把路径放入队列，后台线程对比文件的大小和修改时间，只重新读取有变化的文件。
+"""
+import os
+import re
+import queue
+import hashlib
+import logging
+import sqlite3
+import threading
+from .file_info import get_file_type, build_file_info
+from .file_tree import is_trash_path
+from .metadata_index import normalize_path, subtree_bounds
+from .watcher import collapse_changes, CHANGED
+
+logger = logging.getLogger(__name__)
+
+# 索引结构版本，与数据库中记录的不同时删除旧索引重新建立
+SCHEMA_VERSION = '2'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    truncated INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    doc_id INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks (doc_id, offset);
+CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5(body, tokenize='trigram');
+CREATE VIRTUAL TABLE IF NOT EXISTS content_grams USING fts5(grams, content='', detail='none');
+CREATE TABLE IF NOT EXISTS index_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# 片段中匹配文字的起止标记（控制字符不会出现在正常文本中，前端转义HTML后再替换为高亮标签）
+MARK_START = '\x01'
+MARK_END = '\x02'
+
+# trigram 分词至少需要3个字符才能使用索引，更短的词查短词索引
+MIN_INDEXED_TERM = 3
+
+# 全量扫描时每处理多少个文件提交一次
+COMMIT_BATCH = 200
+
+# 大文件分块时每块的最大字节数（在块内最后一个换行处切分）
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# 片段长度（trigram 分词下约等于字符数）
+SNIPPET_TOKENS = 64
+
+# 判断是否为二进制文件时检查的字节数
+SNIFF_SIZE = 8192
+
+
+def decode_text(data, truncated=False):
+    """
+    把文件内容解码为文本：依次尝试UTF-8和GBK，包含NUL字节的视为二进制文件
+
+    Returns:
+        str: 文本内容，无法解码时返回None
+    """
+    if b'\0' in data[:SNIFF_SIZE]:
+        return None
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # 按大小截断时末尾可能切断一个多字节字符
+        if truncated and e.start >= len(data) - 3:
+            return data[:e.start].decode('utf-8', errors='ignore')
+    try:
+        return data.decode('gbk')
+    except UnicodeDecodeError:
+        if truncated:
+            return data.decode('gbk', errors='ignore')
+        return None
+
+
+def gram_token(gram):
+    """短词索引中的token：十六进制编码，任何字符都不会被分词器拆开"""
+    return gram.encode('utf-8').hex()
+
+
+def short_grams(text):
+    """
+    文本中出现过的所有1～2个字符的子串（小写，不含空白；搜索词按空白分隔，不会跨越空白）
+
+    Returns:
+        str: 排好序的token，用空格分隔（删除时需要提供与写入时相同的内容）
+    """
+    grams = set()
+    # 日志等文本中的词大量重复，先去重
+    for word in set(text.lower().split()):
+        grams.update(word)
+        grams.update(word[i:i + 2] for i in range(len(word) - 1))
+    return ' '.join(sorted(gram_token(gram) for gram in grams))
+
+
+def _mark_terms(text, terms):
+    """在文本中给匹配的词加上高亮标记（忽略大小写）"""
+    pattern = '|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    return re.sub(f'({pattern})', f'{MARK_START}\\1{MARK_END}', text, flags=re.IGNORECASE)
+
+
+class ContentIndex:
+    """文本文件的全文索引"""
+
+    def __init__(self, db_path, upload_folder, max_file_size=4 * 1024 ** 3, chunk_size=CHUNK_SIZE):
+        self.db_path = db_path
+        self.upload_folder = upload_folder
+        self.max_file_size = max_file_size
+        self.chunk_size = chunk_size
+        self._lock = threading.RLock()
+        self._queue = queue.Queue()
+        self._thread = None
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._migrate()
+
+        # 上次运行已经完成过全量扫描时，启动后直接使用已有索引
+        state = self._conn.execute("SELECT value FROM index_state WHERE key = 'complete'").fetchone()
+        self.ready = state is not None and state['value'] == '1'
+
+    def _migrate(self):
+        """旧版本的索引（每个文件一个文档、只索引开头部分）结构不同，删除后由后台线程重新建立"""
+        tables = {row[0] for row in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if 'index_state' in tables:
+            state = self._conn.execute("SELECT value FROM index_state WHERE key = 'version'").fetchone()
+            if state is not None and state['value'] == SCHEMA_VERSION:
+                return
+        for table in ('content_fts', 'content_grams', 'chunks', 'documents', 'index_state'):
+            self._conn.execute(f'DROP TABLE IF EXISTS {table}')
+        self._conn.executescript(SCHEMA)
+        self._conn.execute("INSERT INTO index_state (key, value) VALUES ('version', ?)", (SCHEMA_VERSION,))
+        self._conn.commit()
+
+    # ==================== 后台更新 ====================
+
+    def start(self):
+        """启动后台线程：先做一次全量校对，然后处理排队的变化"""
+        self._thread = threading.Thread(target=self._run, name='content-index', daemon=True)
+        self._thread.start()
+        return self
+
+    def schedule(self, *rel_paths):
+        """登记需要同步的路径（文件或文件夹，新增、修改、删除都适用）"""
+        for rel_path in rel_paths:
+            self._queue.put(normalize_path(rel_path))
+
+    def _run(self):
+        try:
+            self.reconcile()
+        except Exception:
+            logger.exception('全文索引全量扫描失败')
+        while True:
+            paths = {self._queue.get(): CHANGED}
+            # 合并短时间内排队的路径，祖先目录已同步时跳过子路径
+            while True:
+                try:
+                    paths[self._queue.get_nowait()] = CHANGED
+                except queue.Empty:
+                    break
+            for _, rel_path in collapse_changes(paths):
+                try:
+                    self.sync(rel_path)
+                except Exception:
+                    logger.exception(f'更新全文索引失败 {rel_path}')
+
+    def reconcile(self):
+        """全量校对：索引所有有变化的文本文件，删除已不存在的文件"""
+        self.sync('')
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO index_state (key, value) VALUES ('complete', '1')")
+            self._conn.commit()
+            self.ready = True
+
+    # ==================== 索引维护 ====================
+
+    def _full_path(self, rel_path):
+        return os.path.join(self.upload_folder, rel_path) if rel_path else self.upload_folder
+
+    @staticmethod
+    def is_indexable(rel_path):
+        """只索引文本类型的文件，回收站和元数据文件不参与内容搜索"""
+        if is_trash_path(rel_path) or rel_path == '.trash' or rel_path.endswith('.meta'):
+            return False
+        name = rel_path.rsplit('/', 1)[-1]
+        ext = os.path.splitext(name)[1].lower() if '.' in name else ''
+        return get_file_type(ext) == 'text'
+
+    def _read_chunks(self, full_path):
+        """
+        按行边界把文件分成不超过 chunk_size 字节的块（超过 max_file_size 的部分不读取）；
+        一行超过 chunk_size 时在UTF-8字符边界处切开
+
+        Yields:
+            tuple: (偏移, 数据, 是否在行中间切开)
+        """
+        with open(full_path, 'rb') as f:
+            offset = 0
+            while offset < self.max_file_size:
+                f.seek(offset)
+                data = f.read(min(self.chunk_size, self.max_file_size - offset))
+                if not data:
+                    return
+                cut = False
+                if len(data) == self.chunk_size:
+                    end = data.rfind(b'\n') + 1
+                    if end == 0:
+                        # 没有换行：在最后一个字符的首字节之前切开，下一块从完整的字符开始
+                        end = len(data) - 1
+                        while end > 0 and data[end] & 0xC0 == 0x80:
+                            end -= 1
+                        end = end or len(data)
+                        cut = True
+                    data = data[:end]
+                elif not data.endswith(b'\n') and offset + len(data) >= self.max_file_size:
+                    cut = True
+                yield offset, data, cut
+                offset += len(data)
+
+    def _index_file(self, rel_path, st, existing):
+        """
+        读取文件并写入索引（调用方负责提交最后的事务，大文件每写入一块提交一次）
+
+        偏移、长度和摘要都与已索引的块相同的块保留原来的索引（例如只在末尾追加内容的日志），
+        从第一个不同的块开始重新写入。
+
+        Args:
+            existing: 已有的 documents 行，没有时为None
+        """
+        if existing is not None and existing['size'] == st.st_size and existing['mtime_ns'] == st.st_mtime_ns:
+            return False
+        with self._lock:
+            if existing is None:
+                # 大小先记为-1，中途失败时下次同步会重新处理
+                doc_id = self._conn.execute('INSERT INTO documents (path, size, mtime_ns) VALUES (?, -1, 0)',
+                                            (rel_path,)).lastrowid
+                old_chunks = []
+            else:
+                doc_id = existing['id']
+                old_chunks = self._conn.execute('SELECT * FROM chunks WHERE doc_id = ? ORDER BY offset',
+                                                (doc_id,)).fetchall()
+
+        count = 0
+        try:
+            for offset, data, cut in self._read_chunks(self._full_path(rel_path)):
+                digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+                old = old_chunks[count] if count < len(old_chunks) else None
+                if old is not None and (old['offset'], old['length'], old['digest']) == (offset, len(data), digest):
+                    count += 1
+                    continue
+                text = decode_text(data, truncated=cut)
+                if text is None:
+                    if count == 0:
+                        # 开头就无法解码的视为二进制文件，不索引
+                        raise ValueError('不是文本文件')
+                    # 中间混有二进制数据的块不索引内容，仍然记录下来，下次同步时可以跳过
+                    text = ''
+                grams = short_grams(text)
+                with self._lock:
+                    self._delete_chunks(row['id'] for row in old_chunks[count:])
+                    old_chunks = old_chunks[:count]
+                    chunk_id = self._conn.execute(
+                        'INSERT INTO chunks (doc_id, offset, length, digest) VALUES (?, ?, ?, ?)',
+                        (doc_id, offset, len(data), digest)).lastrowid
+                    self._conn.execute('INSERT INTO content_fts (rowid, body) VALUES (?, ?)', (chunk_id, text))
+                    self._conn.execute('INSERT INTO content_grams (rowid, grams) VALUES (?, ?)', (chunk_id, grams))
+                    if count:
+                        # 多块的大文件每写入一块提交一次，避免一个事务过大
+                        self._conn.commit()
+                count += 1
+        except (OSError, ValueError):
+            with self._lock:
+                self._delete_document(doc_id)
+            return False
+
+        with self._lock:
+            # 文件变短时删除多出的块
+            self._delete_chunks(row['id'] for row in old_chunks[count:])
+            self._conn.execute('UPDATE documents SET size = ?, mtime_ns = ?, truncated = ? WHERE id = ?',
+                               (st.st_size, st.st_mtime_ns, int(st.st_size > self.max_file_size), doc_id))
+        return True
+
+    def _delete_chunks(self, chunk_ids):
+        """删除若干块（调用方持有锁）"""
+        for chunk_id in chunk_ids:
+            # 不保存内容的FTS表删除时需要提供写入时的token，由正文重新生成
+            row = self._conn.execute('SELECT body FROM content_fts WHERE rowid = ?', (chunk_id,)).fetchone()
+            if row is not None:
+                self._conn.execute("INSERT INTO content_grams (content_grams, rowid, grams) VALUES ('delete', ?, ?)",
+                                   (chunk_id, short_grams(row['body'])))
+            self._conn.execute('DELETE FROM content_fts WHERE rowid = ?', (chunk_id,))
+            self._conn.execute('DELETE FROM chunks WHERE id = ?', (chunk_id,))
+
+    def _delete_document(self, doc_id):
+        """删除一个文档及其所有块（调用方持有锁）"""
+        chunk_ids = [row[0] for row in self._conn.execute('SELECT id FROM chunks WHERE doc_id = ?', (doc_id,))]
+        self._delete_chunks(chunk_ids)
+        self._conn.execute('DELETE FROM documents WHERE id = ?', (doc_id,))
+
+    def _delete_documents(self, rows):
+        with self._lock:
+            for row in rows:
+                self._delete_document(row['id'])
+
+    def _documents_under(self, rel_path):
+        """路径本身及其子树中已索引的文档"""
+        with self._lock:
+            if not rel_path:
+                rows = self._conn.execute('SELECT * FROM documents').fetchall()
+            else:
+                low, high = subtree_bounds(rel_path)
+                rows = self._conn.execute(
+                    'SELECT * FROM documents WHERE path = ? OR (path >= ? AND path < ?)', (rel_path, low, high)
+                ).fetchall()
+        return {row['path']: row for row in rows}
+
+    def sync(self, rel_path):
+        """让路径（文件或整个子树）在索引中的内容与磁盘一致"""
+        rel_path = normalize_path(rel_path)
+        existing = self._documents_under(rel_path)
+        seen = set()
+        processed = 0
+
+        full_path = self._full_path(rel_path)
+        if os.path.isdir(full_path) and not os.path.islink(full_path):
+            for dirpath, dirnames, filenames in os.walk(full_path):
+                base = normalize_path(os.path.relpath(dirpath, self.upload_folder))
+                if base == '.trash' or is_trash_path(base):
+                    dirnames[:] = []
+                    continue
+                for filename in filenames:
+                    file_rel = f'{base}/{filename}' if base else filename
+                    if not self.is_indexable(file_rel):
+                        continue
+                    try:
+                        st = os.stat(os.path.join(dirpath, filename))
+                    except OSError:
+                        continue
+                    seen.add(file_rel)
+                    if self._index_file(file_rel, st, existing.get(file_rel)):
+                        processed += 1
+                        if processed % COMMIT_BATCH == 0:
+                            with self._lock:
+                                self._conn.commit()
+        elif rel_path and self.is_indexable(rel_path):
+            try:
+                st = os.stat(full_path)
+                seen.add(rel_path)
+                self._index_file(rel_path, st, existing.get(rel_path))
+            except OSError:
+                pass
+
+        self._delete_documents([row for path, row in existing.items() if path not in seen])
+        with self._lock:
+            self._conn.commit()
+
+    # ==================== 查询 ====================
+
+    def search(self, query, limit=50):
+        """
+        搜索文件内容
+
+        Args:
+            query: 搜索词，多个词用空格分隔（同一块中同时包含所有词的文件才匹配）
+            limit: 最多返回的结果数
+
+        Returns:
+            list: 文件信息，附加 snippet（匹配片段，匹配文字用 MARK_START/MARK_END 标记）和 score；
+                  文件只有开头部分被索引时附加 truncated: True
+        """
+        terms = [term for term in query.split() if term]
+        if not terms:
+            return []
+        long_terms = [term for term in terms if len(term) >= MIN_INDEXED_TERM]
+        short_terms = [term for term in terms if len(term) < MIN_INDEXED_TERM]
+
+        conditions = []
+        params = []
+        if short_terms:
+            # 短词在短词索引中查找（每个词是一个token，块包含该词当且仅当包含这个token）
+            conditions.append('content_fts.rowid IN (SELECT rowid FROM content_grams WHERE content_grams MATCH ?)')
+            params.append(' AND '.join(gram_token(term.lower()) for term in short_terms))
+
+        if long_terms:
+            # 同一文件的多个块只保留相关度最高的一个（min 聚合时其余列取自该行），再为这些块生成片段
+            match = ' AND '.join('"' + term.replace('"', '""') + '"' for term in long_terms)
+            sql = (
+                "SELECT d.path, d.size, d.mtime_ns, d.truncated, c.id AS chunk_id, min(content_fts.rank) AS score "
+                "FROM content_fts JOIN chunks c ON c.id = content_fts.rowid JOIN documents d ON d.id = c.doc_id "
+                "WHERE content_fts MATCH ? " + ''.join(f'AND {c} ' for c in conditions) +
+                "GROUP BY c.doc_id ORDER BY score LIMIT ?"
+            )
+            with self._lock:
+                rows = self._conn.execute(sql, [match] + params + [limit]).fetchall()
+                chunk_ids = [row['chunk_id'] for row in rows]
+                snippets = dict(self._conn.execute(
+                    f"SELECT rowid, snippet(content_fts, 0, '{MARK_START}', '{MARK_END}', '…', {SNIPPET_TOKENS}) "
+                    f"FROM content_fts WHERE content_fts MATCH ? AND rowid IN ({','.join('?' * len(chunk_ids))})",
+                    [match] + chunk_ids
+                ).fetchall()) if chunk_ids else {}
+            rows = [dict(row, snippet=snippets.get(row['chunk_id'])) for row in rows]
+        else:
+            # 只有短词时没有相关度，按路径排序；每个文件取第一个匹配的块，只为返回的文件截取第一个匹配附近的文字
+            # 作为片段（中文等没有大小写的词不需要先把整个正文转为小写）
+            first = short_terms[0]
+            body = 'content_fts.body' if first.lower() == first.upper() else 'lower(content_fts.body)'
+            sql = (
+                "SELECT d.path, d.size, d.mtime_ns, d.truncated, 0 AS score, "
+                f"substr(content_fts.body, max(1, instr({body}, lower(?)) - 30), 100) AS snippet "
+                "FROM (SELECT min(c.id) AS id FROM content_fts JOIN chunks c ON c.id = content_fts.rowid "
+                "JOIN documents d ON d.id = c.doc_id WHERE " + ' AND '.join(conditions) +
+                " GROUP BY c.doc_id ORDER BY d.path LIMIT ?) AS matched "
+                "JOIN chunks c ON c.id = matched.id JOIN documents d ON d.id = c.doc_id "
+                "JOIN content_fts ON content_fts.rowid = matched.id "
+                "ORDER BY d.path"
+            )
+            with self._lock:
+                rows = self._conn.execute(sql, [first] + params + [limit]).fetchall()
+
+        results = []
+        for row in rows:
+            name = row['path'].rsplit('/', 1)[-1]
+            info = build_file_info(name, row['path'], row['size'], row['mtime_ns'] / 1e9)
+            # trigram 的 snippet 按三字组标记，可能只标记出词的一部分，且不标记短词，这里按完整的词重新标记
+            snippet = row['snippet'] or ''
+            snippet = _mark_terms(snippet.replace(MARK_START, '').replace(MARK_END, ''), terms)
+            info['snippet'] = ' '.join(snippet.split())
+            info['score'] = -row['score']
+            info['match_type'] = 'content'
+            if row['truncated']:
+                # 文件超过 max_file_size，之后的内容没有索引，可能有匹配没有找到
+                info['truncated'] = True
+            results.append(info)
+        return results
+
+    def stats(self):
+        """索引状态"""
+        with self._lock:
+            count = self._conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+        return {'documents': count, 'ready': self.ready, 'pending': self._queue.qsize()}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+磁盘缓存模块
+按内容寻址（键为调用方给出的各个字段的哈希）保存生成的文件，总大小超过上限时按最近最少使用（LRU）淘汰。
+同一个键的并发生成请求只会执行一次（single-flight），其余请求等待结果。
+"""
+import os
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def make_key(*parts):
+    """把任意字段组合成缓存键"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """大小受限的LRU磁盘缓存"""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # 文件名 -> 大小，按最近访问顺序排列
+        self._total = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def _path(self, name):
+        return os.path.join(self.root, name[:2], name)
+
+    def _ensure_loaded(self):
+        """首次使用时扫描缓存目录，按访问时间（get 时显式更新）恢复LRU顺序"""
+        if self._loaded:
+            return
+        found = []
+        if os.path.isdir(self.root):
+            for dirpath, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    filepath = os.path.join(dirpath, filename)
+                    if filename.endswith('.tmp'):
+                        # 上次运行中断时遗留的临时文件
+                        try:
+                            os.remove(filepath)
+                        except OSError:
+                            pass
+                        continue
+                    try:
+                        st = os.stat(filepath)
+                    except OSError:
+                        continue
+                    found.append((max(st.st_atime, st.st_mtime), filename, st.st_size))
+        for _, filename, size in sorted(found):
+            self._entries[filename] = size
+            self._total += size
+        self._loaded = True
+
+    def get(self, name):
+        """
+        查询缓存
+
+        Returns:
+            str: 缓存文件路径，未命中时返回None
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        path = self._path(name)
+        try:
+            # 用访问时间记录最近使用时间，重启后据此恢复LRU顺序；
+            # 修改时间保持不变，缓存文件的 ETag / Last-Modified 才能保持稳定
+            st = os.stat(path)
+            os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+        except OSError:
+            with self._lock:
+                size = self._entries.pop(name, None)
+                if size is not None:
+                    self._total -= size
+            return None
+        return path
+
+    def _commit(self, name, tmp_path):
+        path = self._path(name)
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            old = self._entries.pop(name, None)
+            if old is not None:
+                self._total -= old
+            self._entries[name] = size
+            self._total += size
+            evicted = self._evict_locked()
+        for victim in evicted:
+            try:
+                os.remove(self._path(victim))
+            except OSError:
+                pass
+        return path
+
+    def _evict_locked(self):
+        evicted = []
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            victim, size = self._entries.popitem(last=False)
+            self._total -= size
+            evicted.append(victim)
+        return evicted
+
+    def new_temp_path(self, name):
+        """生成与缓存文件同目录的临时路径（保证 os.replace 是原子操作）"""
+        directory = os.path.join(self.root, name[:2])
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f'{name}.{uuid.uuid4().hex[:8]}.tmp')
+
+    def put(self, name, producer):
+        """调用 producer(tmp_path) 写入临时文件，完成后原子地放入缓存"""
+        tmp_path = self.new_temp_path(name)
+        try:
+            producer(tmp_path)
+            return self._commit(name, tmp_path)
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def claim(self, name):
+        """
+        登记由调用者生成 name；同一键同时只有一个生成者
+
+        Returns:
+            threading.Event: 已有生成正在进行时返回其完成事件（调用者等待后重新查询），
+            登记成功时返回None，调用者生成完成（或失败）后必须调用 release(name)
+        """
+        with self._lock:
+            event = self._inflight.get(name)
+            if event is not None:
+                return event
+            self._inflight[name] = threading.Event()
+            return None
+
+    def release(self, name):
+        """结束 claim 登记的生成，唤醒等待的请求"""
+        with self._lock:
+            event = self._inflight.pop(name, None)
+        if event is not None:
+            event.set()
+
+    def get_or_create(self, name, producer):
+        """
+        获取缓存文件，不存在时生成；同一键的并发请求只生成一次
+
+        Args:
+            name: 缓存文件名（键 + 扩展名）
+            producer: producer(tmp_path)，把内容写入临时文件
+
+        Returns:
+            str: 缓存文件路径
+        """
+        while True:
+            path = self.get(name)
+            if path:
+                return path
+
+            event = self.claim(name)
+            if event is not None:
+                # 等待正在进行的生成完成后重新查询；如果生成失败，下一轮由本请求重新生成
+                event.wait()
+                continue
+
+            try:
+                return self.put(name, producer)
+            finally:
+                self.release(name)
+
+    def discard(self, name):
+        """删除缓存条目"""
+        with self._lock:
+            self._ensure_loaded()
+            size = self._entries.pop(name, None)
+            if size is not None:
+                self._total -= size
+        try:
+            os.remove(self._path(name))
+        except OSError:
+            pass
+
+    def stats(self):
+        """缓存占用统计"""
+        with self._lock:
+            self._ensure_loaded()
+            return {'entries': len(self._entries), 'total_size': self._total, 'max_size': self.max_bytes}
@@ -8,37 +8,58 @@ from datetime import datetime
 from .utils import format_size
 
 
-def get_file_info(filepath, rel_path=''):
-    """获取文件信息"""
-    stat = os.stat(filepath)
-    filename = os.path.basename(filepath)
-    ext = os.path.splitext(filename)[1].lower() if '.' in filename else ''
-    
-    # 判断文件类型
-    file_type = 'other'
+def get_file_type(ext):
+    """根据扩展名判断文件类型"""
     if ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg', '.ico']:
-        file_type = 'image'
+        return 'image'
     elif ext in ['.txt', '.md', '.json', '.xml', '.csv', '.log', '.py', '.js', '.html', '.css', '.java', '.cpp', '.c', '.h']:
-        file_type = 'text'
+        return 'text'
     elif ext in ['.pdf']:
-        file_type = 'pdf'
+        return 'pdf'
     elif ext in ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm']:
-        file_type = 'video'
+        return 'video'
     elif ext in ['.mp3', '.wav', '.ogg', '.flac', '.aac']:
-        file_type = 'audio'
+        return 'audio'
+    return 'other'
+
+
+def build_file_info(filename, rel_path, size, mtime):
+    """根据已知的大小和修改时间构建文件信息（不再访问磁盘）"""
+    ext = os.path.splitext(filename)[1].lower() if '.' in filename else ''
     
     return {
         'name': filename,
         'path': rel_path or filename,
-        'size': stat.st_size,
-        'modified': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
-        'size_human': format_size(stat.st_size),
-        'type': file_type,
+        'size': size,
+        'modified': datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S'),
+        'size_human': format_size(size),
+        'type': get_file_type(ext),
         'ext': ext,
         'is_dir': False
     }
 
 
+def build_folder_info(foldername, rel_path, total_size, mtime):
+    """根据已汇总的大小和修改时间构建文件夹信息（不再访问磁盘）"""
+    return {
+        'name': foldername,
+        'path': rel_path or foldername,
+        'size': total_size,
+        'modified': datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S'),
+        'size_human': format_size(total_size),
+        'type': 'folder',
+        'ext': '',
+        'is_dir': True
+    }
+
+
+def get_file_info(filepath, rel_path=''):
+    """获取文件信息"""
+    stat = os.stat(filepath)
+    filename = os.path.basename(filepath)
+    return build_file_info(filename, rel_path, stat.st_size, stat.st_mtime)
+
+
 def get_folder_info(folderpath, rel_path=''):
     """获取文件夹信息"""
     stat = os.stat(folderpath)
@@ -57,15 +78,4 @@ def get_folder_info(folderpath, rel_path=''):
     except:
         pass
     
-    return {
-        'name': foldername,
-        'path': rel_path or foldername,
-        'size': total_size,
-        'modified': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
-        'size_human': format_size(total_size),
-        'type': 'folder',
-        'ext': '',
-        'is_dir': True
-    }
-
-
+    return build_folder_info(foldername, rel_path, total_size, stat.st_mtime)
@@ -2,67 +2,280 @@
 # -*- coding: utf-8 -*-
 """
 文件树构建模块
+
+整棵树只用一次 os.scandir 遍历构建：每个目录的大小由已经访问过的子项自底向上汇总，
+不再对每个子目录单独执行 os.walk（旧实现中深度为 d 的文件会被重复统计 d 次）。
+list_directory 则只列出单个目录并分页，供前端按需展开。
 """
 import os
 import json
-from .file_info import get_file_info, get_folder_info
+import base64
+import bisect
+from .file_info import build_file_info, build_folder_info
+
+
+def build_tree(directory, base_path='', trash_lookup=None):
+    """
+    构建文件树结构
+
+    Args:
+        trash_lookup: 可选的回收站元数据查询函数 (undo_id) -> dict/None，不提供时读取 .meta 文件
+    """
+    items, _ = _scan_directory(directory, base_path, trash_lookup)
+    return items
+
 
+def is_trash_path(base_path):
+    """判断相对路径是否位于.trash目录中"""
+    return base_path == '.trash' or (base_path and base_path.startswith('.trash/'))
 
-def build_tree(directory, base_path=''):
-    """构建文件树结构"""
+
+def load_trash_metadata(entry_path):
+    """读取回收站条目的.meta元数据，不存在或损坏时返回None"""
+    metadata_path = entry_path + '.meta'
+    if not os.path.exists(metadata_path):
+        return None
+    try:
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except:
+        return None
+
+
+def trash_metadata(entry_path, trash_lookup=None):
+    """回收站条目的元数据：提供了查询函数时按 undo_id（条目名）查询，否则读取 .meta 文件"""
+    if trash_lookup is not None:
+        return trash_lookup(os.path.basename(entry_path))
+    return load_trash_metadata(entry_path)
+
+
+def _scan_directory(directory, base_path, trash_lookup=None):
+    """
+    扫描单个目录并递归构建子树
+
+    Returns:
+        tuple: (子项列表, 目录总大小)，总大小与 os.walk 的统计口径一致
+               （包含.meta文件，不进入符号链接目录）
+    """
     items = []
-    
+    total_size = 0
+
     try:
-        entries = sorted(os.listdir(directory), key=str.lower)
-        
-        for entry in entries:
-            entry_path = os.path.join(directory, entry)
-            rel_path = os.path.join(base_path, entry) if base_path else entry
-            
-            # 跳过元数据文件
-            if entry.endswith('.meta'):
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda e: e.name.lower())
+    except OSError:
+        return items, total_size
+
+    in_trash = is_trash_path(base_path)
+
+    for entry in entries:
+        rel_path = os.path.join(base_path, entry.name) if base_path else entry.name
+
+        try:
+            is_dir = entry.is_dir()
+            stat = entry.stat()
+        except OSError:
+            continue
+
+        # 跳过元数据文件（但计入目录大小）
+        if entry.name.endswith('.meta'):
+            if not is_dir:
+                total_size += stat.st_size
+            continue
+
+        if is_dir:
+            children, folder_size = _scan_directory(entry.path, rel_path, trash_lookup)
+            info = build_folder_info(entry.name, rel_path, folder_size, stat.st_mtime)
+            info['children'] = children
+            # os.walk 不会进入符号链接目录，保持相同的统计口径
+            if not entry.is_symlink():
+                total_size += folder_size
+        else:
+            info = build_file_info(entry.name, rel_path, stat.st_size, stat.st_mtime)
+            total_size += stat.st_size
+
+        # 如果是.trash目录中的文件，使用原始名称
+        if in_trash:
+            metadata = trash_metadata(entry.path, trash_lookup)
+            if metadata is not None:
+                original_name = metadata.get('original_name', entry.name)
+                info['name'] = original_name
+                info['original_name'] = original_name
+                info['original_path'] = metadata.get('original_path', '')
+                info['undo_id'] = entry.name
+                info['is_trash'] = True
+
+        items.append(info)
+
+    return items, total_size
+
+
+# ==================== 按需分页列目录 ====================
+
+SORT_FIELDS = ('name', 'size', 'modified', 'type')
+
+
+def _sort_key(info, sort):
+    """生成排序键，名称作为次级键保证顺序稳定、游标唯一"""
+    name_key = info['name'].lower()
+    if sort == 'size':
+        return (info['size'] or 0, name_key, info['path'])
+    if sort == 'modified':
+        return (info['mtime'], name_key, info['path'])
+    if sort == 'type':
+        # 文件夹排在前面，其余按类型、扩展名分组
+        return (0 if info['is_dir'] else 1, info['type'], info['ext'], name_key, info['path'])
+    return (name_key, info['path'])
+
+
+def encode_cursor(key):
+    """将排序键编码为不透明的游标字符串"""
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解码游标，无效时抛出ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise ValueError('无效的分页游标')
+    if not isinstance(key, list):
+        raise ValueError('无效的分页游标')
+    return tuple(key)
+
+
+def _list_entries(directory, base_path, size_lookup=None, trash_lookup=None):
+    """列出单个目录的直接子项（不递归统计文件夹大小）"""
+    items = []
+    in_trash = is_trash_path(base_path)
+
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.endswith('.meta'):
                 continue
-            
-            # 如果是.trash目录中的文件，尝试读取原始名称
-            if base_path == '.trash' or (base_path and base_path.startswith('.trash/')):
-                metadata_path = entry_path + '.meta'
-                if os.path.exists(metadata_path):
-                    try:
-                        with open(metadata_path, 'r', encoding='utf-8') as f:
-                            metadata = json.load(f)
-                            original_name = metadata.get('original_name', entry)
-                            original_path = metadata.get('original_path', '')
-                            
-                            if os.path.isdir(entry_path):
-                                folder_info = get_folder_info(entry_path, rel_path)
-                                folder_info['name'] = original_name  # 使用原始名称
-                                folder_info['original_name'] = original_name
-                                folder_info['original_path'] = original_path
-                                folder_info['undo_id'] = entry
-                                folder_info['is_trash'] = True
-                                folder_info['children'] = build_tree(entry_path, rel_path)
-                                items.append(folder_info)
-                            else:
-                                file_info = get_file_info(entry_path, rel_path)
-                                file_info['name'] = original_name  # 使用原始名称
-                                file_info['original_name'] = original_name
-                                file_info['original_path'] = original_path
-                                file_info['undo_id'] = entry
-                                file_info['is_trash'] = True
-                                items.append(file_info)
-                            continue
-                    except:
-                        pass
-            
-            if os.path.isdir(entry_path):
-                folder_info = get_folder_info(entry_path, rel_path)
-                folder_info['children'] = build_tree(entry_path, rel_path)
-                items.append(folder_info)
+            rel_path = os.path.join(base_path, entry.name) if base_path else entry.name
+            try:
+                is_dir = entry.is_dir()
+                stat = entry.stat()
+            except OSError:
+                continue
+
+            if is_dir:
+                folder_size = size_lookup(rel_path) if size_lookup else None
+                info = build_folder_info(entry.name, rel_path, folder_size or 0, stat.st_mtime)
+                if folder_size is None:
+                    info['size'] = None
+                    info['size_human'] = '-'
             else:
-                items.append(get_file_info(entry_path, rel_path))
-    except Exception as e:
-        pass
-    
+                info = build_file_info(entry.name, rel_path, stat.st_size, stat.st_mtime)
+            info['mtime'] = stat.st_mtime
+
+            if in_trash:
+                metadata = trash_metadata(entry.path, trash_lookup)
+                if metadata is not None:
+                    original_name = metadata.get('original_name', entry.name)
+                    info['name'] = original_name
+                    info['original_name'] = original_name
+                    info['original_path'] = metadata.get('original_path', '')
+                    info['undo_id'] = entry.name
+                    info['is_trash'] = True
+
+            items.append(info)
     return items
 
 
+def paginate_items(items, sort, order, limit, cursor):
+    """按排序键分页，返回(当前页, 下一页游标)"""
+    keyed = sorted(((_sort_key(info, sort), info) for info in items), key=lambda pair: pair[0])
+    keys = [key for key, _ in keyed]
+
+    if cursor is not None:
+        # 游标必须与当前排序字段的键结构一致
+        try:
+            bisect.bisect_left(keys, cursor)
+        except TypeError:
+            raise ValueError('分页游标与排序方式不匹配')
+
+    if order == 'desc':
+        end = bisect.bisect_left(keys, cursor) if cursor is not None else len(keyed)
+        start = max(0, end - limit)
+        page = [info for _, info in reversed(keyed[start:end])]
+        next_cursor = encode_cursor(keys[start]) if start > 0 else None
+    else:
+        start = bisect.bisect_right(keys, cursor) if cursor is not None else 0
+        end = start + limit
+        page = [info for _, info in keyed[start:end]]
+        next_cursor = encode_cursor(keys[end - 1]) if end < len(keyed) else None
+
+    return page, next_cursor
+
+
+def list_directory(upload_folder, rel_path='', depth=1, limit=200, cursor=None,
+                   sort='name', order='asc', size_lookup=None, trash_lookup=None):
+    """
+    按需列出目录内容（分页、服务端排序）
+
+    Args:
+        upload_folder: 上传根目录
+        rel_path: 相对于根目录的目录路径，空字符串表示根目录
+        depth: 展开层数，1 表示只列出直接子项；大于1时子文件夹附带第一页子项
+        limit: 每页条目数
+        cursor: 上一页返回的游标，None 表示第一页
+        sort: 排序字段 name/size/modified/type
+        order: asc 或 desc
+        size_lookup: 可选的文件夹大小查询函数 (rel_path) -> int/None，
+                     不提供时文件夹大小不计算（返回 None）
+        trash_lookup: 可选的回收站元数据查询函数 (undo_id) -> dict/None，不提供时读取 .meta 文件
+
+    Returns:
+        dict: {'items': [...], 'next_cursor': str/None, 'total': int}
+    """
+    if sort not in SORT_FIELDS:
+        raise ValueError(f'不支持的排序字段: {sort}')
+    if order not in ('asc', 'desc'):
+        raise ValueError(f'不支持的排序方向: {order}')
+
+    directory = os.path.join(upload_folder, rel_path) if rel_path else upload_folder
+    cursor_key = decode_cursor(cursor) if cursor else None
+
+    items = _list_entries(directory, rel_path, size_lookup, trash_lookup)
+    page, next_cursor = paginate_items(items, sort, order, limit, cursor_key)
+
+    if depth > 1:
+        for info in page:
+            if not info['is_dir']:
+                continue
+            try:
+                child = list_directory(upload_folder, info['path'], depth - 1, limit,
+                                       None, sort, order, size_lookup, trash_lookup)
+            except OSError:
+                continue
+            info['children'] = child['items']
+            info['next_cursor'] = child['next_cursor']
+            info['total'] = child['total']
+
+    return {'items': page, 'next_cursor': next_cursor, 'total': len(items)}
+
+
+def build_folder_tree(directory, base_path=''):
+    """构建只包含文件夹的树（用于文件夹选择器），不统计大小、跳过.trash"""
+    folders = []
+    try:
+        with os.scandir(directory) as it:
+            entries = sorted((e for e in it if e.is_dir()), key=lambda e: e.name.lower())
+    except OSError:
+        return folders
+
+    for entry in entries:
+        if not base_path and entry.name == '.trash':
+            continue
+        rel_path = os.path.join(base_path, entry.name) if base_path else entry.name
+        folders.append({
+            'name': entry.name,
+            'path': rel_path,
+            'is_dir': True,
+            'children': build_folder_tree(entry.path, rel_path)
+        })
+    return folders
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP文件响应模块
+为下载和预览提供条件请求（ETag / Last-Modified，命中时返回304，只需stat不读文件）和
+字节范围请求（单范围206、多范围 multipart/byteranges、无法满足时416）。
+
+完整响应和单范围响应交给WSGI服务器的 wsgi.file_wrapper 发送（gunicorn、waitress 会据此使用
+sendfile 零拷贝，并按 Content-Length 从文件当前位置开始发送）；服务器不提供时按块读取。
+"""
+import os
+import uuid
+from urllib.parse import quote
+from werkzeug.http import http_date, parse_date, parse_etags
+from werkzeug.wrappers import Response
+
+# 按块读取时每块的大小
+BLOCK_SIZE = 256 * 1024
+
+# 单个请求最多接受的范围数，超过时忽略 Range 头返回完整文件（防止大量小范围拖慢服务器）
+MAX_RANGES = 16
+
+
+def make_etag(st):
+    """根据 inode、大小和纳秒级修改时间生成强ETag（文件任何修改或替换都会改变它）"""
+    return f'"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def content_disposition(filename, as_attachment=True):
+    """生成 Content-Disposition 头，中文文件名使用RFC 5987编码并提供ASCII回退名"""
+    disposition = 'attachment' if as_attachment else 'inline'
+    if all(ord(c) < 128 for c in filename):
+        return f'{disposition}; filename="{filename}"'
+    ascii_name = ''.join(c if ord(c) < 128 else '_' for c in filename) or 'download'
+    return f"{disposition}; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename.encode('utf-8'))}"
+
+
+def parse_ranges(header, size):
+    """
+    解析 Range 请求头
+
+    Args:
+        header: Range 头的值，例如 "bytes=0-499,1000-"
+        size: 文件大小
+
+    Returns:
+        list: [(start, end), ...]（end 包含在内），重叠或相邻的范围会合并；
+              所有范围都无法满足时返回空列表；头格式无效时返回None（按规范忽略该头）
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec:
+        return None
+
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition('-')
+        first, last = first.strip(), last.strip()
+        if not sep or not (first.isdigit() or (not first and last.isdigit())) or (last and not last.isdigit()):
+            return None
+        if not first:
+            # 后缀范围：最后 N 个字节
+            length = int(last)
+            if length == 0:
+                continue
+            start, end = max(0, size - length), size - 1
+        else:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            end = min(int(last), size - 1) if last else size - 1
+        if start < size:
+            ranges.append((start, end))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _read_range(filepath, start, end):
+    """按块读取文件的 [start, end] 区间"""
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = f.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def _file_body(environ, filepath, start, end):
+    """单个区间的响应体：优先交给服务器的 file_wrapper（可使用sendfile），否则按块读取"""
+    file_wrapper = environ.get('wsgi.file_wrapper')
+    if file_wrapper is None:
+        return _read_range(filepath, start, end)
+    f = open(filepath, 'rb')
+    f.seek(start)
+    return file_wrapper(f, BLOCK_SIZE)
+
+
+def _is_not_modified(headers, etag, mtime):
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match:
+        # If-None-Match 使用弱比较，存在时忽略 If-Modified-Since
+        return parse_etags(if_none_match).contains_weak(etag.strip('"'))
+    if_modified_since = parse_date(headers.get('If-Modified-Since'))
+    return if_modified_since is not None and int(mtime) <= if_modified_since.timestamp()
+
+
+def _range_allowed(headers, etag, mtime):
+    """If-Range：验证器与当前文件一致时才按范围返回，否则返回完整文件"""
+    if_range = headers.get('If-Range')
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        # 强比较
+        return if_range == etag
+    date = parse_date(if_range)
+    return date is not None and int(mtime) == int(date.timestamp())
+
+
+def file_response(request, filepath, mimetype=None, as_attachment=False, download_name=None,
+                  cache_control='no-cache', extra_headers=None):
+    """
+    生成支持条件请求和范围请求的文件响应
+
+    Args:
+        request: 当前请求
+        filepath: 文件路径
+        mimetype: 内容类型，默认 application/octet-stream
+        as_attachment: 是否作为附件下载
+        download_name: 下载文件名（设置 Content-Disposition）
+        cache_control: Cache-Control 头
+        extra_headers: 额外的响应头
+
+    Returns:
+        Response
+    """
+    st = os.stat(filepath)
+    size = st.st_size
+    etag = make_etag(st)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(st.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': cache_control,
+    }
+    if download_name:
+        headers['Content-Disposition'] = content_disposition(download_name, as_attachment)
+    headers.update(extra_headers or {})
+    mimetype = mimetype or 'application/octet-stream'
+
+    if_match = request.headers.get('If-Match')
+    if if_match and not parse_etags(if_match).contains(etag.strip('"')):
+        return Response(status=412, headers=headers)
+
+    if request.method in ('GET', 'HEAD') and _is_not_modified(request.headers, etag, st.st_mtime):
+        return Response(status=304, headers=headers)
+
+    ranges = None
+    if request.method == 'GET' and _range_allowed(request.headers, etag, st.st_mtime):
+        ranges = parse_ranges(request.headers.get('Range'), size)
+
+    if ranges == []:
+        headers['Content-Range'] = f'bytes */{size}'
+        return Response(status=416, headers=headers)
+
+    if not ranges or (len(ranges) == 1 and ranges[0] == (0, size - 1)):
+        body = _file_body(request.environ, filepath, 0, size - 1) if size else []
+        headers['Content-Length'] = str(size)
+        return Response(body, status=200, mimetype=mimetype, headers=headers, direct_passthrough=True)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        headers['Content-Length'] = str(end - start + 1)
+        return Response(_file_body(request.environ, filepath, start, end), status=206,
+                        mimetype=mimetype, headers=headers, direct_passthrough=True)
+
+    # 多个范围：multipart/byteranges，各部分分别带 Content-Type 和 Content-Range
+    boundary = uuid.uuid4().hex
+    part_headers = [
+        (f'--{boundary}\r\nContent-Type: {mimetype}\r\n'
+         f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n').encode('latin-1')
+        for start, end in ranges
+    ]
+    closing = f'\r\n--{boundary}--\r\n'.encode('latin-1')
+    length = sum(len(h) for h in part_headers) + sum(end - start + 1 for start, end in ranges)
+    length += 2 * (len(ranges) - 1) + len(closing)
+
+    def generate():
+        for i, (start, end) in enumerate(ranges):
+            if i:
+                yield b'\r\n'
+            yield part_headers[i]
+            yield from _read_range(filepath, start, end)
+        yield closing
+
+    headers['Content-Length'] = str(length)
+    response = Response(generate(), status=206, headers=headers, direct_passthrough=True)
+    response.headers['Content-Type'] = f'multipart/byteranges; boundary={boundary}'
+    return response
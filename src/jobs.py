@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台任务模块
+清空回收站、永久删除文件夹等可能涉及大量文件的删除操作在后台执行：
+请求中只把要删除的条目原子地重命名到任务目录（立即从列表中消失），
+后台线程遍历任务目录，用共享的线程池并行删除文件，再自底向上删除文件夹。
+
+每个任务的状态（包括进度）保存在任务目录旁的 <job_id>.json 中，服务重启后未完成的任务自动继续。
+任务目录应与上传目录在同一文件系统；跨文件系统无法重命名时退化为原地删除。
+"""
+import os
+import json
+import time
+import uuid
+import errno
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# 每个删除批次的文件数
+UNLINK_BATCH = 256
+
+# 进度写入磁盘的最小间隔（秒）
+SAVE_INTERVAL = 1.0
+
+# 内存中保留的已结束任务数（已结束的任务只保留在内存中，重启后不再显示）
+FINISHED_JOBS_KEPT = 100
+
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job:
+    """一个后台删除任务"""
+
+    def __init__(self, job_id, kind, total=None, size=None, paths=None, deleted=0, created_at=None):
+        self.id = job_id
+        self.kind = kind
+        # 预计删除的条目数（文件和文件夹）和字节数，未知时为None
+        self.total = total
+        self.size = size
+        # 无法移入任务目录、需要原地删除的路径
+        self.paths = paths or []
+        self.deleted = deleted
+        self.failed = 0
+        self.state = RUNNING
+        self.error = None
+        self.created_at = created_at or time.time()
+        self.finished_at = None
+        self.lock = threading.Lock()
+
+    def add_deleted(self, count, failed=0, error=None):
+        with self.lock:
+            self.deleted += count
+            self.failed += failed
+            if error:
+                self.error = error
+
+    def to_dict(self):
+        """任务状态（接口返回内容，不包含服务器上的路径）"""
+        with self.lock:
+            progress = None
+            if self.state == DONE:
+                progress = 1.0
+            elif self.total:
+                progress = min(1.0, self.deleted / self.total)
+            return {
+                'id': self.id,
+                'kind': self.kind,
+                'state': self.state,
+                'total': self.total,
+                'size': self.size,
+                'deleted': self.deleted,
+                'failed': self.failed,
+                'progress': progress,
+                'error': self.error,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['id'], data.get('kind', 'purge'), data.get('total'), data.get('size'),
+                   data.get('paths'), data.get('deleted', 0), data.get('created_at'))
+
+
+class JobManager:
+    """后台删除任务管理"""
+
+    def __init__(self, job_folder, workers=8, on_finished=None):
+        self.job_folder = job_folder
+        self.workers = workers
+        # 任务结束（成功或失败）后的回调 (job)
+        self.on_finished = on_finished
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='purge')
+        os.makedirs(job_folder, exist_ok=True)
+
+    # ==================== 持久化 ====================
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.job_folder, job_id)
+
+    def _state_path(self, job_id):
+        return os.path.join(self.job_folder, job_id + '.json')
+
+    def _save(self, job):
+        state_path = self._state_path(job.id)
+        tmp_path = state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(job.to_dict(), paths=job.paths), f, ensure_ascii=False)
+        os.replace(tmp_path, state_path)
+
+    def resume(self):
+        """继续上次运行时未完成的任务（包括只建立了任务目录、还没写入状态的任务）"""
+        names = set(os.listdir(self.job_folder))
+        for name in sorted(names):
+            job = None
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(self.job_folder, name), 'r', encoding='utf-8') as f:
+                        job = Job.from_dict(json.load(f))
+                except (OSError, ValueError, KeyError):
+                    logger.warning(f'忽略无法读取的任务状态 {name}')
+                    continue
+            elif name.endswith('.tmp'):
+                os.remove(os.path.join(self.job_folder, name))
+            elif name + '.json' not in names:
+                job = Job(name, 'purge')
+                self._save(job)
+            if job is not None:
+                logger.info(f'继续未完成的删除任务 {job.id}（已删除 {job.deleted} 个条目）')
+                self._start(job)
+
+    # ==================== 任务 ====================
+
+    def purge(self, kind, paths, total=None, size=None):
+        """
+        创建删除任务：把 paths 移入任务目录，然后在后台删除
+
+        Args:
+            kind: 任务类型（empty-trash / permanent-delete）
+            paths: 要删除的绝对路径（文件或文件夹）
+            total: 预计删除的条目数，用于计算进度
+            size: 预计释放的字节数
+
+        Returns:
+            Job: 已启动的任务
+        """
+        job = Job(uuid.uuid4().hex, kind, total, size)
+        job_dir = self._job_dir(job.id)
+        os.makedirs(job_dir)
+        try:
+            for i, path in enumerate(paths):
+                try:
+                    os.rename(path, os.path.join(job_dir, str(i)))
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    job.paths.append(path)
+        finally:
+            # 已经移入任务目录的条目无论如何都要删除
+            self._save(job)
+            self._start(job)
+        return job
+
+    def _start(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+        threading.Thread(target=self._run, args=(job,), name=f'job-{job.id[:8]}', daemon=True).start()
+
+    def _run(self, job):
+        try:
+            for path in [self._job_dir(job.id)] + job.paths:
+                self._purge_tree(job, path)
+            with job.lock:
+                job.state = DONE
+        except Exception as e:
+            logger.exception(f'删除任务 {job.id} 失败')
+            with job.lock:
+                job.state = FAILED
+                job.error = str(e)
+        finally:
+            with job.lock:
+                job.finished_at = time.time()
+            try:
+                if job.state == DONE:
+                    os.remove(self._state_path(job.id))
+                else:
+                    # 保留状态文件，下次启动时重试
+                    self._save(job)
+            except OSError:
+                pass
+            self._trim()
+            if self.on_finished:
+                try:
+                    self.on_finished(job)
+                except Exception:
+                    logger.exception(f'删除任务 {job.id} 的结束回调失败')
+
+    def _trim(self):
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job.state != RUNNING]
+            for job_id in finished[:max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+                del self._jobs[job_id]
+
+    # ==================== 删除 ====================
+
+    @staticmethod
+    def _unlink_batch(job, paths):
+        failed = 0
+        error = None
+        for path in paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                failed += 1
+                error = str(e)
+        job.add_deleted(len(paths) - failed, failed, error)
+
+    def _purge_tree(self, job, root):
+        """删除文件或整个目录树：文件分批交给线程池并行删除，全部完成后自底向上删除文件夹"""
+        if not os.path.lexists(root):
+            return
+        if os.path.islink(root) or not os.path.isdir(root):
+            os.unlink(root)
+            job.add_deleted(1)
+            return
+
+        directories = []
+        stack = [root]
+        pending = deque()
+        last_save = time.monotonic()
+        while stack:
+            directory = stack.pop()
+            directories.append(directory)
+            batch = []
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                            continue
+                        batch.append(entry.path)
+                        if len(batch) >= UNLINK_BATCH:
+                            pending.append(self._pool.submit(self._unlink_batch, job, batch))
+                            batch = []
+            except FileNotFoundError:
+                continue
+            if batch:
+                pending.append(self._pool.submit(self._unlink_batch, job, batch))
+            # 限制排队的批次数，扫描不会远远领先于删除
+            while len(pending) > self.workers * 4:
+                pending.popleft().result()
+            if time.monotonic() - last_save >= SAVE_INTERVAL:
+                self._save(job)
+                last_save = time.monotonic()
+        while pending:
+            pending.popleft().result()
+
+        # 父目录总是先于子目录加入列表，倒序删除即可保证先删子目录
+        for directory in reversed(directories):
+            try:
+                os.rmdir(directory)
+            except FileNotFoundError:
+                continue
+            job.add_deleted(1)
+
+    # ==================== 查询 ====================
+
+    def get(self, job_id):
+        """查询任务状态，不存在时返回None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def list(self, active_only=False):
+        """任务状态列表（按创建顺序）"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in jobs if not active_only or job.state == RUNNING]
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志跟随模块
+像 tail -f 一样跟随正在写入的文件，把新追加的内容推送给浏览器（Server-Sent Events）。
+
+同一个文件无论有多少个浏览器在跟随，都只有一个 FileFollower：后台线程定期（文件系统监听到修改时立即）
+检查所有被跟随的文件，新追加的数据只读取一次，放入内存缓冲区供所有订阅者共享；
+落后较多的订阅者（例如断线重连）从文件中补读。
+
+文件被截断（copytruncate 方式的日志轮转）或被重命名后在原路径创建了新文件（rename 方式的日志轮转）时，
+订阅者收到 reset 事件，从新文件的开头继续跟随；rename 轮转时先读完旧文件中剩余的数据。
+"""
+import os
+import json
+import codecs
+import logging
+import threading
+from collections import deque
+from .text_preview import detect_encoding, SAMPLE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# 每个事件最多携带的字节数
+MAX_EVENT_BYTES = 256 * 1024
+
+# 打开的文件不能被重命名或删除的平台（Windows）上每次检查后关闭文件，避免阻碍日志轮转
+KEEP_OPEN = os.name != 'nt'
+
+
+class FollowError(Exception):
+    """无法跟随文件，status 为建议返回的HTTP状态码"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def format_event(event, data, event_id=None):
+    """编码为一条 Server-Sent Events 消息"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class FileFollower:
+    """一个文件的跟随状态，所有订阅者共享"""
+
+    def __init__(self, full_path, buffer_bytes=1024 * 1024):
+        self.full_path = full_path
+        self.buffer_bytes = buffer_bytes
+        self.subscribers = 0
+        self._cond = threading.Condition()
+        # 最近追加的数据 (开始位置, 数据)，首尾相接，总量不超过 buffer_bytes
+        self._chunks = deque()
+        self._buffered = 0
+        self._file = None
+        self.ino = None
+        # 已读取到的位置（文件当前的大小）
+        self.end = 0
+        # 文件被截断或轮转时加一
+        self.version = 0
+        self.missing = False
+        self.encoding = None
+        self.bom = 0
+        self._sampled = -1
+        self._open()
+        self.end = os.fstat(self._file.fileno()).st_size
+        self._detect_encoding()
+        if not KEEP_OPEN:
+            self._close_file()
+
+    # ==================== 文件访问（调用方持有锁） ====================
+
+    def _open(self):
+        """打开路径当前指向的文件"""
+        f = open(self.full_path, 'rb')
+        self._close_file()
+        self._file = f
+        self.ino = os.fstat(f.fileno()).st_ino
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _ensure_open(self):
+        """文件在两次检查之间被关闭时重新打开（路径已指向其他文件时返回False）"""
+        if self._file is not None:
+            return True
+        try:
+            f = open(self.full_path, 'rb')
+        except OSError:
+            return False
+        if os.fstat(f.fileno()).st_ino != self.ino:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def _read_file(self, offset, size):
+        if not self._ensure_open():
+            return b''
+        self._file.seek(offset)
+        return self._file.read(size)
+
+    def _detect_encoding(self):
+        """根据文件开头判断编码（文件还很小时，随着内容增加重新判断）"""
+        if self._sampled >= SAMPLE_SIZE or self.end <= self._sampled:
+            return
+        sample = self._read_file(0, SAMPLE_SIZE)
+        self._sampled = len(sample)
+        self.encoding, self.bom = detect_encoding(sample)
+
+    def _reset(self):
+        """文件被截断或轮转：从头开始"""
+        self.version += 1
+        self.end = 0
+        self._chunks.clear()
+        self._buffered = 0
+        self._sampled = -1
+        self.encoding, self.bom = 'utf-8', 0
+
+    def _read_new(self, size):
+        """读取新追加的数据放入缓冲区（一次追加很多时只缓存最后 buffer_bytes）"""
+        start = max(self.end, size - self.buffer_bytes)
+        data = self._read_file(start, size - start)
+        if start != self.end:
+            self._chunks.clear()
+            self._buffered = 0
+        if data:
+            self._chunks.append((start, data))
+            self._buffered += len(data)
+        self.end = start + len(data)
+        while self._buffered > self.buffer_bytes and len(self._chunks) > 1:
+            _, dropped = self._chunks.popleft()
+            self._buffered -= len(dropped)
+        self._detect_encoding()
+
+    def _read(self, offset, max_bytes):
+        """读取 [offset, end) 中的数据，缓冲区中有的直接返回，否则从文件读取"""
+        stop = min(self.end, offset + max_bytes)
+        if self._chunks and offset >= self._chunks[0][0]:
+            parts = []
+            for start, data in self._chunks:
+                if start + len(data) <= offset:
+                    continue
+                if start >= stop:
+                    break
+                parts.append(data[max(offset - start, 0):stop - start])
+            return b''.join(parts)
+        data = self._read_file(offset, stop - offset)
+        if not KEEP_OPEN:
+            self._close_file()
+        return data
+
+    # ==================== 检查变化（后台线程调用） ====================
+
+    def check(self):
+        """检查文件的变化，读取新追加的数据并唤醒订阅者"""
+        with self._cond:
+            old = (self.version, self.end, self.missing)
+            try:
+                path_ino = os.stat(self.full_path).st_ino
+            except OSError:
+                path_ino = None
+            drained = False
+            if self._ensure_open():
+                size = os.fstat(self._file.fileno()).st_size
+                if size < self.end:
+                    self._reset()
+                if size > self.end:
+                    self._read_new(size)
+                    drained = True
+            if path_ino is not None and path_ino != self.ino and not drained:
+                # 旧文件中剩余的数据已经读完并且发给了订阅者（刚读到新数据时下次检查再切换），改为跟随原路径上的新文件
+                try:
+                    self._open()
+                    self._reset()
+                    self._read_new(os.fstat(self._file.fileno()).st_size)
+                except OSError:
+                    path_ino = None
+            self.missing = path_ino is None
+            if not KEEP_OPEN:
+                self._close_file()
+            if (self.version, self.end, self.missing) != old:
+                self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._close_file()
+
+    # ==================== 订阅 ====================
+
+    def events(self, offset, heartbeat=15, max_bytes=MAX_EVENT_BYTES):
+        """
+        从 offset 开始跟随，逐个返回事件
+
+        Yields:
+            tuple: (事件类型, 数据, 事件ID)；事件类型为 append（新内容）、reset（文件被截断或轮转）、
+                   missing（文件已不存在，等待重新出现）或 ping（心跳，数据为None）
+        """
+        with self._cond:
+            version, missing = self.version, False
+        # 末尾不完整的多字节字符要等后续数据到达后再解码
+        pending = 0
+        while True:
+            # 在锁内取得事件，在锁外返回（客户端接收慢时不阻塞后台线程和其他订阅者）
+            event = data = None
+            with self._cond:
+                if self.version == version and self.missing == missing and offset + pending >= self.end:
+                    self._cond.wait(heartbeat)
+                if self.version != version:
+                    version, offset, pending = self.version, self.bom, 0
+                    event = ('reset', {'offset': offset}, f'{self.ino}:{offset}')
+                elif self.missing != missing:
+                    missing = self.missing
+                    if missing:
+                        event = ('missing', {}, None)
+                elif offset + pending >= self.end:
+                    event = ('ping', None, None)
+                else:
+                    data = self._read(offset, max_bytes)
+                    encoding, ino = self.encoding or 'utf-8', self.ino
+            if event:
+                yield event
+            if data is None:
+                continue
+
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+            text = decoder.decode(data, final=False)
+            pending = len(decoder.getstate()[0])
+            end = offset + len(data) - pending
+            if end > offset:
+                yield 'append', {'offset': offset, 'end': end, 'text': text}, f'{ino}:{end}'
+                offset = end
+
+
+class FollowManager:
+    """管理所有被跟随的文件：每个文件一个 FileFollower，由一个后台线程统一检查"""
+
+    def __init__(self, poll_interval=1.0, buffer_bytes=1024 * 1024, max_streams=8):
+        self.poll_interval = poll_interval
+        self.buffer_bytes = buffer_bytes
+        # 同时跟随的连接数上限（每个连接占用一个服务器线程）
+        self.max_streams = max_streams
+        self._followers = {}  # 绝对路径 -> FileFollower
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def open(self, full_path):
+        """
+        订阅文件（与已有的订阅者共享同一个 FileFollower），用完后调用 close
+
+        Raises:
+            FollowError: 连接数达到上限、文件不存在或是二进制文件
+        """
+        with self._lock:
+            if sum(f.subscribers for f in self._followers.values()) >= self.max_streams:
+                raise FollowError('同时跟随的连接过多，请稍后重试', 503)
+            follower = self._followers.get(full_path)
+            if follower is None:
+                try:
+                    follower = FileFollower(full_path, self.buffer_bytes)
+                except FileNotFoundError:
+                    raise FollowError('文件不存在', 404)
+                self._followers[full_path] = follower
+            follower.subscribers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='log-follow', daemon=True)
+                self._thread.start()
+        if follower.encoding is None:
+            self.close(follower)
+            raise FollowError('无法读取文件内容（可能是二进制文件）')
+        return follower
+
+    def close(self, follower):
+        """取消订阅（没有订阅者的文件由后台线程关闭）"""
+        with self._lock:
+            follower.subscribers -= 1
+
+    def wake(self):
+        """文件系统监听到变化时调用，立即检查被跟随的文件"""
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            with self._lock:
+                for full_path, follower in list(self._followers.items()):
+                    if follower.subscribers <= 0:
+                        follower.close()
+                        del self._followers[full_path]
+                followers = list(self._followers.values())
+            for follower in followers:
+                try:
+                    follower.check()
+                except Exception as e:
+                    logger.warning(f'检查跟随的文件失败 {follower.full_path}: {e}')
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+元数据索引模块
+使用 SQLite 持久化保存上传目录中每个条目的路径、大小、修改时间、类型和回收站来源，
+文件树、搜索和存储统计直接查询索引，不再在每次请求时遍历整个上传目录。
+
+文件夹的 size 字段保存整个子树的汇总大小，增删条目时沿祖先路径增量更新。
+其他模块（例如内存中的文件名索引）可以通过 add_listener 订阅索引的每一次变更。
+"""
+import os
+import logging
+import sqlite3
+import threading
+from .file_info import get_file_type, build_file_info, build_folder_info
+from .file_tree import is_trash_path, trash_metadata, paginate_items, decode_cursor, SORT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    type TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    hidden INTEGER NOT NULL DEFAULT 0,
+    in_trash INTEGER NOT NULL DEFAULT 0,
+    undo_id TEXT,
+    original_path TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_entries_parent ON entries(parent);
+CREATE TABLE IF NOT EXISTS index_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+COLUMNS = ('path', 'parent', 'name', 'is_dir', 'size', 'mtime', 'type', 'ext',
+           'hidden', 'in_trash', 'undo_id', 'original_path')
+
+
+def normalize_path(rel_path):
+    """规范化相对路径：统一使用 / 分隔，根目录为空字符串"""
+    rel_path = os.path.normpath(rel_path or '').replace(os.sep, '/').strip('/')
+    return '' if rel_path == '.' else rel_path
+
+
+def _parent_of(rel_path):
+    return rel_path.rsplit('/', 1)[0] if '/' in rel_path else ''
+
+
+def subtree_bounds(rel_path):
+    """子树的路径范围：'/' 的下一个字符是 '0'，可用区间查询代替 LIKE"""
+    return rel_path + '/', rel_path + '0'
+
+
+def row_to_info(row):
+    """把索引行转换为接口返回的文件信息"""
+    if row['is_dir']:
+        info = build_folder_info(row['name'], row['path'], row['size'], row['mtime'])
+    else:
+        info = build_file_info(row['name'], row['path'], row['size'], row['mtime'])
+        # 回收站条目使用原始名称显示，类型仍按磁盘上的名称判断
+        info['type'] = row['type']
+        info['ext'] = row['ext']
+    if row['undo_id']:
+        info['original_name'] = row['name']
+        info['original_path'] = row['original_path']
+        info['undo_id'] = row['undo_id']
+        info['is_trash'] = True
+    return info
+
+
+class MetadataIndex:
+    """上传目录的持久化元数据索引"""
+
+    def __init__(self, db_path, upload_folder, trash_lookup=None):
+        self.db_path = db_path
+        self.upload_folder = upload_folder
+        # 回收站元数据查询函数 (undo_id) -> dict/None，不提供时读取 .meta 文件
+        self.trash_lookup = trash_lookup
+        self.ready = False
+        self._reconciling = False
+        self._pending = []
+        self._listeners = []
+        self._lock = threading.RLock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+        # 上次运行已经完成过全量扫描时，启动后立即使用持久化的索引，校对扫描在后台修正偏差
+        state = self._conn.execute("SELECT value FROM index_state WHERE key = 'complete'").fetchone()
+        self.ready = state is not None and state['value'] == '1'
+
+    # ==================== 磁盘扫描 ====================
+
+    def _full_path(self, rel_path):
+        return os.path.join(self.upload_folder, rel_path) if rel_path else self.upload_folder
+
+    def _make_row(self, rel_path, name, is_dir, size, mtime, in_trash, trash_meta=None):
+        ext = '' if is_dir else (os.path.splitext(name)[1].lower() if '.' in name else '')
+        row = {
+            'path': rel_path,
+            'parent': _parent_of(rel_path),
+            'name': name,
+            'is_dir': 1 if is_dir else 0,
+            'size': size,
+            'mtime': mtime,
+            'type': 'folder' if is_dir else get_file_type(ext),
+            'ext': ext,
+            'hidden': 1 if name.endswith('.meta') else 0,
+            'in_trash': 1 if in_trash else 0,
+            'undo_id': None,
+            'original_path': None
+        }
+        if trash_meta is not None:
+            row['name'] = trash_meta.get('original_name', name)
+            row['undo_id'] = name
+            row['original_path'] = trash_meta.get('original_path', '')
+        return row
+
+    def _scan(self, rel_path, rows):
+        """
+        扫描单个条目（文件或整个子树），把行追加到 rows
+
+        Returns:
+            int: 条目大小（文件夹为子树汇总大小），条目不存在时返回 None
+        """
+        full_path = self._full_path(rel_path)
+        try:
+            st = os.stat(full_path)
+        except OSError:
+            return None
+
+        name = os.path.basename(rel_path)
+        parent = _parent_of(rel_path)
+        in_trash = rel_path == '.trash' or rel_path.startswith('.trash/')
+        trash_meta = None
+        if parent == '.trash' and not name.endswith('.meta'):
+            trash_meta = trash_metadata(full_path, self.trash_lookup)
+
+        if not os.path.isdir(full_path):
+            rows.append(self._make_row(rel_path, name, False, st.st_size, st.st_mtime, in_trash, trash_meta))
+            return st.st_size
+
+        row = self._make_row(rel_path, name, True, 0, st.st_mtime, in_trash, trash_meta)
+        rows.append(row)
+        row['size'] = self._scan_children(full_path, rel_path, rows)
+        return row['size']
+
+    def _scan_children(self, directory, base_path, rows):
+        """单次 scandir 递归扫描目录，自底向上汇总大小"""
+        total_size = 0
+        try:
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError:
+            return total_size
+
+        in_trash = bool(is_trash_path(base_path))
+        for entry in entries:
+            rel_path = f'{base_path}/{entry.name}' if base_path else entry.name
+            try:
+                is_dir = entry.is_dir()
+                st = entry.stat()
+            except OSError:
+                continue
+
+            trash_meta = None
+            if base_path == '.trash' and not entry.name.endswith('.meta'):
+                trash_meta = trash_metadata(entry.path, self.trash_lookup)
+            entry_in_trash = in_trash or rel_path == '.trash'
+
+            if is_dir:
+                row = self._make_row(rel_path, entry.name, True, 0, st.st_mtime, entry_in_trash, trash_meta)
+                rows.append(row)
+                row['size'] = self._scan_children(entry.path, rel_path, rows)
+                # 与 os.walk 的统计口径一致：不进入符号链接目录
+                if not entry.is_symlink():
+                    total_size += row['size']
+            else:
+                rows.append(self._make_row(rel_path, entry.name, False, st.st_size, st.st_mtime,
+                                           entry_in_trash, trash_meta))
+                total_size += st.st_size
+        return total_size
+
+    # ==================== 写入 ====================
+
+    def _insert_rows(self, rows):
+        placeholders = ','.join('?' * len(COLUMNS))
+        self._conn.executemany(
+            f"INSERT OR REPLACE INTO entries ({','.join(COLUMNS)}) VALUES ({placeholders})",
+            [tuple(row[c] for c in COLUMNS) for row in rows]
+        )
+
+    def _delete_subtree(self, rel_path, removed=None):
+        """删除条目及其子树，返回被删除条目原先的大小；removed 不为None时追加被删除的行"""
+        row = self._conn.execute('SELECT size FROM entries WHERE path = ?', (rel_path,)).fetchone()
+        if row is None:
+            return 0
+        low, high = subtree_bounds(rel_path)
+        if removed is not None:
+            removed.extend(dict(r) for r in self._conn.execute(
+                'SELECT * FROM entries WHERE path = ? OR (path >= ? AND path < ?)', (rel_path, low, high)))
+        self._conn.execute('DELETE FROM entries WHERE path = ? OR (path >= ? AND path < ?)',
+                           (rel_path, low, high))
+        return row['size']
+
+    def _propagate(self, rel_path, delta):
+        """
+        把大小变化累加到所有祖先文件夹，并刷新直接父目录的修改时间
+
+        Returns:
+            list: 被修改的祖先路径
+        """
+        parent = _parent_of(rel_path)
+        if parent:
+            try:
+                mtime = os.stat(self._full_path(parent)).st_mtime
+                self._conn.execute('UPDATE entries SET mtime = ? WHERE path = ?', (mtime, parent))
+            except OSError:
+                pass
+        if not delta:
+            return [parent] if parent else []
+        touched = []
+        while parent:
+            self._conn.execute('UPDATE entries SET size = size + ? WHERE path = ?', (delta, parent))
+            touched.append(parent)
+            parent = _parent_of(parent)
+        return touched
+
+    # ==================== 变更通知 ====================
+
+    def add_listener(self, callback):
+        """
+        订阅索引变更：callback(removed, rows, reset)
+            removed: 被删除的行（dict，删除前的内容）
+            rows:    新增或被修改的行（dict）
+            reset:   为True时 rows 是索引的全部内容，订阅方应丢弃已有数据
+
+        索引已可用时，立即以 reset 方式回放当前全部内容。回调在索引锁内调用，应尽快返回。
+        """
+        with self._lock:
+            self._listeners.append(callback)
+            if self.ready:
+                rows = [dict(row) for row in self._conn.execute('SELECT * FROM entries')]
+                callback([], rows, True)
+
+    def _notify(self, removed, rows, reset=False):
+        for callback in self._listeners:
+            try:
+                callback(removed, rows, reset)
+            except Exception:
+                logger.exception('索引变更通知失败')
+
+    def _notify_update(self, removed, rows, touched):
+        """通知一次增量变更，touched 中的祖先行从数据库重新读取"""
+        if not self._listeners:
+            return
+        for path in touched:
+            row = self._conn.execute('SELECT * FROM entries WHERE path = ?', (path,)).fetchone()
+            if row is not None:
+                rows.append(dict(row))
+        self._notify(removed, rows)
+
+    def _has(self, rel_path):
+        return self._conn.execute('SELECT 1 FROM entries WHERE path = ?', (rel_path,)).fetchone() is not None
+
+    def _record_pending(self, op, rel_path):
+        """校对扫描期间记录变更，扫描结果替换索引后回放，避免丢失扫描过程中的修改"""
+        if self._reconciling:
+            self._pending.append((op, rel_path))
+
+    def refresh(self, rel_path):
+        """从磁盘重新读取条目（及其子树），条目已不存在时从索引中删除"""
+        rel_path = normalize_path(rel_path)
+        with self._lock:
+            self._record_pending('refresh', rel_path)
+            if not self.ready:
+                return
+            if not rel_path:
+                self._rebuild_locked()
+                return
+
+            # 父目录尚未被索引时（例如上传时自动创建了多级文件夹），从最上层缺失的祖先开始刷新
+            parent = _parent_of(rel_path)
+            while parent and not self._has(parent):
+                rel_path = parent
+                parent = _parent_of(rel_path)
+
+            rows = []
+            removed = []
+            new_size = self._scan(rel_path, rows)
+            with self._conn:
+                old_size = self._delete_subtree(rel_path, removed)
+                if new_size is not None:
+                    self._insert_rows(rows)
+                touched = self._propagate(rel_path, (new_size or 0) - old_size)
+            self._notify_update(removed, rows if new_size is not None else [], touched)
+
+    def remove(self, rel_path):
+        """条目已从磁盘移走后，从索引中删除它及其子树"""
+        rel_path = normalize_path(rel_path)
+        with self._lock:
+            self._record_pending('remove', rel_path)
+            if not self.ready or not rel_path:
+                return
+            removed = []
+            with self._conn:
+                old_size = self._delete_subtree(rel_path, removed)
+                touched = self._propagate(rel_path, -old_size)
+            self._notify_update(removed, [], touched)
+
+    def _replace_all(self, rows):
+        with self._conn:
+            self._conn.execute('DELETE FROM entries')
+            self._insert_rows(rows)
+            self._conn.execute("INSERT OR REPLACE INTO index_state (key, value) VALUES ('complete', '1')")
+        self._notify([], rows, True)
+
+    def _rebuild_locked(self):
+        rows = []
+        self._scan_children(self.upload_folder, '', rows)
+        self._replace_all(rows)
+
+    def reconcile(self):
+        """
+        启动时的全量校对扫描：在锁外扫描磁盘，然后一次性替换索引内容，
+        扫描期间发生的变更会被记录下来并在替换完成后回放
+        """
+        with self._lock:
+            self._reconciling = True
+            self._pending = []
+        try:
+            rows = []
+            self._scan_children(self.upload_folder, '', rows)
+            with self._lock:
+                self._replace_all(rows)
+                self.ready = True
+                self._reconciling = False
+                pending, self._pending = self._pending, []
+                for op, rel_path in pending:
+                    if op == 'remove':
+                        self.remove(rel_path)
+                    else:
+                        self.refresh(rel_path)
+        finally:
+            with self._lock:
+                self._reconciling = False
+
+    # ==================== 查询 ====================
+
+    def get_size(self, rel_path):
+        """查询条目大小（文件夹为汇总大小），不存在时返回None"""
+        rel_path = normalize_path(rel_path)
+        with self._lock:
+            if not rel_path:
+                return self.total_size()
+            row = self._conn.execute('SELECT size FROM entries WHERE path = ?', (rel_path,)).fetchone()
+        return row['size'] if row else None
+
+    def get_info(self, rel_path):
+        """查询单个条目的文件信息（与 list_directory 中的条目相同），不存在时返回None"""
+        rel_path = normalize_path(rel_path)
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM entries WHERE path = ? AND hidden = 0', (rel_path,)).fetchone()
+        if row is None:
+            return None
+        info = row_to_info(row)
+        info['mtime'] = row['mtime']
+        return info
+
+    def count_subtree(self, rel_path):
+        """统计条目及其子树中的条目数（文件和文件夹），索引不可用或条目不存在时返回None"""
+        rel_path = normalize_path(rel_path)
+        with self._lock:
+            if not self.ready or not rel_path or not self._has(rel_path):
+                return None
+            low, high = subtree_bounds(rel_path)
+            row = self._conn.execute('SELECT COUNT(*) FROM entries WHERE path = ? OR (path >= ? AND path < ?)',
+                                     (rel_path, low, high)).fetchone()
+        return row[0]
+
+    def total_size(self):
+        """上传目录总大小（包含回收站）"""
+        with self._lock:
+            row = self._conn.execute("SELECT COALESCE(SUM(size), 0) AS total FROM entries WHERE parent = ''").fetchone()
+        return row['total']
+
+    def file_totals(self):
+        """
+        按（是否在回收站、顶层文件夹、类型）分组汇总文件的大小和数量
+
+        Returns:
+            list: [(in_trash, 顶层文件夹, 类型, 总大小, 文件数), ...]，根目录下的文件顶层文件夹为 ''
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT in_trash, CASE WHEN instr(path, '/') > 0 THEN substr(path, 1, instr(path, '/') - 1) "
+                "ELSE '' END AS top, type, SUM(size) AS size, COUNT(*) AS count "
+                "FROM entries WHERE is_dir = 0 GROUP BY in_trash, top, type"
+            ).fetchall()
+        return [(bool(row['in_trash']), row['top'], row['type'], row['size'], row['count']) for row in rows]
+
+    def list_directory(self, rel_path='', depth=1, limit=200, cursor=None, sort='name', order='asc'):
+        """与 file_tree.list_directory 相同的接口，数据来自索引"""
+        if sort not in SORT_FIELDS:
+            raise ValueError(f'不支持的排序字段: {sort}')
+        if order not in ('asc', 'desc'):
+            raise ValueError(f'不支持的排序方向: {order}')
+
+        rel_path = normalize_path(rel_path)
+        cursor_key = decode_cursor(cursor) if cursor else None
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM entries WHERE parent = ? AND hidden = 0',
+                                      (rel_path,)).fetchall()
+        items = []
+        for row in rows:
+            info = row_to_info(row)
+            info['mtime'] = row['mtime']
+            items.append(info)
+        page, next_cursor = paginate_items(items, sort, order, limit, cursor_key)
+
+        if depth > 1:
+            for info in page:
+                if info['is_dir']:
+                    child = self.list_directory(info['path'], depth - 1, limit, None, sort, order)
+                    info['children'] = child['items']
+                    info['next_cursor'] = child['next_cursor']
+                    info['total'] = child['total']
+
+        return {'items': page, 'next_cursor': next_cursor, 'total': len(items)}
+
+    def build_tree(self):
+        """从索引构建与 file_tree.build_tree 相同结构的完整文件树"""
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM entries WHERE hidden = 0').fetchall()
+
+        children = {}
+        for row in rows:
+            info = row_to_info(row)
+            if row['is_dir']:
+                info['children'] = children.setdefault(row['path'], [])
+            children.setdefault(row['parent'], []).append(info)
+
+        for items in children.values():
+            items.sort(key=lambda item: item['name'].lower())
+        return children.get('', [])
+
+    def build_folder_tree(self):
+        """仅包含文件夹的树（跳过回收站）"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT path, parent, name FROM entries WHERE is_dir = 1 AND in_trash = 0 AND hidden = 0'
+            ).fetchall()
+
+        children = {}
+        for row in rows:
+            node = {'name': row['name'], 'path': row['path'], 'is_dir': True,
+                    'children': children.setdefault(row['path'], [])}
+            children.setdefault(row['parent'], []).append(node)
+        for nodes in children.values():
+            nodes.sort(key=lambda node: node['name'].lower())
+        return children.get('', [])
+
+    def search(self, query):
+        """按名称搜索（与 search.search_files 返回相同结构）"""
+        pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM entries WHERE hidden = 0 AND name LIKE ? ESCAPE '\\'", (pattern,)
+            ).fetchall()
+
+        query_lower = query.lower()
+        results = []
+        for row in rows:
+            # LIKE 只对ASCII字符忽略大小写，这里用Python再确认一次
+            if query_lower not in row['name'].lower():
+                continue
+            info = row_to_info(row)
+            info['match_type'] = 'folder' if row['is_dir'] else 'file'
+            results.append(info)
+        results.sort(key=lambda x: x['name'].lower())
+        return results
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
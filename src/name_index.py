@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件名索引模块
+在内存中保存所有条目的名称，支持包含、前缀、通配符、正则和模糊（按顺序包含各字符）五种匹配方式，
+以及按类型、扩展名、大小、修改时间过滤和分页。
+
+所有名称（小写）按名称排序后用换行符连接成一个字符串，每种匹配方式都转换为逐行匹配的正则表达式，
+在这个字符串上由正则引擎（C实现）查找，再用二分查找把匹配位置换算回条目。结果天然按名称有序，
+取够一页即可停止扫描。
+
+索引通过 MetadataIndex.add_listener 接收变更：变更的条目先记在增量表中单独匹配，
+增量积累到一定数量后在后台线程重建排序数组，查询不需要等待重建。
+
+正则匹配方式的表达式由用户输入，Python的正则引擎遇到嵌套或有歧义的重复（如 (a|aa)*c）会指数级回溯，
+因此编译前先检查表达式结构（check_regex），扫描时再分段累计耗时，超过限制时抛出 QueryTimeout。
+"""
+import re
+import time
+import heapq
+import logging
+import threading
+from array import array
+from itertools import accumulate, islice
+from bisect import bisect_left, bisect_right
+from operator import attrgetter
+from collections import namedtuple
+from .metadata_index import row_to_info
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+logger = logging.getLogger(__name__)
+
+# 支持的匹配方式
+MODES = ('substring', 'prefix', 'glob', 'regex', 'fuzzy')
+
+# 增量表超过该条目数时在后台重建排序数组
+REBUILD_THRESHOLD = 4096
+
+# 模糊匹配时参与打分排序的最多候选数
+FUZZY_CANDIDATES = 1000
+
+# 搜索词最大长度
+MAX_QUERY_LENGTH = 256
+
+# 估算正则回溯次数时名称的最大长度（常见文件系统的文件名长度上限）
+MAX_NAME_LENGTH = 255
+
+# 正则表达式在每个起始位置允许的最多回溯组合数：相当于最多两个前后相连的不定长重复（如 .*foo.*bar），
+# 表达式末尾的重复不计
+REGEX_MAX_COST = 65536
+
+# 正则匹配方式分段扫描拼接字符串时每段的大小（字符），每段之后检查累计耗时
+SCAN_SEGMENT = 1024
+
+# 正则匹配方式单次搜索扫描的默认最长时间（秒）
+REGEX_TIMEOUT = 5.0
+
+Entry = namedtuple('Entry', 'path name lower is_dir size mtime type ext undo_id original_path')
+
+# 编译后的查询：
+#   full    在单个名称上判断是否匹配的正则
+#   scan    在拼接字符串上查找候选的正则（prefix 不为None时不使用）
+#   prefix  候选必须以该字符串开头，直接在排序数组上二分查找范围
+#   verify  候选是否还需要用 full 确认
+Query = namedtuple('Query', 'full scan prefix verify')
+
+_ANY = '[^\\n]*'
+
+# 正则语法树中的节点类型
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+if hasattr(sre_parse, 'POSSESSIVE_REPEAT'):
+    _REPEATS.add(sre_parse.POSSESSIVE_REPEAT)
+_GROUPS = {sre_parse.SUBPATTERN, sre_parse.ASSERT, sre_parse.ASSERT_NOT}
+if hasattr(sre_parse, 'ATOMIC_GROUP'):
+    _GROUPS.add(sre_parse.ATOMIC_GROUP)
+_BACKREFS = {sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS}
+
+
+class QueryTimeout(ValueError):
+    """正则表达式扫描超过时间限制"""
+
+
+def _make_entry(row):
+    name = row['name']
+    # 换行符是名称之间的分隔符，名称本身包含的换行替换为空格
+    lower = name.lower().replace('\n', ' ')
+    return Entry(row['path'], name, lower, bool(row['is_dir']), row['size'], row['mtime'],
+                 row['type'], row['ext'], row['undo_id'], row['original_path'])
+
+
+# 按小写名称排序（同名条目之间的顺序不固定）
+_sort_key = attrgetter('lower')
+
+
+def glob_to_regex(pattern):
+    """
+    把通配符转换为正则表达式（* 任意字符、? 单个字符、[abc] / [!abc] 字符集），不含首尾锚点，
+    不会跨越名称之间的换行符
+    """
+    parts = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        i += 1
+        if c == '*':
+            if not parts or parts[-1] != _ANY:
+                parts.append(_ANY)
+        elif c == '?':
+            parts.append('[^\\n]')
+        elif c == '[':
+            j = i
+            if j < n and pattern[j] in '!^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            while j < n and pattern[j] != ']':
+                j += 1
+            if j >= n:
+                parts.append('\\[')
+                continue
+            body = pattern[i:j].replace('\\', '\\\\').replace('[', '\\[')
+            i = j + 1
+            if body[0] in '!^':
+                body = '^\\n' + body[1:]
+            parts.append(f'[{body}]')
+        else:
+            parts.append(re.escape(c))
+    return ''.join(parts)
+
+
+def _group_body(op, av):
+    """分组、断言节点包含的子表达式"""
+    return av if op == getattr(sre_parse, 'ATOMIC_GROUP', None) else av[-1]
+
+
+def _is_variable(pattern):
+    """子表达式中是否有不定长的重复或多个分支（匹配方式不唯一）"""
+    for op, av in pattern:
+        if op in _REPEATS and av[0] != av[1]:
+            return True
+        if op == sre_parse.BRANCH or op in _BACKREFS:
+            return True
+        if op in _GROUPS and _is_variable(_group_body(op, av)):
+            return True
+    return False
+
+
+def _regex_cost(pattern, tail):
+    """
+    估算正则表达式在一个起始位置最多尝试的回溯组合数：前后相连的不定长重复相乘，分支相加
+
+    Args:
+        tail: pattern 是否位于表达式末尾（末尾的重复之后没有可能失败的部分，不会引起回溯）
+
+    Raises:
+        ValueError: 含有反向引用、嵌套或有歧义的重复，或估算的组合数过多
+    """
+    cost = 1
+    last_index = len(pattern) - 1
+    for index, (op, av) in enumerate(pattern):
+        last = tail and index == last_index
+        if op in _BACKREFS:
+            raise ValueError('正则表达式不支持反向引用')
+        if op in _REPEATS:
+            low, high, body = av
+            body_cost = _regex_cost(body, False)
+            if low == high:
+                item = 1 if body_cost == 1 else body_cost ** min(low, 17)
+            elif high == 1:
+                item = body_cost if last else 1 + body_cost
+            elif _is_variable(body):
+                raise ValueError('正则表达式中重复的部分不能再包含重复或分支（如 (a+)+、(a|aa)*），匹配可能需要极长时间')
+            else:
+                item = body_cost if last else max(min(high, MAX_NAME_LENGTH) - low, 0) + 1
+        elif op in _GROUPS:
+            item = _regex_cost(_group_body(op, av), last)
+        elif op == sre_parse.BRANCH:
+            item = sum(_regex_cost(branch, last) for branch in av[1])
+        else:
+            item = 1
+        cost *= item
+        if cost > REGEX_MAX_COST:
+            raise ValueError('正则表达式过于复杂（前后相连的 * + ? {m,n} 过多），请简化表达式')
+    return cost
+
+
+def check_regex(pattern, flags=0):
+    """
+    检查用户输入的正则表达式不会引起灾难性回溯：拒绝反向引用、嵌套或有歧义的重复（(a+)+、(a|aa)*），
+    以及前后相连的不定长重复过多的表达式（a*a*a*c）
+
+    Raises:
+        ValueError: 表达式无效或可能需要极长的匹配时间
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error as e:
+        raise ValueError(f'无效的正则表达式: {e}')
+    _regex_cost(parsed, True)
+
+
+def compile_query(query, mode):
+    """
+    按匹配方式编译搜索词（作用于小写名称）
+
+    Returns:
+        Query
+
+    Raises:
+        ValueError: 匹配方式不支持、搜索词过长、正则表达式无效或可能需要极长的匹配时间（见 check_regex）
+    """
+    if mode not in MODES:
+        raise ValueError(f'不支持的匹配方式: {mode}')
+    if len(query) > MAX_QUERY_LENGTH:
+        raise ValueError('搜索词过长')
+    lower = query.lower()
+
+    if mode == 'substring':
+        rx = re.compile(re.escape(lower), re.MULTILINE)
+        return Query(rx, rx, None, False)
+    if mode == 'prefix':
+        return Query(re.compile('^' + re.escape(lower)), None, lower, False)
+    if mode == 'fuzzy':
+        # a[^\nb]*b[^\nc]*c：每个字符之后只跳过不是下一个字符的内容，字符类排除了下一个字符，不会回溯
+        pattern = ''.join((f'[^\\n{re.escape(c)}]*' if i else '') + re.escape(c) for i, c in enumerate(lower))
+        rx = re.compile(pattern, re.MULTILINE)
+        return Query(rx, rx, None, False)
+    if mode == 'glob':
+        body = glob_to_regex(lower)
+        full = re.compile('^' + body + '$')
+        literal = re.match(r'[^*?\[]*', lower).group()
+        if literal:
+            # 有固定前缀时只检查前缀范围内的名称
+            return Query(full, None, literal, True)
+        # 以 * 开头时去掉开头的任意匹配，让正则引擎直接查找后面的固定文字
+        scan = body[len(_ANY):] + '$' if body.startswith(_ANY) else '^' + body + '$'
+        return Query(full, re.compile(scan, re.MULTILINE), None, True)
+
+    try:
+        rx = re.compile(query, re.MULTILINE | re.IGNORECASE)
+    except re.error as e:
+        raise ValueError(f'无效的正则表达式: {e}')
+    check_regex(query, re.MULTILINE | re.IGNORECASE)
+    # 用户输入的正则可能跨越名称之间的换行符，候选需要在单个名称上再确认
+    return Query(rx, rx, None, True)
+
+
+def make_filter(types=None, exts=None, kind=None, min_size=None, max_size=None, after=None, before=None):
+    """
+    构建条目过滤函数，所有条件都为空时返回None
+
+    Args:
+        types: 文件类型集合（folder、image、text 等）
+        exts: 扩展名集合（带点，小写）
+        kind: 'file' 或 'folder'
+        min_size / max_size: 大小范围（字节，文件夹为汇总大小）
+        after / before: 修改时间范围（时间戳）
+    """
+    checks = []
+    if types:
+        checks.append(lambda e: e.type in types)
+    if exts:
+        checks.append(lambda e: e.ext in exts)
+    if kind == 'file':
+        checks.append(lambda e: not e.is_dir)
+    elif kind == 'folder':
+        checks.append(lambda e: e.is_dir)
+    if min_size is not None:
+        checks.append(lambda e: e.size >= min_size)
+    if max_size is not None:
+        checks.append(lambda e: e.size <= max_size)
+    if after is not None:
+        checks.append(lambda e: e.mtime >= after)
+    if before is not None:
+        checks.append(lambda e: e.mtime < before)
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+
+    def accept(entry):
+        for check in checks:
+            if not check(entry):
+                return False
+        return True
+    return accept
+
+
+class NameIndex:
+    """内存中的文件名索引"""
+
+    def __init__(self, regex_timeout=REGEX_TIMEOUT):
+        self.ready = False
+        self.regex_timeout = regex_timeout
+        self._lock = threading.Lock()
+        self._entries = {}
+        # 排序数组：条目、小写名称（二分查找前缀用）、名称拼接成的字符串、每个名称在字符串中的起始位置
+        self._base = []
+        self._keys = []
+        self._blob = ''
+        self._offsets = array('q')
+        # 增量表：路径 -> 变更序号，排序数组重建后只保留重建期间发生的变更
+        self._dirty = {}
+        self._seq = 0
+        self._rebuilding = False
+
+    # ==================== 维护 ====================
+
+    def apply(self, removed, rows, reset=False):
+        """接收元数据索引的变更（MetadataIndex.add_listener 的回调）"""
+        new_entries = [_make_entry(row) for row in rows if not row['hidden']]
+        with self._lock:
+            if reset:
+                old_entries, self._entries = self._entries, {}
+                for entry in new_entries:
+                    # 内容没有变化的条目沿用原对象，排序数组中的位置仍然有效
+                    old = old_entries.get(entry.path)
+                    self._entries[entry.path] = old if old == entry else entry
+                    if old != entry:
+                        self._seq += 1
+                        self._dirty[entry.path] = self._seq
+            else:
+                upserted = set()
+                for entry in new_entries:
+                    upserted.add(entry.path)
+                    if self._entries.get(entry.path) == entry:
+                        continue
+                    self._entries[entry.path] = entry
+                    self._seq += 1
+                    self._dirty[entry.path] = self._seq
+                for row in removed:
+                    path = row['path']
+                    if path not in upserted:
+                        self._entries.pop(path, None)
+                        self._dirty.pop(path, None)
+
+            if (len(self._dirty) > REBUILD_THRESHOLD or not self.ready) and not self._rebuilding:
+                self._rebuilding = True
+                threading.Thread(target=self._rebuild, name='name-index-rebuild', daemon=True).start()
+
+    def _rebuild(self):
+        """重建排序数组（在后台线程中执行，期间的变更留在增量表中）"""
+        try:
+            while True:
+                with self._lock:
+                    seq = self._seq
+                    snapshot = list(self._entries.values())
+                snapshot.sort(key=_sort_key)
+                keys = [entry.lower for entry in snapshot]
+                blob = '\n'.join(keys)
+                offsets = array('q', accumulate((len(entry.lower) + 1 for entry in snapshot), initial=0))
+                offsets.pop()
+
+                with self._lock:
+                    self._base, self._keys, self._blob, self._offsets = snapshot, keys, blob, offsets
+                    self._dirty = {path: s for path, s in self._dirty.items() if s > seq}
+                    self.ready = True
+                    if len(self._dirty) <= REBUILD_THRESHOLD:
+                        self._rebuilding = False
+                        return
+        except Exception:
+            logger.exception('重建文件名索引失败')
+            with self._lock:
+                self._rebuilding = False
+
+    # ==================== 查询 ====================
+
+    @staticmethod
+    def _scan_base(rx, blob, offsets, base, timeout=None):
+        """
+        在拼接字符串上查找，按名称顺序逐个产出候选条目（每个名称最多一次）
+
+        timeout 不为None时在名称边界处分段查找，累计查找时间超过 timeout 秒时抛出 QueryTimeout
+        """
+        if not base:
+            return
+        end = len(blob)
+        position = 0
+        spent = 0.0
+        while position <= end:
+            if timeout is None:
+                match = rx.search(blob, position)
+            else:
+                match = None
+                while match is None and position <= end:
+                    if spent > timeout:
+                        raise QueryTimeout('匹配超时，请简化表达式')
+                    stop = blob.find('\n', position + SCAN_SEGMENT)
+                    if stop < 0:
+                        stop = end
+                    started = time.monotonic()
+                    match = rx.search(blob, position, stop)
+                    spent += time.monotonic() - started
+                    if match is None:
+                        position = stop + 1
+            if match is None:
+                return
+            i = bisect_right(offsets, match.start()) - 1
+            position = offsets[i + 1] if i + 1 < len(offsets) else end + 1
+            yield base[i]
+
+    @staticmethod
+    def _prefix_range(base, keys, prefix):
+        """排序数组中以 prefix 开头的连续区间"""
+        for i in range(bisect_left(keys, prefix), len(base)):
+            entry = base[i]
+            if not entry.lower.startswith(prefix):
+                return
+            yield entry
+
+    def _iter_matches(self, query, mode, filters):
+        """按结果顺序逐个产出匹配的条目（模糊匹配需要先收集候选再打分排序）"""
+        compiled = compile_query(query, mode)
+        rx = compiled.full
+        with self._lock:
+            entries = self._entries
+            base, keys, blob, offsets = self._base, self._keys, self._blob, self._offsets
+            delta = [entries[path] for path in self._dirty if path in entries]
+
+        if compiled.prefix is not None:
+            candidates = self._prefix_range(base, keys, compiled.prefix)
+        else:
+            # 用户输入的正则和通配符可能需要大量回溯，限制扫描时间
+            timeout = self.regex_timeout if mode in ('regex', 'glob') else None
+            candidates = self._scan_base(compiled.scan, blob, offsets, base, timeout)
+        if compiled.verify:
+            candidates = (entry for entry in candidates if rx.search(entry.lower))
+        # 排序数组中已被修改或删除的条目跳过，它们的新版本在增量表中
+        base_matches = (entry for entry in candidates if entries.get(entry.path) is entry)
+        delta_matches = sorted((entry for entry in delta if rx.search(entry.lower)), key=_sort_key)
+        matches = heapq.merge(base_matches, delta_matches, key=_sort_key)
+        if filters is not None:
+            matches = filter(filters, matches)
+
+        if mode == 'fuzzy':
+            candidates = list(islice(matches, FUZZY_CANDIDATES))
+            candidates.sort(key=lambda entry: self._fuzzy_score(rx, entry))
+            matches = iter(candidates)
+        return matches
+
+    @staticmethod
+    def _to_info(entry):
+        info = row_to_info(entry._asdict())
+        info['match_type'] = 'folder' if entry.is_dir else 'file'
+        return info
+
+    def search(self, query, mode='substring', filters=None, offset=0, limit=100):
+        """
+        搜索文件名
+
+        Args:
+            query: 搜索词
+            mode: 匹配方式，见 MODES
+            filters: make_filter 返回的过滤函数
+            offset: 跳过的结果数
+            limit: 返回的最多结果数
+
+        Returns:
+            dict: {'results': [...], 'has_more': bool}；模糊匹配按匹配紧凑程度排序，其余按名称排序
+
+        Raises:
+            ValueError: 搜索词无效；QueryTimeout（ValueError的子类）：正则或通配符扫描超时
+        """
+        page = list(islice(self._iter_matches(query, mode, filters), offset, offset + limit + 1))
+        has_more = len(page) > limit
+        return {'results': [self._to_info(entry) for entry in page[:limit]], 'has_more': has_more}
+
+    def iter_search(self, query, mode='substring', filters=None):
+        """
+        逐个产出搜索结果（用于流式返回），参数和结果顺序与 search 相同
+
+        Raises:
+            ValueError: 搜索词无效（在第一次迭代前检查）
+            QueryTimeout: 正则或通配符扫描超时（在迭代过程中抛出）
+        """
+        matches = self._iter_matches(query, mode, filters)
+        return (self._to_info(entry) for entry in matches)
+
+    @staticmethod
+    def _fuzzy_score(rx, entry):
+        """匹配的字符越集中、越靠前、名称越短越优先"""
+        match = rx.search(entry.lower)
+        span = match.end() - match.start() if match else len(entry.lower)
+        start = match.start() if match else 0
+        return span, start, len(entry.lower), entry.lower
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'pending': len(self._dirty), 'ready': self.ready}
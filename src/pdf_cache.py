@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF转换结果缓存模块
+PDF转出的ZIP包和每一页的图片（包括按页浏览时单独渲染的页面）保存在磁盘缓存中，
+键为源文件的 inode+修改时间+大小 加上分辨率和质量，文件被修改或替换后自动失效，总大小超过上限时按LRU淘汰。
+
+同一个PDF同时只有一个后台转换任务：第一个请求启动转换，之后的请求（包括转换途中到达的）
+都从正在写入的临时文件中边读边发送，转换完成后临时文件原子地放入缓存。
+客户端中途断开不会中断转换，转换结果仍会进入缓存。
+单页渲染（按页请求和预渲染页码范围）按页登记，同一页同时只渲染一次。
+"""
+import os
+import shutil
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from . import pdf_utils
+from .disk_cache import DiskCache, make_key
+
+logger = logging.getLogger(__name__)
+
+# 读取正在生成的ZIP时每块的大小
+BLOCK_SIZE = 256 * 1024
+
+# 按页浏览支持的输出格式
+PAGE_FORMATS = {
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+}
+
+# 内存中缓存页数的PDF文件数
+PAGE_COUNT_CACHE_SIZE = 256
+
+
+class _Build:
+    """一个正在进行的ZIP转换任务"""
+
+    def __init__(self, name):
+        self.name = name
+        self.tmp_path = None
+        self.written = 0
+        self.finished = False
+        self.error = None
+        self.cond = threading.Condition()
+
+
+class PdfConverter:
+    """带缓存的PDF转JPG"""
+
+    def __init__(self, cache_dir, max_bytes, dpi=200, quality=95, batch_size=8, workers=1):
+        self.cache = DiskCache(cache_dir, max_bytes)
+        self.dpi = dpi
+        self.quality = quality
+        self.batch_size = batch_size
+        self.workers = workers
+        self._builds = {}
+        self._page_counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ==================== 缓存键 ====================
+
+    def zip_name(self, pdf_path):
+        """ZIP包的缓存文件名"""
+        st = os.stat(pdf_path)
+        return make_key('pdf-zip', st.st_ino, st.st_mtime_ns, st.st_size, self.dpi, self.quality) + '.zip'
+
+    def page_name(self, pdf_path, page, dpi, fmt='jpeg', quality=None):
+        """单页图片的缓存文件名"""
+        st = os.stat(pdf_path)
+        quality = self.quality if quality is None else quality
+        return make_key('pdf-page', st.st_ino, st.st_mtime_ns, st.st_size, page, dpi, fmt, quality) + '.' + fmt
+
+    # ==================== ZIP包 ====================
+
+    def cached_zip(self, pdf_path):
+        """
+        查询已缓存的ZIP包
+
+        Returns:
+            str: 缓存文件路径，未命中时返回None
+        """
+        return self.cache.get(self.zip_name(pdf_path))
+
+    def stream_zip(self, pdf_path, page_count):
+        """
+        获取ZIP包数据流：命中缓存时直接读取，否则加入（或启动）后台转换并边转换边读取
+
+        Args:
+            pdf_path: PDF文件路径
+            page_count: 页数
+
+        Yields:
+            bytes: ZIP文件数据
+        """
+        name = self.zip_name(pdf_path)
+        path = self.cache.get(name)
+        if path:
+            yield from self._read_file(path)
+            return
+        build = self._start_build(name, pdf_path, page_count)
+        yield from self._follow(build)
+
+    def _start_build(self, name, pdf_path, page_count):
+        with self._lock:
+            build = self._builds.get(name)
+            if build is not None:
+                return build
+            build = _Build(name)
+            self._builds[name] = build
+        threading.Thread(target=self._run_build, args=(build, pdf_path, page_count),
+                         name='pdf-zip-build', daemon=True).start()
+        return build
+
+    def _run_build(self, build, pdf_path, page_count):
+        def pages_with_cache():
+            # 转换ZIP的同时把每一页存入单页缓存，之后按页浏览时可以直接使用
+            for page_number, data in pdf_utils.iter_jpg_pages(pdf_path, self.dpi, self.quality, self.batch_size,
+                                                              page_count, self.workers):
+                self.put_page(self.page_name(pdf_path, page_number, self.dpi), data)
+                yield page_number, data
+
+        def producer(tmp_path):
+            with open(tmp_path, 'wb') as out:
+                with build.cond:
+                    build.tmp_path = tmp_path
+                    build.cond.notify_all()
+                for chunk in pdf_utils.stream_zip_pages(pages_with_cache()):
+                    if not chunk:
+                        continue
+                    out.write(chunk)
+                    out.flush()
+                    with build.cond:
+                        build.written += len(chunk)
+                        build.cond.notify_all()
+
+        try:
+            self.cache.put(build.name, producer)
+        except Exception as e:
+            logger.error(f'PDF转JPG失败 {pdf_path}: {e}')
+            build.error = e
+        finally:
+            with self._lock:
+                self._builds.pop(build.name, None)
+            with build.cond:
+                build.finished = True
+                build.cond.notify_all()
+
+    def _follow(self, build):
+        """读取正在生成的ZIP，直到转换结束"""
+        with build.cond:
+            while build.tmp_path is None and not build.finished:
+                build.cond.wait()
+            tmp_path = build.tmp_path
+
+        f = None
+        if tmp_path:
+            try:
+                f = open(tmp_path, 'rb')
+            except FileNotFoundError:
+                # 临时文件已经移入缓存
+                pass
+
+        if f is None:
+            with build.cond:
+                while not build.finished:
+                    build.cond.wait()
+            if build.error:
+                raise build.error
+            path = self.cache.get(build.name)
+            if not path:
+                raise Exception('转换结果已从缓存中淘汰，请重试')
+            yield from self._read_file(path)
+            return
+
+        with f:
+            offset = 0
+            while True:
+                with build.cond:
+                    while build.written <= offset and not build.finished:
+                        build.cond.wait()
+                    written, finished, error = build.written, build.finished, build.error
+                if error:
+                    raise error
+                while offset < written:
+                    chunk = f.read(min(BLOCK_SIZE, written - offset))
+                    if not chunk:
+                        break
+                    offset += len(chunk)
+                    yield chunk
+                if finished and offset >= written:
+                    return
+
+    @staticmethod
+    def _read_file(path):
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(BLOCK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    # ==================== 单页 ====================
+
+    def page_count(self, pdf_path):
+        """获取页数（按文件版本缓存在内存中，避免每次翻页都调用 pdfinfo）"""
+        st = os.stat(pdf_path)
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if key in self._page_counts:
+                self._page_counts.move_to_end(key)
+                return self._page_counts[key]
+        count = pdf_utils.get_page_count(pdf_path)
+        with self._lock:
+            self._page_counts[key] = count
+            while len(self._page_counts) > PAGE_COUNT_CACHE_SIZE:
+                self._page_counts.popitem(last=False)
+        return count
+
+    def put_page(self, name, data):
+        """把单页图片数据放入缓存"""
+        def producer(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+        return self.cache.put(name, producer)
+
+    def _render(self, pdf_path, first_page, last_page, dpi, fmt, output_folder):
+        # 与ZIP转换共用渲染线程池，限制同时运行的 pdftoppm 进程数
+        pool = pdf_utils.get_render_pool(self.workers)
+        future = pool.submit(pdf_utils.render_pages, pdf_path, first_page, last_page, dpi, self.quality,
+                             output_folder, None, fmt)
+        return future.result()
+
+    def get_page(self, pdf_path, page, dpi, fmt='jpeg'):
+        """
+        获取单页图片（命中缓存直接返回，否则渲染这一页；同一页的并发请求只渲染一次）
+
+        Returns:
+            tuple: (图片文件路径, MIME类型)
+        """
+        name = self.page_name(pdf_path, page, dpi, fmt)
+
+        def produce(tmp_path):
+            with tempfile.TemporaryDirectory(prefix='pdfpage_') as output_folder:
+                paths = self._render(pdf_path, page, page, dpi, fmt, output_folder)
+                if not paths:
+                    raise Exception(f'第 {page} 页渲染失败')
+                shutil.move(paths[0], tmp_path)
+
+        return self.cache.get_or_create(name, produce), PAGE_FORMATS[fmt]
+
+    def render_range(self, pdf_path, first_page, last_page, dpi, fmt='jpeg'):
+        """
+        预先渲染一个页码范围：缓存中缺少的页按连续的段渲染（每段一次 pdftoppm 调用）后放入缓存。
+        正在由其他请求渲染的页不重复渲染，等待其完成后返回
+
+        Returns:
+            list: 本次实际渲染的页码
+        """
+        names = {page: self.page_name(pdf_path, page, dpi, fmt) for page in range(first_page, last_page + 1)}
+        claimed = []
+        pending = []
+        for page, name in names.items():
+            if self.cache.get(name):
+                continue
+            event = self.cache.claim(name)
+            if event is None:
+                claimed.append(page)
+            else:
+                pending.append(event)
+
+        try:
+            for start, end in _runs(claimed):
+                with tempfile.TemporaryDirectory(prefix='pdfpage_') as output_folder:
+                    paths = self._render(pdf_path, start, end, dpi, fmt, output_folder)
+                    for page, path in zip(range(start, end + 1), paths):
+                        self.cache.put(names[page], lambda tmp_path, src=path: shutil.move(src, tmp_path))
+        finally:
+            for page in claimed:
+                self.cache.release(names[page])
+
+        for event in pending:
+            event.wait()
+        return claimed
+
+
+def _runs(pages):
+    """把升序页码列表合并为连续的 (起始页, 结束页) 段"""
+    runs = []
+    for page in pages:
+        if runs and runs[-1][1] == page - 1:
+            runs[-1][1] = page
+        else:
+            runs.append([page, page])
+    return [tuple(run) for run in runs]
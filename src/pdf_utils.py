@@ -5,11 +5,15 @@ PDF工具模块
 处理PDF转JPG等功能
 """
 import os
+import time
 import zipfile
 import tempfile
 import shutil
-from pdf2image import convert_from_path
-from PIL import Image
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from pdf2image import convert_from_path, pdfinfo_from_path
+from .zip_stream import StreamBuffer
 
 
 def find_poppler_path():
@@ -82,7 +86,266 @@ def find_poppler_path():
     return None
 
 
-def pdf_to_jpg_zip(pdf_path, output_zip_path=None, dpi=200):
+def poppler_missing_error(error_msg):
+    """
+    生成未找到poppler时的错误（包含安装说明和诊断信息）
+    
+    Args:
+        error_msg: 原始错误信息
+    
+    Returns:
+        Exception: 带安装说明的异常
+    """
+    import platform
+    system = platform.system()
+    install_cmd = ""
+    verify_cmd = ""
+    conda_cmd = ""
+    
+    # 检查当前PATH
+    current_path = os.environ.get('PATH', '')
+    path_info = f"当前PATH: {current_path[:100]}..." if len(current_path) > 100 else f"当前PATH: {current_path}"
+    
+    if system == 'Darwin':  # macOS
+        install_cmd = "brew install poppler"
+        verify_cmd = "brew list poppler && which pdftoppm"
+        conda_cmd = "conda install -c conda-forge poppler"
+    elif system == 'Linux':
+        install_cmd = "sudo apt-get install poppler-utils"
+        verify_cmd = "dpkg -l | grep poppler"
+        conda_cmd = "conda install -c conda-forge poppler"
+    else:  # Windows
+        install_cmd = "下载并安装 poppler for Windows: http://blog.alivate.com.au/poppler-windows/"
+        verify_cmd = "检查 poppler 是否在 PATH 中"
+        conda_cmd = "conda install -c conda-forge poppler"
+    
+    # 检查是否在conda环境中
+    conda_env = os.environ.get('CONDA_DEFAULT_ENV', '')
+    conda_info = f"\n检测到conda环境: {conda_env}" if conda_env else "\n未检测到conda环境"
+    
+    return Exception(
+        "未找到poppler工具。\n\n"
+        f"{path_info}{conda_info}\n\n"
+        "安装步骤（选择一种方式）：\n"
+        f"  方式1 - Homebrew (推荐):\n"
+        f"    {install_cmd}\n"
+        f"    验证: {verify_cmd}\n\n"
+        f"  方式2 - Conda (如果使用conda环境):\n"
+        f"    {conda_cmd}\n"
+        f"    验证: conda list poppler\n\n"
+        "安装后：\n"
+        "  1. 如果使用pipenv，请确保在pipenv环境中运行应用\n"
+        "  2. 安装后必须重启应用才能生效\n"
+        "  3. 如果仍无法找到，请检查PATH环境变量\n\n"
+        f"原始错误: {error_msg}"
+    )
+
+
+def _is_poppler_error(error):
+    error_msg = str(error)
+    return 'poppler' in error_msg.lower() or 'PATH' in error_msg
+
+
+def get_pdf_info(pdf_path):
+    """
+    读取PDF文档信息（调用 pdfinfo，不渲染页面）
+    
+    Args:
+        pdf_path: PDF文件路径
+    
+    Returns:
+        dict: pages（页数）、title（标题）、page_size（页面尺寸）
+    
+    Raises:
+        Exception: 未找到poppler或文件无法解析时抛出异常
+    """
+    try:
+        info = pdfinfo_from_path(pdf_path, poppler_path=find_poppler_path())
+    except Exception as e:
+        if _is_poppler_error(e):
+            raise poppler_missing_error(str(e))
+        raise Exception(f"无法读取PDF信息: {str(e)}")
+    return {
+        'pages': int(info.get('Pages', 0)),
+        'title': info.get('Title', ''),
+        'page_size': info.get('Page size', '')
+    }
+
+
+def get_page_count(pdf_path):
+    """
+    获取PDF页数（只读取文档信息，不渲染页面）
+    
+    Args:
+        pdf_path: PDF文件路径
+    
+    Returns:
+        int: 页数
+    """
+    return get_pdf_info(pdf_path)['pages']
+
+
+# 并行渲染使用的共享线程池：每个线程驱动一个 pdftoppm 子进程，实际渲染分布在多个CPU核上，
+# 所有请求共用一个池，同时运行的 pdftoppm 进程数不超过 PDF_WORKERS
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def get_render_pool(workers):
+    """获取共享的渲染线程池（首次调用时按 workers 创建）"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pdf-render')
+        return _render_pool
+
+
+def render_pages(pdf_path, first_page, last_page, dpi, quality, output_folder, poppler_path=None, fmt='jpeg'):
+    """
+    调用 pdftoppm 把 first_page~last_page 渲染为图片文件
+    
+    Args:
+        pdf_path: PDF文件路径
+        first_page: 起始页码（从1开始）
+        last_page: 结束页码（包含）
+        dpi: 分辨率
+        quality: JPEG质量（fmt 为 png 时忽略）
+        output_folder: 输出目录
+        poppler_path: poppler的bin目录
+        fmt: jpeg 或 png
+    
+    Returns:
+        list: 按页码排序的图片文件路径
+    """
+    try:
+        paths = convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            first_page=first_page,
+            last_page=last_page,
+            output_folder=output_folder,
+            fmt=fmt,
+            jpegopt={'quality': quality, 'optimize': True} if fmt == 'jpeg' else None,
+            paths_only=True,
+            poppler_path=poppler_path or find_poppler_path()
+        )
+    except Exception as e:
+        if _is_poppler_error(e):
+            raise poppler_missing_error(str(e))
+        raise
+    return sorted(paths)
+
+
+def _read_batch(paths, first_page):
+    for page_number, path in enumerate(paths, start=first_page):
+        with open(path, 'rb') as f:
+            data = f.read()
+        os.unlink(path)
+        yield page_number, data
+
+
+def iter_jpg_pages(pdf_path, dpi=200, quality=95, batch_size=8, page_count=None, workers=1):
+    """
+    分批把PDF页面渲染为JPG，按页码顺序逐页返回编码后的数据
+    
+    每批由 pdftoppm 直接把 first_page~last_page 输出为JPEG文件，读取后立即删除，
+    内存中最多只有一页的JPEG数据，与文档页数无关。
+    workers 大于1时多个批次并行渲染，最多提前渲染 workers*2 个批次，临时文件占用同样有上限。
+    
+    Args:
+        pdf_path: PDF文件路径
+        dpi: 图片分辨率
+        quality: JPEG质量
+        batch_size: 每次调用pdftoppm渲染的页数
+        page_count: 页数（已知时传入，避免重复读取）
+        workers: 并行渲染的 pdftoppm 进程数
+    
+    Yields:
+        tuple: (页码, JPEG数据)
+    """
+    if page_count is None:
+        page_count = get_page_count(pdf_path)
+    poppler_path = find_poppler_path()
+    
+    if workers > 1:
+        # 页数较少时减小批次，让每个进程都分到页面
+        batch_size = max(1, min(batch_size, -(-page_count // workers)))
+    batches = [(first, min(first + batch_size - 1, page_count))
+               for first in range(1, page_count + 1, batch_size)]
+    
+    with tempfile.TemporaryDirectory(prefix='pdf2jpg_') as output_folder:
+        if workers <= 1:
+            for first_page, last_page in batches:
+                paths = render_pages(pdf_path, first_page, last_page, dpi, quality, output_folder, poppler_path)
+                yield from _read_batch(paths, first_page)
+            return
+        
+        pool = get_render_pool(workers)
+        max_pending = workers * 2
+        pending = deque()
+        next_batch = 0
+        try:
+            while next_batch < len(batches) or pending:
+                while next_batch < len(batches) and len(pending) < max_pending:
+                    first_page, last_page = batches[next_batch]
+                    future = pool.submit(render_pages, pdf_path, first_page, last_page, dpi, quality,
+                                         output_folder, poppler_path)
+                    pending.append((first_page, future))
+                    next_batch += 1
+                # 按提交顺序取结果，保证输出页码有序
+                first_page, future = pending.popleft()
+                yield from _read_batch(future.result(), first_page)
+        finally:
+            # 客户端断开或出错时取消未开始的批次，等待正在运行的批次结束后再删除临时目录
+            for _, future in pending:
+                future.cancel()
+            wait([future for _, future in pending])
+
+
+def _page_zipinfo(page_number):
+    info = zipfile.ZipInfo(f"page_{page_number:04d}.jpg", date_time=time.localtime()[:6])
+    # JPEG已经是压缩格式，再用DEFLATE压缩几乎没有收益，直接存储
+    info.compress_type = zipfile.ZIP_STORED
+    return info
+
+
+def stream_zip_pages(pages):
+    """
+    把 (页码, JPEG数据) 序列打包为ZIP流，逐块返回
+    
+    Args:
+        pages: 可迭代的 (页码, JPEG数据)
+    
+    Yields:
+        bytes: ZIP文件数据
+    """
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as zipf:
+        for page_number, data in pages:
+            zipf.writestr(_page_zipinfo(page_number), data)
+            yield buffer.pop()
+    yield buffer.pop()
+
+
+def stream_pdf_to_jpg_zip(pdf_path, dpi=200, quality=95, batch_size=8, page_count=None, workers=1):
+    """
+    将PDF转换为JPG并以ZIP流的形式逐块返回（边渲染边发送，不生成临时ZIP文件）
+    
+    Args:
+        pdf_path: PDF文件路径
+        dpi: 图片分辨率
+        quality: JPEG质量
+        batch_size: 每批渲染的页数，决定峰值内存和磁盘占用
+        page_count: 页数（已知时传入）
+        workers: 并行渲染的 pdftoppm 进程数
+    
+    Yields:
+        bytes: ZIP文件数据
+    """
+    yield from stream_zip_pages(iter_jpg_pages(pdf_path, dpi, quality, batch_size, page_count, workers))
+
+
+def pdf_to_jpg_zip(pdf_path, output_zip_path=None, dpi=200, quality=95, batch_size=8, workers=1):
     """
     将PDF文件转换为JPG图片并打包为ZIP文件
     
@@ -90,6 +353,9 @@ def pdf_to_jpg_zip(pdf_path, output_zip_path=None, dpi=200):
         pdf_path: PDF文件路径
         output_zip_path: 输出ZIP文件路径，如果为None则自动生成
         dpi: 图片分辨率，默认200
+        quality: JPEG质量，默认95
+        batch_size: 每批渲染的页数
+        workers: 并行渲染的 pdftoppm 进程数
     
     Returns:
         str: ZIP文件路径
@@ -115,88 +381,9 @@ def pdf_to_jpg_zip(pdf_path, output_zip_path=None, dpi=200):
         os.makedirs(output_dir, exist_ok=True)
     
     try:
-        # 查找poppler路径
-        poppler_path = find_poppler_path()
-        
-        # 将PDF转换为图片
-        if poppler_path:
-            images = convert_from_path(pdf_path, dpi=dpi, poppler_path=poppler_path)
-        else:
-            # 尝试不使用路径（如果poppler在系统PATH中）
-            try:
-                images = convert_from_path(pdf_path, dpi=dpi)
-            except Exception as e:
-                error_msg = str(e)
-                if 'poppler' in error_msg.lower() or 'PATH' in error_msg:
-                    # 提供详细的安装说明和诊断信息
-                    import platform
-                    system = platform.system()
-                    install_cmd = ""
-                    verify_cmd = ""
-                    conda_cmd = ""
-                    
-                    # 检查当前PATH
-                    current_path = os.environ.get('PATH', '')
-                    path_info = f"当前PATH: {current_path[:100]}..." if len(current_path) > 100 else f"当前PATH: {current_path}"
-                    
-                    if system == 'Darwin':  # macOS
-                        install_cmd = "brew install poppler"
-                        verify_cmd = "brew list poppler && which pdftoppm"
-                        conda_cmd = "conda install -c conda-forge poppler"
-                    elif system == 'Linux':
-                        install_cmd = "sudo apt-get install poppler-utils"
-                        verify_cmd = "dpkg -l | grep poppler"
-                        conda_cmd = "conda install -c conda-forge poppler"
-                    else:  # Windows
-                        install_cmd = "下载并安装 poppler for Windows: http://blog.alivate.com.au/poppler-windows/"
-                        verify_cmd = "检查 poppler 是否在 PATH 中"
-                        conda_cmd = "conda install -c conda-forge poppler"
-                    
-                    # 检查是否在conda环境中
-                    conda_env = os.environ.get('CONDA_DEFAULT_ENV', '')
-                    conda_info = f"\n检测到conda环境: {conda_env}" if conda_env else "\n未检测到conda环境"
-                    
-                    raise Exception(
-                        "未找到poppler工具。\n\n"
-                        f"{path_info}{conda_info}\n\n"
-                        "安装步骤（选择一种方式）：\n"
-                        f"  方式1 - Homebrew (推荐):\n"
-                        f"    {install_cmd}\n"
-                        f"    验证: {verify_cmd}\n\n"
-                        f"  方式2 - Conda (如果使用conda环境):\n"
-                        f"    {conda_cmd}\n"
-                        f"    验证: conda list poppler\n\n"
-                        "安装后：\n"
-                        "  1. 如果使用pipenv，请确保在pipenv环境中运行应用\n"
-                        "  2. 安装后必须重启应用才能生效\n"
-                        "  3. 如果仍无法找到，请检查PATH环境变量\n\n"
-                        f"原始错误: {error_msg}"
-                    )
-                raise
-        
-        # 创建ZIP文件
-        with zipfile.ZipFile(output_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for i, image in enumerate(images, start=1):
-                # 将图片保存为临时文件
-                temp_img_path = tempfile.NamedTemporaryFile(
-                    suffix='.jpg', 
-                    delete=False
-                )
-                try:
-                    # 转换为RGB模式（确保兼容性）
-                    if image.mode != 'RGB':
-                        image = image.convert('RGB')
-                    
-                    # 保存为JPG
-                    image.save(temp_img_path.name, 'JPEG', quality=95)
-                    
-                    # 添加到ZIP文件
-                    zip_name = f"page_{i:04d}.jpg"
-                    zipf.write(temp_img_path.name, zip_name)
-                finally:
-                    # 删除临时图片文件
-                    if os.path.exists(temp_img_path.name):
-                        os.unlink(temp_img_path.name)
+        with zipfile.ZipFile(output_zip_path, 'w', zipfile.ZIP_STORED) as zipf:
+            for page_number, data in iter_jpg_pages(pdf_path, dpi, quality, batch_size, workers=workers):
+                zipf.writestr(_page_zipinfo(page_number), data)
         
         return output_zip_path
     
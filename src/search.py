@@ -4,83 +4,71 @@
 文件搜索模块
 """
 import os
-import json
 from .file_info import get_file_info, get_folder_info
+from .file_tree import trash_metadata
 
 
-def search_files(upload_folder, query):
-    """搜索文件和文件夹"""
-    results = []
-    
-    # 递归搜索文件和文件夹
-    def search_in_directory(directory, base_path=''):
+def iter_search_files(upload_folder, query, heartbeat=False, trash_lookup=None):
+    """
+    逐个产出匹配的文件和文件夹（不使用索引，逐个目录扫描，按扫描顺序产出）
+
+    Args:
+        heartbeat: 为True时每扫描完一个目录产出一次None，便于调用方在没有新结果时也能及时发送已有结果
+        trash_lookup: 可选的回收站元数据查询函数 (undo_id) -> dict/None，不提供时读取 .meta 文件
+    """
+    query_lower = query.lower()
+    # 用栈代替递归，调用方停止迭代时扫描随之停止
+    stack = [(upload_folder, '')]
+    while stack:
+        directory, base_path = stack.pop()
         try:
-            for entry in os.listdir(directory):
-                entry_path = os.path.join(directory, entry)
-                rel_path = os.path.join(base_path, entry) if base_path else entry
-                
-                # 跳过元数据文件
-                if entry.endswith('.meta'):
-                    continue
-                
-                # 处理.trash目录中的文件（显示原始名称）
-                search_name = entry
-                if base_path == '.trash' or (base_path and base_path.startswith('.trash/')):
-                    metadata_path = entry_path + '.meta'
-                    if os.path.exists(metadata_path):
-                        try:
-                            with open(metadata_path, 'r', encoding='utf-8') as f:
-                                metadata = json.load(f)
-                                search_name = metadata.get('original_name', entry)
-                        except:
-                            pass
-                
-                # 检查名称是否匹配
-                if query.lower() in search_name.lower():
-                    if os.path.isdir(entry_path):
-                        folder_info = get_folder_info(entry_path, rel_path)
-                        # 如果是.trash中的文件，使用原始名称
-                        if base_path == '.trash' or (base_path and base_path.startswith('.trash/')):
-                            metadata_path = entry_path + '.meta'
-                            if os.path.exists(metadata_path):
-                                try:
-                                    with open(metadata_path, 'r', encoding='utf-8') as f:
-                                        metadata = json.load(f)
-                                        folder_info['name'] = metadata.get('original_name', entry)
-                                        folder_info['original_path'] = metadata.get('original_path', '')
-                                        folder_info['is_trash'] = True
-                                except:
-                                    pass
-                        folder_info['match_type'] = 'folder'
-                        results.append(folder_info)
-                    else:
-                        file_info = get_file_info(entry_path, rel_path)
-                        # 如果是.trash中的文件，使用原始名称
-                        if base_path == '.trash' or (base_path and base_path.startswith('.trash/')):
-                            metadata_path = entry_path + '.meta'
-                            if os.path.exists(metadata_path):
-                                try:
-                                    with open(metadata_path, 'r', encoding='utf-8') as f:
-                                        metadata = json.load(f)
-                                        file_info['name'] = metadata.get('original_name', entry)
-                                        file_info['original_path'] = metadata.get('original_path', '')
-                                        file_info['is_trash'] = True
-                                except:
-                                    pass
-                        file_info['match_type'] = 'file'
-                        results.append(file_info)
-                
-                # 递归搜索子目录（包括.trash目录）
-                if os.path.isdir(entry_path):
-                    search_in_directory(entry_path, rel_path)
-        except:
-            pass
-    
-    search_in_directory(upload_folder)
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name.lower())
+        except OSError:
+            continue
+        in_trash = base_path == '.trash' or base_path.startswith('.trash/')
+        subdirs = []
+        for entry in entries:
+            # 跳过元数据文件
+            if entry.name.endswith('.meta'):
+                continue
+            rel_path = f'{base_path}/{entry.name}' if base_path else entry.name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            
+            # .trash目录中的条目按原始名称匹配，元数据只查询一次
+            metadata = trash_metadata(entry.path, trash_lookup) if in_trash else None
+            search_name = metadata.get('original_name', entry.name) if metadata else entry.name
+            
+            # 检查名称是否匹配
+            if query_lower in search_name.lower():
+                if is_dir:
+                    info = get_folder_info(entry.path, rel_path)
+                    info['match_type'] = 'folder'
+                else:
+                    info = get_file_info(entry.path, rel_path)
+                    info['match_type'] = 'file'
+                if metadata:
+                    info['name'] = search_name
+                    info['original_path'] = metadata.get('original_path', '')
+                    info['is_trash'] = True
+                yield info
+            
+            # 子目录（包括.trash目录）稍后扫描
+            if is_dir:
+                subdirs.append((entry.path, rel_path))
+        stack.extend(reversed(subdirs))
+        if heartbeat:
+            yield None
+
+
+def search_files(upload_folder, query, trash_lookup=None):
+    """搜索文件和文件夹"""
+    results = list(iter_search_files(upload_folder, query, trash_lookup=trash_lookup))
     
     # 按名称排序
     results.sort(key=lambda x: x['name'].lower())
     
     return results
-
-
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+存储统计模块
+按（是否在回收站、顶层文件夹、文件类型）分组维护文件总大小和数量的计数器，
+通过 MetadataIndex.add_listener 接收每次变更并增量更新，查询时只汇总这些分组，不访问磁盘。
+
+后台线程定期用元数据索引中的汇总结果校对计数器，修正可能的累计偏差。
+"""
+import time
+import logging
+import threading
+from .utils import format_size
+
+logger = logging.getLogger(__name__)
+
+
+def _bucket_key(row):
+    path = row['path']
+    top = path.split('/', 1)[0] if '/' in path else ''
+    return bool(row['in_trash']), top, row['type']
+
+
+class StorageStats:
+    """增量维护的存储统计"""
+
+    def __init__(self):
+        self.ready = False
+        self._lock = threading.Lock()
+        # (是否在回收站, 顶层文件夹, 类型) -> [总大小, 文件数]
+        self._buckets = {}
+        self._version = 0
+        self._snapshot = None
+        self._thread = None
+
+    # ==================== 维护 ====================
+
+    def _add(self, row, sign):
+        bucket = self._buckets.setdefault(_bucket_key(row), [0, 0])
+        bucket[0] += sign * row['size']
+        bucket[1] += sign
+        if bucket[1] <= 0:
+            del self._buckets[_bucket_key(row)]
+
+    def apply(self, removed, rows, reset=False):
+        """接收元数据索引的变更（MetadataIndex.add_listener 的回调），只统计文件"""
+        with self._lock:
+            if reset:
+                self._buckets = {}
+            for row in removed:
+                if not row['is_dir']:
+                    self._add(row, -1)
+            for row in rows:
+                if not row['is_dir']:
+                    self._add(row, 1)
+            self._version += 1
+            self._snapshot = None
+            self.ready = True
+
+    def reconcile(self, index):
+        """
+        用元数据索引的分组汇总替换计数器
+
+        Returns:
+            bool: 汇总期间计数器有变更时放弃本次校对，返回False
+        """
+        with self._lock:
+            version = self._version
+        totals = index.file_totals()
+        with self._lock:
+            if self._version != version:
+                return False
+            self._buckets = {(in_trash, top, file_type): [size, count]
+                             for in_trash, top, file_type, size, count in totals}
+            self._version += 1
+            self._snapshot = None
+            self.ready = True
+        return True
+
+    def start(self, index, interval):
+        """启动定期校对线程"""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    # 汇总期间有变更时重试，变更本身已经增量计入
+                    for _ in range(3):
+                        if self.reconcile(index):
+                            break
+                except Exception:
+                    logger.exception('校对存储统计失败')
+
+        self._thread = threading.Thread(target=run, name='stats-reconcile', daemon=True)
+        self._thread.start()
+        return self
+
+    # ==================== 查询 ====================
+
+    def snapshot(self):
+        """
+        当前统计（结果缓存到下一次变更，重复查询不重新汇总）
+
+        Returns:
+            dict: total_size、file_count、live / trash 汇总，以及 by_folder、by_type（只含回收站以外的文件）
+        """
+        with self._lock:
+            if self._snapshot is not None:
+                return self._snapshot
+            totals = {False: [0, 0], True: [0, 0]}
+            folders = {}
+            types = {}
+            for (in_trash, top, file_type), (size, count) in self._buckets.items():
+                totals[in_trash][0] += size
+                totals[in_trash][1] += count
+                if in_trash:
+                    continue
+                for group, key in ((folders, top), (types, file_type)):
+                    entry = group.setdefault(key, [0, 0])
+                    entry[0] += size
+                    entry[1] += count
+
+            def summary(size, count):
+                return {'size': size, 'size_human': format_size(size), 'count': count}
+
+            total_size = totals[False][0] + totals[True][0]
+            self._snapshot = {
+                'total_size': total_size,
+                'total_size_human': format_size(total_size),
+                'file_count': totals[False][1] + totals[True][1],
+                'live': summary(*totals[False]),
+                'trash': summary(*totals[True]),
+                'by_folder': sorted((dict(summary(size, count), folder=folder)
+                                     for folder, (size, count) in folders.items()),
+                                    key=lambda item: item['size'], reverse=True),
+                'by_type': sorted((dict(summary(size, count), type=file_type)
+                                   for file_type, (size, count) in types.items()),
+                                  key=lambda item: item['size'], reverse=True)
+            }
+            return self._snapshot
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本分页预览模块
+大文件不整体读入内存：用 os.pread 按需读取，按行号或字节范围返回一页文本。
+不使用mmap：预览的往往是正在写入的日志，读取过程中文件可能被截断（copytruncate 轮转），
+访问mmap中已经不存在的页会触发 SIGBUS，使整个服务器进程退出；pread 只会读到较少的数据。
+
+行号到字节偏移的映射使用稀疏行索引：大约每隔 INDEX_STEP 字节记录一个行首的 (行号, 偏移)，
+2GB的文件只需要几万个检查点；定位某一行时从它前面的检查点向后查找换行符，最多扫描约一个间隔。
+索引按文件的 (inode, 大小, 修改时间) 缓存；文件只是追加了内容时（例如日志）从上次的末尾继续建立。
+
+编码根据文件开头的样本判断（BOM、UTF-8、GBK），不需要解码整个文件。
+UTF-8和GBK的多字节字符中不会出现换行符字节，可以直接按字节查找行边界。
+"""
+import os
+import codecs
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+# 判断编码时读取的样本大小
+SAMPLE_SIZE = 64 * 1024
+
+# 行索引检查点的间隔（字节）
+INDEX_STEP = 64 * 1024
+
+# 判断文件是否只是追加了内容时比较的开头和索引末尾之前的字节数
+FINGERPRINT_SIZE = 4096
+
+# 建立索引和统计换行符时每次读取的块大小（超长的行不会一次复制整段）
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class TextPreviewError(Exception):
+    """无法按文本预览（例如二进制文件）"""
+
+
+def detect_encoding(sample):
+    """
+    根据文件开头的样本判断编码（样本末尾可能切断一个多字节字符，正在写入的文件末尾也可能如此）
+
+    Args:
+        sample: 文件开头的字节
+
+    Returns:
+        tuple: (编码, BOM长度)，二进制文件返回 (None, 0)
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8', len(codecs.BOM_UTF8)
+    if b'\0' in sample:
+        return None, 0
+    for encoding in ('utf-8', 'gbk'):
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            decoder.decode(sample, final=False)
+            return encoding, 0
+        except UnicodeDecodeError:
+            continue
+    return None, 0
+
+
+def read_text(full_path):
+    """
+    读取整个（较小的）文本文件，编码根据开头的样本判断，换行符统一转换为LF
+
+    Returns:
+        tuple: (编码, 文本)
+    Raises:
+        TextPreviewError: 二进制文件
+    """
+    with open(full_path, 'rb') as f:
+        data = f.read()
+    encoding, bom = detect_encoding(data[:SAMPLE_SIZE])
+    if encoding is None:
+        raise TextPreviewError('无法读取文件内容（可能是二进制文件）')
+    text = data[bom:].decode(encoding, errors='replace')
+    return encoding, text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+class FileView:
+    """
+    用 os.pread 读取打开的文件，提供类似mmap的切片和查找；最近读取的一块缓存起来，顺序读取各行时不重复读
+
+    文件在读取过程中变短时，超出新末尾的部分读到的是空数据（切片变短、查找不到）。
+    """
+
+    def __init__(self, fd, size):
+        self.fd = fd
+        self.size = size
+        self._start = 0
+        self._data = b''
+
+    def _load(self, start, length=READ_BLOCK_SIZE):
+        self._data = os.pread(self.fd, max(length, READ_BLOCK_SIZE), start)
+        self._start = start
+
+    def _read(self, start, end):
+        if not (self._start <= start and end <= self._start + len(self._data)):
+            self._load(start, end - start)
+        return self._data[start - self._start:end - self._start]
+
+    def __getitem__(self, key):
+        start = key.start or 0
+        stop = self.size if key.stop is None else min(key.stop, self.size)
+        if stop <= start:
+            return b''
+        return self._read(start, stop)
+
+    def find(self, sub, start, end):
+        """在 [start, end) 中查找，找不到时返回-1"""
+        end = min(end, self.size)
+        if not self._start <= start < self._start + len(self._data):
+            self._load(start)
+        while start < end:
+            # 直接在缓存的块中查找，不复制
+            base = self._start
+            stop = min(end, base + len(self._data))
+            i = self._data.find(sub, start - base, stop - base)
+            if i >= 0:
+                return base + i
+            if stop == end or len(self._data) < READ_BLOCK_SIZE:
+                # 到达范围末尾，或文件已经变短
+                return -1
+            start = stop - len(sub) + 1
+            self._load(start)
+        return -1
+
+    def rfind(self, sub, start, end):
+        """在 [start, end) 中从后向前查找，找不到时返回-1"""
+        end = min(end, self.size)
+        while end > start:
+            block_start = max(start, end - READ_BLOCK_SIZE)
+            i = self._read(block_start, end).rfind(sub)
+            if i >= 0:
+                return block_start + i
+            if block_start == start:
+                return -1
+            end = block_start + len(sub) - 1
+        return -1
+
+
+def count_newlines(view, start, end):
+    """统计 [start, end) 中的换行符数量"""
+    total = 0
+    while start < end:
+        block_end = min(start + READ_BLOCK_SIZE, end)
+        total += view[start:block_end].count(b'\n')
+        start = block_end
+    return total
+
+
+class LineIndex:
+    """一个文件的稀疏行索引"""
+
+    def __init__(self, st, start):
+        self.ino = st.st_ino
+        self.size = 0
+        self.mtime_ns = 0
+        # 检查点：lines[i] 行从 offsets[i] 开始（行号从0开始）
+        self.lines = array('q', [0])
+        self.offsets = array('q', [start])
+        # 已建立索引的末尾：最后一行（还没有换行符）的开始位置，以及它之前的完整行数
+        self.end = start
+        self.complete_lines = 0
+        # 文件开头和索引末尾之前的内容，用于判断文件是否只是追加了内容
+        self.head = b''
+        self.tail = b''
+
+    def is_current(self, st):
+        return st.st_ino == self.ino and st.st_size == self.size and st.st_mtime_ns == self.mtime_ns
+
+    def can_extend(self, st, view):
+        """文件是否只是在末尾追加了内容"""
+        if st.st_ino != self.ino or st.st_size < self.size:
+            return False
+        return view[:len(self.head)] == self.head and view[self.end - len(self.tail):self.end] == self.tail
+
+    def extend(self, fd, st):
+        """从已建立索引的末尾继续扫描到文件末尾（按块读取，扫描大文件不占用进程内存）"""
+        size = st.st_size
+        block_start, lines_before = self.end, self.complete_lines
+        checkpoint = self.offsets[-1]
+        while block_start < size:
+            block = os.pread(fd, min(READ_BLOCK_SIZE, size - block_start), block_start)
+            if not block:
+                break
+            # 距上一个检查点至少 INDEX_STEP 字节之后的第一个行首作为新的检查点
+            counted, line = 0, lines_before
+            search = max(checkpoint + INDEX_STEP - 1 - block_start, 0)
+            while True:
+                newline = block.find(b'\n', search)
+                if newline < 0:
+                    break
+                line += block.count(b'\n', counted, newline + 1)
+                counted = newline + 1
+                checkpoint = block_start + newline + 1
+                self.lines.append(line)
+                self.offsets.append(checkpoint)
+                search = newline + INDEX_STEP
+            last_newline = block.rfind(b'\n')
+            if last_newline >= 0:
+                self.end = block_start + last_newline + 1
+            lines_before = line + block.count(b'\n', counted)
+            block_start += len(block)
+        self.complete_lines = lines_before
+        self.size, self.mtime_ns = size, st.st_mtime_ns
+        self.head = os.pread(fd, min(FINGERPRINT_SIZE, size), 0)
+        tail_size = min(FINGERPRINT_SIZE, self.end)
+        self.tail = os.pread(fd, tail_size, self.end - tail_size)
+
+    @property
+    def total_lines(self):
+        return self.complete_lines + (1 if self.end < self.size else 0)
+
+    def line_offset(self, view, line):
+        """第 line 行的开始位置（line 小于总行数）"""
+        i = bisect_right(self.lines, line) - 1
+        current, pos = self.lines[i], self.offsets[i]
+        while current < line:
+            newline = view.find(b'\n', pos, self.size)
+            if newline < 0:
+                # 文件在读取时变短了
+                return self.size
+            pos = newline + 1
+            current += 1
+        return pos
+
+    def line_at(self, view, offset):
+        """偏移量所在的行号"""
+        i = bisect_right(self.offsets, offset) - 1
+        return self.lines[i] + count_newlines(view, self.offsets[i], offset)
+
+
+class TextPreview:
+    """大文本文件的分页读取，行索引按LRU缓存"""
+
+    def __init__(self, max_indexes=32, max_lines=2000, max_bytes=1024 * 1024, max_line_bytes=64 * 1024):
+        self.max_indexes = max_indexes
+        # 单次最多返回的行数和字节数
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        # 单行超过该长度时截断
+        self.max_line_bytes = max_line_bytes
+        self._indexes = OrderedDict()  # 绝对路径 -> (编码, LineIndex)
+        self._lock = threading.Lock()
+        self._building = {}  # 绝对路径 -> (锁, 等待的请求数)，同一文件同时只有一个请求建立索引
+
+    def _get_index(self, full_path, f, view, st):
+        """取得文件的编码和最新的行索引（必要时建立或延长）"""
+        with self._lock:
+            cached = self._indexes.get(full_path)
+            if cached and cached[1].is_current(st):
+                self._indexes.move_to_end(full_path)
+                return cached
+            build_lock, waiters = self._building.get(full_path, (threading.Lock(), 0))
+            self._building[full_path] = (build_lock, waiters + 1)
+        try:
+            with build_lock:
+                with self._lock:
+                    cached = self._indexes.get(full_path)
+                if cached and cached[1].is_current(st):
+                    return cached
+                if cached and cached[1].can_extend(st, view):
+                    encoding, index = cached
+                else:
+                    encoding, bom = detect_encoding(view[:SAMPLE_SIZE])
+                    if encoding is None:
+                        raise TextPreviewError('无法读取文件内容（可能是二进制文件）')
+                    index = LineIndex(st, bom)
+                # 其他请求可能正在使用旧的索引对象，在副本上延长
+                extended = LineIndex(st, index.offsets[0])
+                extended.lines, extended.offsets = array('q', index.lines), array('q', index.offsets)
+                extended.end, extended.complete_lines = index.end, index.complete_lines
+                extended.extend(f.fileno(), st)
+                with self._lock:
+                    self._indexes[full_path] = (encoding, extended)
+                    self._indexes.move_to_end(full_path)
+                    while len(self._indexes) > self.max_indexes:
+                        self._indexes.popitem(last=False)
+                return encoding, extended
+        finally:
+            with self._lock:
+                build_lock, waiters = self._building[full_path]
+                if waiters > 1:
+                    self._building[full_path] = (build_lock, waiters - 1)
+                else:
+                    del self._building[full_path]
+
+    def _read_lines(self, view, size, pos, max_lines, max_bytes, encoding):
+        """从行首 pos 开始读取若干行，返回 (行列表, 截断的行序号, 结束位置)"""
+        lines, truncated = [], []
+        used = 0
+        while pos < size and len(lines) < max_lines and (used < max_bytes or not lines):
+            limit = min(size, pos + self.max_line_bytes)
+            newline = view.find(b'\n', pos, limit)
+            if newline >= 0:
+                data, next_pos = view[pos:newline], newline + 1
+            elif limit == size:
+                data, next_pos = view[pos:size], size
+            else:
+                # 超长的行只返回开头部分
+                data = view[pos:limit]
+                if len(data) < limit - pos:
+                    # 文件在读取时变短了，到此为止
+                    break
+                newline = view.find(b'\n', limit, size)
+                next_pos = newline + 1 if newline >= 0 else size
+                truncated.append(len(lines))
+            if len(truncated) and truncated[-1] == len(lines):
+                # 截断处可能切断一个多字节字符，不完整的字符不输出
+                text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(data, final=False)
+            else:
+                text = data[:-1].decode(encoding, errors='replace') if data.endswith(b'\r') else data.decode(encoding, errors='replace')
+            lines.append(text)
+            used += next_pos - pos
+            pos = next_pos
+        return lines, truncated, pos
+
+    def read(self, full_path, line=None, count=None, offset=None, length=None):
+        """
+        读取一页文本：指定 line（从0开始）和 count 按行读取；指定 offset 和 length 按字节范围读取
+        （从 offset 所在行的行首开始，返回与范围相交的完整行）
+
+        Returns:
+            dict: encoding、size、total_lines、line（第一行的行号）、lines、truncated（被截断的行序号）、
+                  offset/end（返回内容的字节范围）、eof
+        Raises:
+            TextPreviewError: 二进制文件
+        """
+        count = min(count or self.max_lines, self.max_lines)
+        max_bytes = min(length or self.max_bytes, self.max_bytes)
+        with open(full_path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if st.st_size == 0:
+                return {'encoding': 'utf-8', 'size': 0, 'total_lines': 0, 'line': 0, 'lines': [],
+                        'truncated': [], 'offset': 0, 'end': 0, 'eof': True}
+            view = FileView(f.fileno(), st.st_size)
+            encoding, index = self._get_index(full_path, f, view, st)
+            size, start = index.size, index.offsets[0]
+            if offset is not None:
+                # 在行的中间时回到行首（超长的行从 offset 开始）
+                offset = min(max(offset, start), size)
+                low = max(start, offset - self.max_line_bytes)
+                newline = view.rfind(b'\n', low, offset)
+                if newline >= 0:
+                    pos = newline + 1
+                else:
+                    pos = low if low == start else offset
+                line = index.line_at(view, pos)
+                count = self.max_lines
+            else:
+                line = min(max(line or 0, 0), index.total_lines)
+                pos = index.line_offset(view, line) if line < index.total_lines else size
+            lines, truncated, end = self._read_lines(view, size, pos, count, max_bytes, encoding)
+        return {
+            'encoding': encoding,
+            'size': size,
+            'total_lines': index.total_lines,
+            'line': line,
+            'lines': lines,
+            'truncated': truncated,
+            'offset': pos,
+            'end': end,
+            'eof': end >= size
+        }
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回收站目录模块
+回收站中每个条目（.trash/<undo_id>）的原始路径、原始名称和删除时间保存在一个只追加的目录文件中
+（JSON Lines，每行一条 add 或 del 记录），启动时一次性读入内存，
+列出、搜索、全部恢复和清空回收站都只查内存，不再逐个读取 <undo_id>.meta 文件。
+
+旧版本为每个条目单独写入的 .meta 文件在启动时迁移到目录文件中并删除。
+删除记录累积过多时把目录文件重写为只包含现存条目的紧凑版本。
+"""
+import os
+import json
+import logging
+import threading
+from .file_tree import load_trash_metadata
+
+logger = logging.getLogger(__name__)
+
+# 目录文件中的记录数超过现存条目数的倍数（且超过最小值）时重写目录文件
+COMPACT_RATIO = 2
+COMPACT_MIN_RECORDS = 1000
+
+
+class TrashCatalog:
+    """回收站条目元数据目录"""
+
+    def __init__(self, catalog_path, trash_folder):
+        self.catalog_path = catalog_path
+        self.trash_folder = trash_folder
+        self._lock = threading.Lock()
+        # undo_id -> {'original_path', 'original_name', 'is_dir', 'deleted_at'}
+        self._entries = {}
+        self._records = 0
+
+        catalog_dir = os.path.dirname(catalog_path)
+        if catalog_dir:
+            os.makedirs(catalog_dir, exist_ok=True)
+        self._load()
+
+    # ==================== 加载与迁移 ====================
+
+    def _load(self):
+        """回放目录文件，迁移旧的 .meta 文件，丢弃磁盘上已不存在的条目"""
+        try:
+            with open(self.catalog_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self._records += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 写入中途断电可能留下不完整的最后一行
+                        logger.warning(f'忽略回收站目录中无法解析的记录: {line[:80]!r}')
+                        continue
+                    self._replay(record)
+        except FileNotFoundError:
+            pass
+
+        try:
+            names = set(os.listdir(self.trash_folder))
+        except FileNotFoundError:
+            names = set()
+
+        migrated = []
+        legacy_meta = [name for name in names if name.endswith('.meta')]
+        for meta_name in legacy_meta:
+            undo_id = meta_name[:-len('.meta')]
+            if undo_id in names and undo_id not in self._entries:
+                metadata = load_trash_metadata(os.path.join(self.trash_folder, undo_id))
+                if metadata is not None:
+                    self._entries[undo_id] = metadata
+                    migrated.append(undo_id)
+
+        stale = [undo_id for undo_id in self._entries if undo_id not in names]
+        for undo_id in stale:
+            del self._entries[undo_id]
+
+        if migrated or stale or self._records > len(self._entries):
+            self._compact()
+        if migrated:
+            logger.info(f'已把 {len(migrated)} 个回收站 .meta 文件迁移到 {self.catalog_path}')
+        # 目录文件写入成功后才删除旧文件
+        for meta_name in legacy_meta:
+            try:
+                os.remove(os.path.join(self.trash_folder, meta_name))
+            except OSError:
+                pass
+
+    def _replay(self, record):
+        undo_id = record.get('id')
+        if record.get('op') == 'add':
+            self._entries[undo_id] = {key: value for key, value in record.items() if key not in ('op', 'id')}
+        elif record.get('op') == 'del':
+            self._entries.pop(undo_id, None)
+
+    def _compact(self):
+        """把目录文件重写为只包含现存条目的版本（原子替换）"""
+        tmp_path = self.catalog_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(self._add_line(undo_id, metadata) for undo_id, metadata in self._entries.items())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.catalog_path)
+        self._records = len(self._entries)
+
+    # ==================== 写入 ====================
+
+    @staticmethod
+    def _add_line(undo_id, metadata):
+        return json.dumps({'op': 'add', 'id': undo_id, **metadata}, ensure_ascii=False) + '\n'
+
+    @staticmethod
+    def _del_line(undo_id):
+        return json.dumps({'op': 'del', 'id': undo_id}) + '\n'
+
+    def _append(self, lines):
+        """追加记录（一次写入），需要时重写目录文件"""
+        with open(self.catalog_path, 'a', encoding='utf-8') as f:
+            f.write(''.join(lines))
+        self._records += len(lines)
+        if self._records > max(COMPACT_MIN_RECORDS, COMPACT_RATIO * len(self._entries)):
+            self._compact()
+
+    def add(self, undo_id, metadata):
+        """登记一个移入回收站的条目（在移动文件之前调用）"""
+        with self._lock:
+            # 先放入内存，追加时触发的重写才会包含这个条目
+            self._entries[undo_id] = dict(metadata)
+            try:
+                self._append([self._add_line(undo_id, metadata)])
+            except Exception:
+                del self._entries[undo_id]
+                raise
+
+    def remove(self, *undo_ids):
+        """删除条目的记录（恢复或永久删除后调用），多个条目只追加一次"""
+        with self._lock:
+            undo_ids = [undo_id for undo_id in undo_ids if undo_id in self._entries]
+            if not undo_ids:
+                return
+            for undo_id in undo_ids:
+                del self._entries[undo_id]
+            self._append([self._del_line(undo_id) for undo_id in undo_ids])
+
+    # ==================== 查询 ====================
+
+    def get(self, undo_id):
+        """
+        查询条目的元数据
+
+        Returns:
+            dict: original_path、original_name、is_dir、deleted_at，不存在时返回None
+        """
+        with self._lock:
+            return self._entries.get(undo_id)
+
+    def items(self):
+        """所有条目的 (undo_id, 元数据) 列表（快照）"""
+        with self._lock:
+            return list(self._entries.items())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件系统监听模块
+监听上传目录中的新增、修改、移动和删除（包括绕过Web界面的修改，例如直接rsync到uploads/），
+把变化通知给监听者，用于刷新元数据索引等缓存数据。
+
+Linux 上使用 inotify（通过 ctypes 调用 libc，无需额外依赖），其他平台或 inotify 不可用时
+退化为定期扫描对比快照的轮询方式。
+"""
+import os
+import time
+import errno
+import select
+import struct
+import logging
+import threading
+import ctypes
+import ctypes.util
+
+logger = logging.getLogger(__name__)
+
+# inotify 事件掩码（见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+
+EVENT_HEADER = struct.Struct('iIII')
+
+# 变化类型：changed 表示需要从磁盘重新读取，removed 表示已不存在
+CHANGED = 'changed'
+REMOVED = 'removed'
+
+
+class WatchLimitError(Exception):
+    """inotify 监听数量达到系统上限（fs.inotify.max_user_watches）"""
+
+
+def _join(base, name):
+    return f'{base}/{name}' if base else name
+
+
+def _is_under(path, ancestor):
+    return ancestor == '' or path == ancestor or path.startswith(ancestor + '/')
+
+
+def collapse_changes(changes):
+    """
+    合并变化列表：同一路径只保留最后一次的类型，
+    已经有祖先目录需要整体刷新时，省略其子路径
+
+    Args:
+        changes: dict {rel_path: CHANGED/REMOVED}
+
+    Returns:
+        list: [(kind, rel_path), ...]，按路径排序
+    """
+    result = []
+    refreshed = []
+    for path in sorted(changes):
+        if any(_is_under(path, ancestor) for ancestor in refreshed):
+            continue
+        kind = changes[path]
+        result.append((kind, path))
+        refreshed.append(path)
+    return result
+
+
+class BaseWatcher:
+    """监听器基类：管理监听者、去抖动和后台线程"""
+
+    def __init__(self, upload_folder, debounce=0.5):
+        self.upload_folder = os.path.abspath(upload_folder)
+        self.debounce = debounce
+        self._listeners = []
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_listener(self, callback):
+        """注册监听者 callback(changes)，changes 为 [(kind, rel_path), ...]"""
+        self._listeners.append(callback)
+
+    def _record(self, rel_path, kind):
+        with self._pending_lock:
+            self._pending[rel_path] = kind
+
+    def _flush(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        changes = collapse_changes(pending)
+        for callback in self._listeners:
+            try:
+                callback(changes)
+            except Exception:
+                logger.exception('处理文件变化失败')
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        raise NotImplementedError
+
+
+class InotifyWatcher(BaseWatcher):
+    """基于 inotify 的递归监听（每个子目录一个 watch）"""
+
+    def __init__(self, upload_folder, debounce=0.5):
+        super().__init__(upload_folder, debounce)
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError('当前系统不支持 inotify')
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失败')
+        self._wd_paths = {}
+        self._path_wds = {}
+        try:
+            self._add_watch_tree('')
+        except Exception:
+            os.close(self._fd)
+            raise
+
+    def _add_watch(self, rel_dir):
+        full_path = os.path.join(self.upload_folder, rel_dir) if rel_dir else self.upload_folder
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(full_path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise WatchLimitError('inotify 监听数量已达上限，请调大 fs.inotify.max_user_watches')
+            # 目录在添加监听前已被删除或不是目录，忽略
+            return
+        self._wd_paths[wd] = rel_dir
+        self._path_wds[rel_dir] = wd
+
+    def _add_watch_tree(self, rel_dir):
+        """为目录及其所有子目录添加监听"""
+        self._add_watch(rel_dir)
+        full_path = os.path.join(self.upload_folder, rel_dir) if rel_dir else self.upload_folder
+        try:
+            with os.scandir(full_path) as it:
+                subdirs = [e.name for e in it if e.is_dir(follow_symlinks=False)]
+        except OSError:
+            return
+        for name in subdirs:
+            self._add_watch_tree(_join(rel_dir, name))
+
+    def _remove_watch_tree(self, rel_dir):
+        """目录被移走后，移除其子树上的所有监听"""
+        for path in [p for p in self._path_wds if _is_under(p, rel_dir)]:
+            wd = self._path_wds.pop(path)
+            self._wd_paths.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _handle_event(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            # 事件队列溢出，无法知道丢失了哪些变化，只能整体刷新
+            logger.warning('inotify 事件队列溢出，将全量刷新')
+            self._record('', CHANGED)
+            return
+
+        base = self._wd_paths.get(wd)
+        if base is None:
+            return
+        if mask & IN_IGNORED:
+            self._wd_paths.pop(wd, None)
+            if self._path_wds.get(base) == wd:
+                self._path_wds.pop(base, None)
+            return
+        if mask & IN_DELETE_SELF:
+            return
+        if not name:
+            return
+
+        rel_path = _join(base, name)
+        is_dir = bool(mask & IN_ISDIR)
+
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            if is_dir:
+                self._remove_watch_tree(rel_path)
+            self._record(rel_path, REMOVED)
+            return
+
+        if is_dir and mask & (IN_CREATE | IN_MOVED_TO):
+            try:
+                self._add_watch_tree(rel_path)
+            except WatchLimitError as e:
+                logger.warning(str(e))
+        self._record(rel_path, CHANGED)
+
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            raw_name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length]
+            name = os.fsdecode(raw_name.split(b'\0', 1)[0]) if length else ''
+            self._handle_event(wd, mask, name)
+            offset += EVENT_HEADER.size + length
+
+    def _run(self):
+        flush_at = None
+        try:
+            while not self._stop.is_set():
+                timeout = self.debounce if flush_at is None else max(0.0, flush_at - time.monotonic())
+                readable, _, _ = select.select([self._fd], [], [], timeout)
+                if readable:
+                    self._read_events()
+                    if flush_at is None and self._pending:
+                        flush_at = time.monotonic() + self.debounce
+                if flush_at is not None and time.monotonic() >= flush_at:
+                    flush_at = None
+                    self._flush()
+        finally:
+            os.close(self._fd)
+
+
+class PollingWatcher(BaseWatcher):
+    """定期扫描上传目录并与上一次的快照比较"""
+
+    def __init__(self, upload_folder, interval=5.0, debounce=0.5):
+        super().__init__(upload_folder, debounce)
+        self.interval = interval
+        self._snapshot = None
+
+    def _take_snapshot(self):
+        snapshot = {}
+
+        def scan(directory, base_path):
+            try:
+                with os.scandir(directory) as it:
+                    entries = list(it)
+            except OSError:
+                return
+            for entry in entries:
+                rel_path = _join(base_path, entry.name)
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if is_dir:
+                    # 目录本身的修改时间不参与比较，子项的增删会单独体现，避免整目录重新扫描
+                    snapshot[rel_path] = (True, 0, 0, st.st_ino)
+                    scan(entry.path, rel_path)
+                else:
+                    snapshot[rel_path] = (False, st.st_size, st.st_mtime_ns, st.st_ino)
+
+        scan(self.upload_folder, '')
+        return snapshot
+
+    def _run(self):
+        self._snapshot = self._take_snapshot()
+        while not self._stop.wait(self.interval):
+            snapshot = self._take_snapshot()
+            old = self._snapshot
+            for rel_path, state in snapshot.items():
+                if old.get(rel_path) != state:
+                    self._record(rel_path, CHANGED)
+            for rel_path in old.keys() - snapshot.keys():
+                self._record(rel_path, REMOVED)
+            self._snapshot = snapshot
+            self._flush()
+
+
+def create_watcher(upload_folder, mode='auto', poll_interval=5.0, debounce=0.5):
+    """
+    创建文件系统监听器
+
+    Args:
+        upload_folder: 监听的上传目录
+        mode: auto（优先inotify，失败时轮询）/ inotify / polling / off
+        poll_interval: 轮询间隔（秒）
+        debounce: 事件合并时间窗口（秒）
+
+    Returns:
+        BaseWatcher: 未启动的监听器，mode 为 off 时返回 None
+    """
+    if mode == 'off':
+        return None
+    if mode in ('auto', 'inotify'):
+        try:
+            return InotifyWatcher(upload_folder, debounce=debounce)
+        except (OSError, AttributeError, WatchLimitError) as e:
+            if mode == 'inotify':
+                raise
+            logger.info(f'inotify 不可用，改用轮询方式监听: {e}')
+    return PollingWatcher(upload_folder, interval=poll_interval, debounce=debounce)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ZIP流模块
+把文件夹和多个选中的条目边读边打包为ZIP，逐块返回给响应：不生成临时文件，
+内存占用与文件大小无关，第一个数据块在读取第一个文件时就可以发出。
+
+zipfile 写入不可seek的流时在每个文件数据之后写入数据描述符（CRC和大小），
+超过4GB的文件和超过65535个条目时自动使用ZIP64。
+已经压缩过的格式（图片、音视频、压缩包等）直接存储，其他文件用DEFLATE压缩。
+"""
+import os
+import zipfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 每次读取文件的块大小
+BLOCK_SIZE = 1024 * 1024
+
+# 直接存储不再压缩的扩展名（本身已经是压缩格式，DEFLATE几乎没有收益却很耗CPU）
+STORED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.heif', '.avif',
+    '.mp4', '.m4v', '.mov', '.avi', '.mkv', '.wmv', '.flv', '.webm',
+    '.mp3', '.m4a', '.aac', '.ogg', '.opus', '.flac', '.wma',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.rar', '.br',
+    '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.epub', '.apk', '.jar',
+}
+
+
+class StreamBuffer:
+    """只支持写入的缓冲区，供 zipfile 以流模式（不可seek）写入，写入的数据由生成器及时取走"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def unique_arcname(name, used):
+    """多个选中条目同名时（来自不同文件夹）在扩展名前加序号区分"""
+    if name not in used:
+        used.add(name)
+        return name
+    stem, ext = os.path.splitext(name)
+    index = 2
+    while f'{stem} ({index}){ext}' in used:
+        index += 1
+    name = f'{stem} ({index}){ext}'
+    used.add(name)
+    return name
+
+
+def iter_entries(items):
+    """
+    遍历要打包的文件和文件夹（文件夹按名称顺序递归，跳过符号链接和设备、管道等特殊文件）
+
+    Args:
+        items: 可迭代的 (绝对路径, 包内名称)
+
+    Yields:
+        tuple: (绝对路径, 包内名称, 是否文件夹)
+    """
+    for full_path, arcname in items:
+        if os.path.islink(full_path):
+            continue
+        if os.path.isfile(full_path):
+            yield full_path, arcname, False
+            continue
+        if not os.path.isdir(full_path):
+            continue
+        stack = [(full_path, arcname)]
+        while stack:
+            directory, dir_arcname = stack.pop()
+            yield directory, dir_arcname, True
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            subdirs = []
+            for entry in entries:
+                if entry.is_symlink():
+                    continue
+                child_arcname = f'{dir_arcname}/{entry.name}'
+                if entry.is_dir():
+                    subdirs.append((entry.path, child_arcname))
+                elif entry.is_file():
+                    yield entry.path, child_arcname, False
+            # 倒序压栈，按名称顺序处理子文件夹
+            stack.extend(reversed(subdirs))
+
+
+def _zipinfo(full_path, arcname, is_dir):
+    """根据文件属性生成条目信息（早于1980年的修改时间按1980年记录）"""
+    info = zipfile.ZipInfo.from_file(full_path, arcname, strict_timestamps=False)
+    if is_dir:
+        info.compress_type = zipfile.ZIP_STORED
+    elif os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS:
+        info.compress_type = zipfile.ZIP_STORED
+    else:
+        info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def stream_zip(items, block_size=BLOCK_SIZE):
+    """
+    把文件和文件夹打包为ZIP流，逐块返回
+
+    打包过程中消失的文件会被跳过；文件在读取期间变大时只打包开始读取时的长度。
+
+    Args:
+        items: 可迭代的 (绝对路径, 包内名称)，文件夹会递归打包
+        block_size: 读取块大小
+
+    Yields:
+        bytes: ZIP文件数据
+    """
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w') as zipf:
+        for full_path, arcname, is_dir in iter_entries(items):
+            try:
+                info = _zipinfo(full_path, arcname, is_dir)
+                if is_dir:
+                    zipf.writestr(info, b'')
+                    f = None
+                else:
+                    f = open(full_path, 'rb')
+            except FileNotFoundError:
+                logger.info(f'打包时文件已不存在，跳过: {full_path}')
+                continue
+            if f is not None:
+                with f:
+                    # 以打开时的大小为准，ZIP64标记根据它决定
+                    remaining = info.file_size = os.fstat(f.fileno()).st_size
+                    with zipf.open(info, 'w') as dest:
+                        while remaining > 0:
+                            block = f.read(min(block_size, remaining))
+                            if not block:
+                                break
+                            remaining -= len(block)
+                            dest.write(block)
+                            data = buffer.pop()
+                            if data:
+                                yield data
+            data = buffer.pop()
+            if data:
+                yield data
+    yield buffer.pop()
@@ -1,8 +1,13 @@
-let fileTree = [];
+let fileTree = []; // 根目录已加载的条目（按需分页加载）
+let folderTree = []; // 仅包含文件夹的树，用于各个文件夹选择器
+let treeSort = { sort: 'name', order: 'asc' }; // 服务端排序方式
 let currentSelectedPath = '';
 let currentSelectedItem = null;
 let draggedItem = null;
 let contextMenuTarget = null;
+let selectedItems = new Map(); // 多选的条目：路径 -> { path, isDir, isTrash, undoId }
+let lastClickedPath = null; // Shift 范围选择的起点
+let moveSources = null; // 批量移动的源路径（null 表示移动单个条目）
 
 // 操作历史记录（最多5步）
 let operationHistory = [];
@@ -10,35 +15,42 @@ const MAX_HISTORY = 5;
 
 // 搜索相关
 let searchTimeout = null;
+let searchContentMode = false; // true 时搜索文件内容，false 时搜索文件名
+let searchAbortController = null; // 正在进行的搜索请求，输入改变时取消
 let expandedPaths = new Set(); // 记录展开的文件夹路径
 
-// 加载文件树
+// 获取单个目录的一页内容
+async function fetchListing(path, cursor = null) {
+    const params = new URLSearchParams({ path, sort: treeSort.sort, order: treeSort.order });
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+    const response = await fetch(`/api/list?${params.toString()}`);
+    const data = await response.json();
+    if (!data.success) {
+        throw new Error(data.error);
+    }
+    return data;
+}
+
+// 加载文件树（只加载根目录第一页，子文件夹展开时再按需加载）
 async function loadTree() {
+    clearMultiSelect();
     const browser = document.getElementById('fileBrowser');
     browser.innerHTML = '<div class="loading"><div class="spinner"></div>加载中...</div>';
 
     try {
-        const response = await fetch('/api/tree');
-        const data = await response.json();
-
-        if (data.success) {
-            fileTree = data.tree;
-            renderTree(fileTree);
-            updateFolderSelects();
-            loadStats();
-            loadServerInfo();
-            
-            // 恢复展开状态
-            restoreExpandedState();
-            
-            return Promise.resolve();
-        } else {
-            browser.innerHTML = `<div class="empty-state">
-                <div class="empty-icon">⚠️</div>
-                <div class="empty-text">加载失败: ${data.error}</div>
-            </div>`;
-            return Promise.reject(new Error(data.error));
-        }
+        const data = await fetchListing('');
+        fileTree = data.items;
+        renderTree(fileTree);
+        appendLoadMore(browser, '', data.next_cursor);
+        loadStats();
+        loadServerInfo();
+        
+        // 恢复展开状态
+        await restoreExpandedState();
+        
+        return Promise.resolve();
     } catch (error) {
         browser.innerHTML = `<div class="empty-state">
             <div class="empty-icon">⚠️</div>
@@ -80,6 +92,7 @@ function renderTree(tree, parentElement = null, level = 0) {
     tree.forEach(item => {
         const itemDiv = document.createElement('div');
         itemDiv.className = 'tree-item';
+        itemDiv._item = item; // 就地更新文件树时用于排序比较
         itemDiv.dataset.path = item.path;
         itemDiv.dataset.isDir = item.is_dir;
         if (item.is_trash) {
@@ -93,6 +106,9 @@ function renderTree(tree, parentElement = null, level = 0) {
         if (item.path === currentSelectedPath) {
             contentDiv.classList.add('selected');
         }
+        if (selectedItems.has(item.path)) {
+            contentDiv.classList.add('multi-selected');
+        }
         
         // 添加拖拽事件
         contentDiv.addEventListener('dragstart', handleDragStart);
@@ -118,7 +134,8 @@ function renderTree(tree, parentElement = null, level = 0) {
             // 如果是图片文件，显示缩略图
             if (item.type === 'image') {
                 const imgPath = encodeURIComponent(item.path);
-                html += `<span class="tree-icon tree-thumbnail"><img src="/api/preview?path=${imgPath}" alt="${escapeHtml(item.name)}" loading="lazy" onerror="this.onerror=null; this.style.display='none'; this.parentElement.innerHTML='🖼️';"></span>`;
+                const version = encodeURIComponent(`${item.modified}-${item.size}`);
+                html += `<span class="tree-icon tree-thumbnail"><img src="/api/thumbnail?path=${imgPath}&size=64&v=${version}" alt="${escapeHtml(item.name)}" loading="lazy" onerror="this.onerror=null; this.style.display='none'; this.parentElement.innerHTML='🖼️';"></span>`;
             } else {
                 const icon = getFileIcon(item.type, item.ext);
                 html += `<span class="tree-icon">${icon}</span>`;
@@ -141,10 +158,12 @@ function renderTree(tree, parentElement = null, level = 0) {
             html += `<button class="btn btn-success btn-icon" onclick="restoreItem('${escapeHtml(item.undo_id)}')">恢复</button>`;
             html += `<button class="btn btn-danger btn-icon" onclick="permanentDeleteItem('${escapeHtml(item.undo_id)}')">永久删除</button>`;
         } else {
-            // 普通文件：显示下载、预览、移动、删除
-            if (!item.is_dir) {
+            // 普通文件：显示下载、预览、移动、删除（文件夹打包为ZIP下载）
+            if (item.path !== '.trash') {
                 html += `<button class="btn btn-success btn-icon" onclick="downloadFile('${escapeHtml(item.path)}')">下载</button>`;
-                html += `<button class="btn btn-icon" onclick="previewFile('${escapeHtml(item.path)}')">预览</button>`;
+            }
+            if (!item.is_dir) {
+                html += `<button class="btn btn-icon" onclick="previewFile('${escapeHtml(item.path)}', '${item.type}')">预览</button>`;
             }
             html += `<button class="btn btn-icon" onclick="showMoveModal('${escapeHtml(item.path)}')">移动</button>`;
             html += `<button class="btn btn-danger btn-icon" onclick="deleteItem('${escapeHtml(item.path)}', ${item.is_dir})">删除</button>`;
@@ -186,11 +205,17 @@ function renderTree(tree, parentElement = null, level = 0) {
         
         itemDiv.appendChild(contentDiv);
 
-        if (item.is_dir && item.children && item.children.length > 0) {
+        // 文件夹的子项在展开时才加载
+        if (item.is_dir) {
             const childrenDiv = document.createElement('div');
             childrenDiv.className = 'tree-children';
+            childrenDiv.dataset.loaded = 'false';
             itemDiv.appendChild(childrenDiv);
-            renderTree(item.children, childrenDiv, level + 1);
+            if (item.children) {
+                childrenDiv.dataset.loaded = 'true';
+                renderTree(item.children, childrenDiv, level + 1);
+                appendLoadMore(childrenDiv, item.path, item.next_cursor);
+            }
         }
 
         if (parentElement) {
@@ -225,25 +250,116 @@ function getFileIcon(type, ext) {
     return icons[type] || '📎';
 }
 
+// 在列表末尾添加"加载更多"按钮（没有下一页时移除）
+function appendLoadMore(container, path, cursor) {
+    const oldButton = container.querySelector(':scope > .tree-load-more');
+    if (oldButton) {
+        oldButton.remove();
+    }
+    if (!cursor) return;
+    
+    const button = document.createElement('div');
+    button.className = 'tree-load-more';
+    button.textContent = '加载更多...';
+    button.dataset.path = path;
+    button.dataset.cursor = cursor;
+    button.addEventListener('click', (e) => {
+        e.stopPropagation();
+        loadMoreItems(container);
+    });
+    container.appendChild(button);
+}
+
+// 加载目录的下一页
+async function loadMoreItems(container) {
+    const button = container.querySelector(':scope > .tree-load-more');
+    if (!button || button.dataset.loading === 'true') return false;
+    
+    const path = button.dataset.path;
+    button.dataset.loading = 'true';
+    button.textContent = '加载中...';
+    try {
+        const data = await fetchListing(path, button.dataset.cursor);
+        button.remove();
+        if (!path) {
+            fileTree = fileTree.concat(data.items);
+        }
+        renderTree(data.items, container);
+        appendLoadMore(container, path, data.next_cursor);
+        return true;
+    } catch (error) {
+        button.dataset.loading = 'false';
+        button.textContent = '加载更多...';
+        showAlert(`加载失败: ${error.message}`, 'error');
+        return false;
+    }
+}
+
+// 展开文件夹（首次展开时从服务器加载子项）
+async function expandFolder(itemDiv) {
+    const toggle = itemDiv.querySelector(':scope > .tree-item-content .tree-toggle');
+    const children = itemDiv.querySelector(':scope > .tree-children');
+    if (!toggle || !children) return;
+    
+    const path = itemDiv.dataset.path;
+    if (children.dataset.loaded !== 'true') {
+        children.dataset.loaded = 'true';
+        children.innerHTML = '<div class="tree-loading">加载中...</div>';
+        children.classList.add('expanded');
+        try {
+            const data = await fetchListing(path);
+            children.innerHTML = '';
+            renderTree(data.items, children);
+            appendLoadMore(children, path, data.next_cursor);
+        } catch (error) {
+            children.dataset.loaded = 'false';
+            children.innerHTML = '';
+            children.classList.remove('expanded');
+            expandedPaths.delete(path);
+            showAlert(`加载失败: ${error.message}`, 'error');
+            return;
+        }
+    }
+    
+    toggle.classList.remove('collapsed');
+    toggle.classList.add('expanded');
+    children.classList.add('expanded');
+    expandedPaths.add(path);
+}
+
+// 收起文件夹
+function collapseFolder(itemDiv) {
+    const toggle = itemDiv.querySelector(':scope > .tree-item-content .tree-toggle');
+    const children = itemDiv.querySelector(':scope > .tree-children');
+    if (toggle) {
+        toggle.classList.remove('expanded');
+        toggle.classList.add('collapsed');
+    }
+    if (children) {
+        children.classList.remove('expanded');
+    }
+    expandedPaths.delete(itemDiv.dataset.path);
+}
+
 // 切换文件夹展开/折叠
-function toggleFolder(event, toggle) {
+async function toggleFolder(event, toggle) {
     event.stopPropagation();
     const item = toggle.closest('.tree-item');
-    const children = item.querySelector('.tree-children');
     
-    if (children) {
-        if (toggle.classList.contains('collapsed')) {
-            toggle.classList.remove('collapsed');
-            toggle.classList.add('expanded');
-            children.classList.add('expanded');
-        } else {
-            toggle.classList.remove('expanded');
-            toggle.classList.add('collapsed');
-            children.classList.remove('expanded');
-        }
+    if (toggle.classList.contains('collapsed')) {
+        await expandFolder(item);
+    } else {
+        collapseFolder(item);
     }
 }
 
+// 切换排序方式（由服务端排序）
+function changeTreeSort(value) {
+    const [sort, order] = value.split(':');
+    treeSort = { sort, order };
+    loadTree();
+}
+
 // 处理文件夹名称点击
 function handleFolderNameClick(event, path, isDir) {
     event.stopPropagation();
@@ -251,7 +367,8 @@ function handleFolderNameClick(event, path, isDir) {
     if (!itemDiv) return;
     
     const toggle = itemDiv.querySelector('.tree-toggle');
-    if (toggle) {
+    // 按住 Ctrl/Cmd/Shift 点击时只选择，不展开
+    if (toggle && !(event.ctrlKey || event.metaKey || event.shiftKey)) {
         // 触发展开/收起
         toggleFolder(event, toggle);
     }
@@ -260,8 +377,26 @@ function handleFolderNameClick(event, path, isDir) {
     selectItem(path, isDir, event);
 }
 
-// 选择项目
+// 选择项目（按住 Ctrl/Cmd 点击多选，按住 Shift 点击选择范围）
 function selectItem(path, isDir, event) {
+    const itemDiv = event ? event.target.closest('.tree-item') : null;
+    if (itemDiv && event.type === 'click' && (event.ctrlKey || event.metaKey)) {
+        // 开始多选时把当前选中的条目也加入
+        const current = selectedItems.size === 0 && currentSelectedPath ? findTreeItem(currentSelectedPath) : null;
+        if (current && current !== itemDiv) {
+            setMultiSelected(current, true);
+        }
+        setMultiSelected(itemDiv, !selectedItems.has(path));
+        lastClickedPath = path;
+        updateSelectionBar();
+        return;
+    }
+    if (itemDiv && event.type === 'click' && event.shiftKey && lastClickedPath) {
+        selectRange(lastClickedPath, path);
+        return;
+    }
+    clearMultiSelect();
+    lastClickedPath = path;
     currentSelectedPath = path;
     currentSelectedItem = { path, isDir };
     
@@ -282,15 +417,300 @@ function selectItem(path, isDir, event) {
     }
 }
 
-// 更新文件夹选择器
-function updateFolderSelects() {
+// ==================== 多选与批量操作 ====================
+
+// 在文件树中查找条目元素
+function findTreeItem(path) {
+    return document.querySelector(`#fileBrowser .tree-item[data-path="${CSS.escape(path)}"]`);
+}
+
+// 可以多选的条目：回收站文件夹本身和回收站条目内部的文件不参与批量操作
+function isSelectable(itemDiv) {
+    const path = itemDiv.dataset.path;
+    return path !== '.trash' && (itemDiv.dataset.isTrash === 'true' || !path.startsWith('.trash/'));
+}
+
+function setMultiSelected(itemDiv, selected) {
+    const path = itemDiv.dataset.path;
+    const content = itemDiv.querySelector(':scope > .tree-item-content');
+    if (selected && isSelectable(itemDiv)) {
+        selectedItems.set(path, {
+            path,
+            isDir: itemDiv.dataset.isDir === 'true',
+            isTrash: itemDiv.dataset.isTrash === 'true',
+            undoId: itemDiv.dataset.undoId || null
+        });
+        content.classList.add('multi-selected');
+    } else {
+        selectedItems.delete(path);
+        content.classList.remove('multi-selected');
+    }
+}
+
+// 选择两个条目之间（按当前显示顺序）的所有可见条目
+function selectRange(fromPath, toPath) {
+    const visible = Array.from(document.querySelectorAll('#fileBrowser .tree-item'))
+        .filter(el => el.offsetParent !== null);
+    const from = visible.findIndex(el => el.dataset.path === fromPath);
+    const to = visible.findIndex(el => el.dataset.path === toPath);
+    if (from < 0 || to < 0) return;
+    visible.slice(Math.min(from, to), Math.max(from, to) + 1).forEach(el => setMultiSelected(el, true));
+    updateSelectionBar();
+}
+
+function clearMultiSelect() {
+    selectedItems.clear();
+    document.querySelectorAll('.tree-item-content.multi-selected').forEach(el => el.classList.remove('multi-selected'));
+    updateSelectionBar();
+}
+
+// 选中的条目中去掉已被选中文件夹包含的条目
+function selectedRoots() {
+    const items = Array.from(selectedItems.values());
+    return items.filter(item => !items.some(other => other !== item && other.isDir && item.path.startsWith(other.path + '/')));
+}
+
+// 显示多选操作栏：普通条目可以下载、移动、删除，回收站条目可以恢复
+function updateSelectionBar() {
+    const bar = document.getElementById('selectionBar');
+    if (!bar) return;
+    const items = Array.from(selectedItems.values());
+    if (items.length === 0) {
+        bar.style.display = 'none';
+        return;
+    }
+    const trashCount = items.filter(item => item.isTrash).length;
+    document.getElementById('selectionCount').textContent = `已选择 ${items.length} 项`;
+    bar.querySelectorAll('.selection-normal').forEach(el => {
+        el.style.display = trashCount === 0 ? '' : 'none';
+    });
+    bar.querySelectorAll('.selection-trash').forEach(el => {
+        el.style.display = trashCount === items.length ? '' : 'none';
+    });
+    bar.style.display = 'flex';
+}
+
+// 发送批量请求
+async function postBatch(url, body) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+    const data = await response.json();
+    if (!data.success) {
+        throw new Error(data.error);
+    }
+    return data;
+}
+
+// 提示批量操作结果（有失败时显示第一个失败原因）
+function reportBatch(data, label) {
+    if (data.failed === 0) {
+        showAlert(`${label}成功：共 ${data.succeeded} 项`, 'success');
+        return;
+    }
+    const failure = data.results.find(result => !result.success);
+    showAlert(`${label}完成：成功 ${data.succeeded} 项，失败 ${data.failed} 项（${failure.item}: ${failure.error}）`, 'error');
+}
+
+// 批量移动
+async function batchMove(sources, target) {
+    try {
+        const data = await postBatch('/api/batch/move', { sources, target });
+        clearMultiSelect();
+        applyTreeDelta(data.delta);
+        reportBatch(data, '移动');
+        return data;
+    } catch (error) {
+        showAlert(`移动失败: ${error.message}`, 'error');
+        return null;
+    }
+}
+
+// 移动选中的条目
+function moveSelected() {
+    const items = selectedRoots();
+    if (items.length === 0) return;
+    showMoveModal(items[0].path, items.map(item => item.path));
+}
+
+// 删除选中的条目（移入回收站，可按 Ctrl+Z 撤销）
+async function deleteSelected() {
+    const items = selectedRoots();
+    if (items.length === 0 || !confirm(`确定要删除选中的 ${items.length} 项吗？`)) {
+        return;
+    }
+    try {
+        const data = await postBatch('/api/batch/delete', { paths: items.map(item => item.path) });
+        const undoIds = data.results.filter(result => result.success).map(result => result.undo_id);
+        if (undoIds.length > 0) {
+            addToHistory({ type: 'batch-delete', undo_ids: undoIds });
+        }
+        clearMultiSelect();
+        applyTreeDelta(data.delta);
+        reportBatch(data, '删除');
+    } catch (error) {
+        showAlert(`删除失败: ${error.message}`, 'error');
+    }
+}
+
+// 恢复选中的回收站条目
+async function restoreSelected() {
+    const undoIds = Array.from(selectedItems.values()).filter(item => item.isTrash).map(item => item.undoId);
+    if (undoIds.length === 0) return;
+    try {
+        const data = await postBatch('/api/batch/restore', { undo_ids: undoIds });
+        clearMultiSelect();
+        applyTreeDelta(data.delta);
+        reportBatch(data, '恢复');
+    } catch (error) {
+        showAlert(`恢复失败: ${error.message}`, 'error');
+    }
+}
+
+// 下载选中的条目：单个文件直接下载，多个条目或文件夹打包为一个ZIP（边打包边下载）
+async function downloadSelected() {
+    const paths = selectedRoots().map(item => item.path);
+    if (paths.length === 0) return;
+    try {
+        // 先校验全部条目，避免表单提交后页面跳转到错误信息
+        const data = await postBatch('/api/batch/download', { paths });
+        if (data.failed > 0) {
+            reportBatch(data, '下载');
+            return;
+        }
+        if (paths.length === 1) {
+            downloadFile(paths[0]);
+            return;
+        }
+        const form = document.createElement('form');
+        form.method = 'POST';
+        form.action = '/api/batch/download-zip';
+        form.style.display = 'none';
+        paths.forEach(path => {
+            const input = document.createElement('input');
+            input.type = 'hidden';
+            input.name = 'paths';
+            input.value = path;
+            form.appendChild(input);
+        });
+        document.body.appendChild(form);
+        form.submit();
+        form.remove();
+    } catch (error) {
+        showAlert(`下载失败: ${error.message}`, 'error');
+    }
+}
+
+// 与服务端相同的排序键（file_tree._sort_key）
+function treeSortKey(item) {
+    const name = item.name.toLowerCase();
+    if (treeSort.sort === 'size') {
+        return [item.size || 0, name, item.path];
+    }
+    if (treeSort.sort === 'modified') {
+        return [item.mtime, name, item.path];
+    }
+    if (treeSort.sort === 'type') {
+        return [item.is_dir ? 0 : 1, item.type, item.ext, name, item.path];
+    }
+    return [name, item.path];
+}
+
+function compareTreeItems(a, b) {
+    const keyA = treeSortKey(a);
+    const keyB = treeSortKey(b);
+    const sign = treeSort.order === 'desc' ? -1 : 1;
+    for (let i = 0; i < keyA.length; i++) {
+        if (keyA[i] < keyB[i]) return -sign;
+        if (keyA[i] > keyB[i]) return sign;
+    }
+    return 0;
+}
+
+// 把条目按当前排序插入到已加载的父目录中（父目录未展开或条目属于尚未加载的后续页时跳过）
+function insertTreeItem(info) {
+    if (findTreeItem(info.path)) return;
+    const slash = info.path.lastIndexOf('/');
+    const parentPath = slash >= 0 ? info.path.slice(0, slash) : '';
+    let container;
+    if (parentPath) {
+        const parentDiv = findTreeItem(parentPath);
+        container = parentDiv ? parentDiv.querySelector(':scope > .tree-children') : null;
+        if (!container || container.dataset.loaded !== 'true') return;
+    } else {
+        container = document.getElementById('fileBrowser');
+    }
+
+    const before = Array.from(container.querySelectorAll(':scope > .tree-item'))
+        .find(el => el._item && compareTreeItems(info, el._item) < 0);
+    const loadMore = container.querySelector(':scope > .tree-load-more');
+    if (!before && loadMore) return;
+
+    const fragment = document.createDocumentFragment();
+    renderTree([info], fragment);
+    container.insertBefore(fragment, before || loadMore || null);
+    if (!parentPath) {
+        fileTree.push(info);
+    }
+}
+
+// 更新已显示条目的大小和修改时间
+function updateTreeItem(itemDiv, info) {
+    itemDiv._item = info;
+    const content = itemDiv.querySelector(':scope > .tree-item-content');
+    content.querySelector('.tree-size').textContent = info.size_human;
+    content.querySelector('.tree-date').textContent = info.modified;
+}
+
+// 按批量操作返回的变化就地更新文件树，不重新加载
+function applyTreeDelta(delta) {
+    const browser = document.getElementById('fileBrowser');
+    if (!delta || browser.querySelector(':scope > .empty-state')) {
+        loadTree();
+        return;
+    }
+    const removed = new Set(delta.removed);
+    removed.forEach(path => {
+        const itemDiv = findTreeItem(path);
+        if (itemDiv) {
+            itemDiv.remove();
+        }
+        expandedPaths.delete(path);
+    });
+    fileTree = fileTree.filter(item => !removed.has(item.path));
+    delta.updated.forEach(info => {
+        const itemDiv = findTreeItem(info.path);
+        if (itemDiv) {
+            updateTreeItem(itemDiv, info);
+        } else {
+            insertTreeItem(info);
+        }
+    });
+    delta.added.forEach(insertTreeItem);
+    loadStats();
+}
+
+// 更新文件夹选择器（从服务器获取仅包含文件夹的树）
+async function updateFolderSelects() {
+    try {
+        const response = await fetch('/api/folders');
+        const data = await response.json();
+        if (data.success) {
+            folderTree = data.folders;
+        }
+    } catch (error) {
+        console.error('加载文件夹列表失败:', error);
+    }
+    
     const selects = ['uploadFolderSelect', 'createFolderSelect', 'createFileFolderSelect', 'moveTargetSelect'];
     selects.forEach(selectId => {
         const select = document.getElementById(selectId);
         if (select) {
             const currentValue = select.value;
             select.innerHTML = '<option value="">根目录</option>';
-            addFolderOptions(fileTree, select, '');
+            addFolderOptions(folderTree, select, '');
             if (currentValue) {
                 select.value = currentValue;
             }
@@ -318,14 +738,16 @@ function showUploadModal() {
     document.getElementById('uploadModal').classList.add('show');
     document.getElementById('fileInput').value = '';
     document.getElementById('uploadProgress').classList.remove('show');
+    updateFolderSelects();
 }
 
 // 显示创建文件夹模态框
-function showCreateFolderModal(parent = '') {
+async function showCreateFolderModal(parent = '') {
     const modal = document.getElementById('createFolderModal');
     modal.classList.add('show');
     const input = document.getElementById('folderNameInput');
     input.value = '';
+    await updateFolderSelects();
     if (parent) {
         document.getElementById('createFolderSelect').value = parent;
     } else {
@@ -336,26 +758,28 @@ function showCreateFolderModal(parent = '') {
 }
 
 // 显示移动模态框
-function showMoveModal(path) {
+async function showMoveModal(path, sources = null) {
     currentSelectedPath = path;
+    moveSources = sources && sources.length > 1 ? sources : null;
+    document.getElementById('moveModal').classList.add('show');
+    await updateFolderSelects();
     const select = document.getElementById('moveTargetSelect');
     select.innerHTML = '<option value="">根目录</option>';
-    addFolderOptionsForMove(fileTree, select, '', path);
-    document.getElementById('moveModal').classList.add('show');
+    addFolderOptionsForMove(folderTree, select, '', moveSources || [path]);
 }
 
-// 为移动功能添加文件夹选项（排除当前项及其子项）
-function addFolderOptionsForMove(tree, select, prefix, excludePath) {
+// 为移动功能添加文件夹选项（排除要移动的条目及其子项）
+function addFolderOptionsForMove(tree, select, prefix, excludePaths) {
     tree.forEach(item => {
         if (item.is_dir) {
-            // 排除当前要移动的文件夹及其子文件夹
-            if (item.path !== excludePath && !item.path.startsWith(excludePath + '/')) {
+            // 排除要移动的文件夹及其子文件夹
+            if (!excludePaths.some(path => item.path === path || item.path.startsWith(path + '/'))) {
                 const option = document.createElement('option');
                 option.value = item.path;
                 option.textContent = (prefix ? prefix + ' / ' : '') + item.name;
                 select.appendChild(option);
                 if (item.children) {
-                    addFolderOptionsForMove(item.children, select, item.path, excludePath);
+                    addFolderOptionsForMove(item.children, select, item.path, excludePaths);
                 }
             }
         }
@@ -367,6 +791,266 @@ function closeModal(modalId) {
     document.getElementById(modalId).classList.remove('show');
 }
 
+// 分片上传请求失败后的重试次数
+const CHUNK_RETRY_LIMIT = 3;
+
+// 断点续传记录的键：同一文件上传到同一文件夹时复用未完成的上传
+function uploadResumeKey(file, targetFolder) {
+    return `upload:${targetFolder}:${file.name}:${file.size}:${file.lastModified}`;
+}
+
+// 上传一个分片（XHR 可以报告上传进度）
+function putChunk(uploadId, index, blob, onProgress) {
+    return new Promise((resolve, reject) => {
+        const xhr = new XMLHttpRequest();
+        xhr.upload.addEventListener('progress', (e) => {
+            if (e.lengthComputable) {
+                onProgress(e.loaded);
+            }
+        });
+        xhr.onload = () => {
+            let data = null;
+            try {
+                data = JSON.parse(xhr.responseText);
+            } catch (e) {
+                // 非JSON响应按状态码处理
+            }
+            if (xhr.status === 200 && data && data.success) {
+                resolve();
+            } else {
+                const error = new Error((data && data.error) || '分片上传失败');
+                error.status = xhr.status;
+                reject(error);
+            }
+        };
+        xhr.onerror = () => reject(new Error('网络错误'));
+        xhr.open('PUT', `/api/upload/${uploadId}/chunks/${index}`);
+        xhr.setRequestHeader('Content-Type', 'application/octet-stream');
+        xhr.send(blob);
+    });
+}
+
+// 获取可续传的上传会话，没有时新建
+async function openUploadSession(file, targetFolder) {
+    const resumeKey = uploadResumeKey(file, targetFolder);
+    const savedId = localStorage.getItem(resumeKey);
+    if (savedId) {
+        try {
+            const response = await fetch(`/api/upload/${savedId}`);
+            const data = await response.json();
+            if (data.success) {
+                return { upload: data.upload, parallel: data.parallel };
+            }
+        } catch (error) {
+            // 查询失败时重新开始上传
+        }
+        localStorage.removeItem(resumeKey);
+    }
+
+    const response = await fetch('/api/upload/init', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ name: file.name, folder: targetFolder, size: file.size })
+    });
+    const data = await response.json();
+    if (!data.success) {
+        throw new Error(data.error);
+    }
+    localStorage.setItem(resumeKey, data.upload.upload_id);
+    return { upload: data.upload, parallel: data.parallel };
+}
+
+// 分片上传单个文件：多个分片并发上传，中断后再次上传同一文件会跳过已完成的分片
+async function uploadFileInChunks(file, targetFolder, onProgress) {
+    const { upload, parallel } = await openUploadSession(file, targetFolder);
+    const chunkSize = upload.chunk_size;
+    const received = new Set(upload.received);
+    const pending = [];
+    for (let index = 0; index < upload.total_chunks; index++) {
+        if (!received.has(index)) {
+            pending.push(index);
+        }
+    }
+
+    const chunkLength = (index) => Math.min(chunkSize, file.size - index * chunkSize);
+    let completedBytes = 0;
+    received.forEach(index => { completedBytes += chunkLength(index); });
+    const inflightBytes = new Map();
+    const reportProgress = () => {
+        let loaded = completedBytes;
+        inflightBytes.forEach(bytes => { loaded += bytes; });
+        onProgress(loaded, file.size);
+    };
+    reportProgress();
+
+    const worker = async () => {
+        while (pending.length > 0) {
+            const index = pending.shift();
+            const blob = file.slice(index * chunkSize, index * chunkSize + chunkLength(index));
+            for (let attempt = 1; ; attempt++) {
+                try {
+                    await putChunk(upload.upload_id, index, blob, (loaded) => {
+                        inflightBytes.set(index, loaded);
+                        reportProgress();
+                    });
+                    break;
+                } catch (error) {
+                    inflightBytes.delete(index);
+                    // 4xx 错误重试也不会成功（例如会话已过期）
+                    if (attempt >= CHUNK_RETRY_LIMIT || (error.status >= 400 && error.status < 500)) {
+                        throw error;
+                    }
+                    await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+                }
+            }
+            inflightBytes.delete(index);
+            completedBytes += blob.size;
+            reportProgress();
+        }
+    };
+
+    const workerCount = Math.max(1, Math.min(parallel || 4, pending.length));
+    await Promise.all(Array.from({ length: workerCount }, worker));
+
+    const response = await fetch(`/api/upload/${upload.upload_id}/complete`, { method: 'POST' });
+    const data = await response.json();
+    if (!data.success) {
+        throw new Error(data.error);
+    }
+    localStorage.removeItem(uploadResumeKey(file, targetFolder));
+    return data.file;
+}
+
+// ==================== 秒传 ====================
+
+// 计算哈希时每次读取的大小
+const HASH_SLICE_SIZE = 4 * 1024 * 1024;
+
+const SHA256_K = new Uint32Array([
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2
+]);
+
+// 可分块计算的SHA-256（通过HTTP访问局域网地址时 crypto.subtle 不可用，而且它只能一次计算整个文件）
+class Sha256 {
+    constructor() {
+        this.state = new Uint32Array([
+            0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19
+        ]);
+        this.buffer = new Uint8Array(64);
+        this.bufferLength = 0;
+        this.totalLength = 0;
+        this.w = new Uint32Array(64);
+    }
+
+    update(data) {
+        this.totalLength += data.length;
+        let offset = 0;
+        if (this.bufferLength > 0) {
+            const take = Math.min(64 - this.bufferLength, data.length);
+            this.buffer.set(data.subarray(0, take), this.bufferLength);
+            this.bufferLength += take;
+            offset = take;
+            if (this.bufferLength < 64) return;
+            this.compress(this.buffer, 0);
+            this.bufferLength = 0;
+        }
+        for (; offset + 64 <= data.length; offset += 64) {
+            this.compress(data, offset);
+        }
+        this.buffer.set(data.subarray(offset), 0);
+        this.bufferLength = data.length - offset;
+    }
+
+    compress(bytes, offset) {
+        const w = this.w;
+        for (let i = 0; i < 16; i++) {
+            const j = offset + i * 4;
+            w[i] = (bytes[j] << 24) | (bytes[j + 1] << 16) | (bytes[j + 2] << 8) | bytes[j + 3];
+        }
+        for (let i = 16; i < 64; i++) {
+            const x = w[i - 15], y = w[i - 2];
+            const s0 = ((x >>> 7) | (x << 25)) ^ ((x >>> 18) | (x << 14)) ^ (x >>> 3);
+            const s1 = ((y >>> 17) | (y << 15)) ^ ((y >>> 19) | (y << 13)) ^ (y >>> 10);
+            w[i] = w[i - 16] + s0 + w[i - 7] + s1;
+        }
+        const h = this.state;
+        let a = h[0], b = h[1], c = h[2], d = h[3], e = h[4], f = h[5], g = h[6], k = h[7];
+        for (let i = 0; i < 64; i++) {
+            const s1 = ((e >>> 6) | (e << 26)) ^ ((e >>> 11) | (e << 21)) ^ ((e >>> 25) | (e << 7));
+            const t1 = (k + s1 + ((e & f) ^ (~e & g)) + SHA256_K[i] + w[i]) | 0;
+            const s0 = ((a >>> 2) | (a << 30)) ^ ((a >>> 13) | (a << 19)) ^ ((a >>> 22) | (a << 10));
+            const t2 = (s0 + ((a & b) ^ (a & c) ^ (b & c))) | 0;
+            k = g; g = f; f = e; e = (d + t1) | 0;
+            d = c; c = b; b = a; a = (t1 + t2) | 0;
+        }
+        h[0] += a; h[1] += b; h[2] += c; h[3] += d;
+        h[4] += e; h[5] += f; h[6] += g; h[7] += k;
+    }
+
+    hex() {
+        const bitLength = this.totalLength * 8;
+        const padding = new Uint8Array(((this.bufferLength < 56 ? 56 : 120) - this.bufferLength) + 8);
+        padding[0] = 0x80;
+        const view = new DataView(padding.buffer);
+        view.setUint32(padding.length - 8, Math.floor(bitLength / 0x100000000));
+        view.setUint32(padding.length - 4, bitLength >>> 0);
+        this.update(padding);
+        return Array.from(this.state, word => word.toString(16).padStart(8, '0')).join('');
+    }
+}
+
+// 分块读取文件计算SHA-256
+async function hashFile(file, onProgress) {
+    const hasher = new Sha256();
+    for (let offset = 0; offset < file.size; offset += HASH_SLICE_SIZE) {
+        const slice = file.slice(offset, offset + HASH_SLICE_SIZE);
+        hasher.update(new Uint8Array(await slice.arrayBuffer()));
+        onProgress(Math.min(offset + HASH_SLICE_SIZE, file.size), file.size);
+    }
+    return hasher.hex();
+}
+
+async function checkUpload(body) {
+    const response = await fetch('/api/upload/check', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+    const data = await response.json();
+    if (!data.success) {
+        throw new Error(data.error);
+    }
+    return data;
+}
+
+// 尝试秒传：服务器可能已有同样大小的文件时计算哈希，内容已存在则直接完成，返回文件信息；否则返回null
+async function tryInstantUpload(file, targetFolder, onHashProgress) {
+    // 有未完成的上传时继续上传
+    if (localStorage.getItem(uploadResumeKey(file, targetFolder))) {
+        return null;
+    }
+    try {
+        const body = { name: file.name, folder: targetFolder, size: file.size };
+        const precheck = await checkUpload(body);
+        if (!precheck.candidate) {
+            return null;
+        }
+        const sha256 = await hashFile(file, onHashProgress);
+        const data = await checkUpload({ ...body, sha256 });
+        return data.exists ? data.file : null;
+    } catch (error) {
+        // 检查失败时正常上传
+        return null;
+    }
+}
+
 // 上传文件
 async function startUpload() {
     const fileInput = document.getElementById('fileInput');
@@ -383,43 +1067,23 @@ async function startUpload() {
     const progressText = document.getElementById('progressText');
     progressDiv.classList.add('show');
 
+    const updateProgress = (loaded, total) => {
+        const percent = total > 0 ? Math.round((loaded / total) * 100) : 100;
+        progressFill.style.width = percent + '%';
+    };
+    let instantCount = 0;
     for (let i = 0; i < files.length; i++) {
         const file = files[i];
-        const formData = new FormData();
-        formData.append('file', file);
-        if (targetFolder) {
-            formData.append('folder', targetFolder);
-        }
-
         try {
+            progressText.textContent = `校验中: ${file.name} (${i + 1}/${files.length})`;
+            progressFill.style.width = '0%';
+            if (await tryInstantUpload(file, targetFolder, updateProgress)) {
+                instantCount++;
+                continue;
+            }
             progressText.textContent = `上传中: ${file.name} (${i + 1}/${files.length})`;
-            
-            const xhr = new XMLHttpRequest();
-            
-            xhr.upload.addEventListener('progress', (e) => {
-                if (e.lengthComputable) {
-                    const percent = Math.round((e.loaded / e.total) * 100);
-                    progressFill.style.width = percent + '%';
-                }
-            });
-
-            await new Promise((resolve, reject) => {
-                xhr.onload = () => {
-                    if (xhr.status === 200) {
-                        const data = JSON.parse(xhr.responseText);
-                        if (data.success) {
-                            resolve();
-                        } else {
-                            reject(new Error(data.error));
-                        }
-                    } else {
-                        reject(new Error('上传失败'));
-                    }
-                };
-                xhr.onerror = () => reject(new Error('网络错误'));
-                xhr.open('POST', '/api/upload');
-                xhr.send(formData);
-            });
+            progressFill.style.width = '0%';
+            await uploadFileInChunks(file, targetFolder, updateProgress);
         } catch (error) {
             showAlert(`上传失败: ${error.message}`, 'error');
             progressDiv.classList.remove('show');
@@ -431,7 +1095,7 @@ async function startUpload() {
     progressDiv.classList.remove('show');
     closeModal('uploadModal');
     loadTree();
-    showAlert('文件上传成功！', 'success');
+    showAlert(instantCount > 0 ? `文件上传成功！其中 ${instantCount} 个文件服务器已有，已秒传` : '文件上传成功！', 'success');
 }
 
 // 创建文件夹
@@ -469,6 +1133,13 @@ async function createFolder() {
 async function moveItem() {
     const target = document.getElementById('moveTargetSelect').value;
 
+    if (moveSources) {
+        if (await batchMove(moveSources, target)) {
+            closeModal('moveModal');
+        }
+        return;
+    }
+
     try {
         const response = await fetch('/api/move', {
             method: 'POST',
@@ -495,8 +1166,12 @@ function downloadFile(path) {
     window.location.href = `/api/download?path=${encodeURIComponent(path)}`;
 }
 
-// 预览文件
-function previewFile(path) {
+// 预览文件（文本文件在分页浏览器中打开）
+function previewFile(path, type) {
+    if (type === 'text') {
+        openTextViewer(path);
+        return;
+    }
     window.open(`/api/preview?path=${encodeURIComponent(path)}`, '_blank');
 }
 
@@ -574,6 +1249,15 @@ async function undoLastOperation() {
         } catch (error) {
             showAlert(`撤销失败: ${error.message}`, 'error');
         }
+    } else if (lastOp.type === 'batch-delete') {
+        try {
+            const data = await postBatch('/api/batch/restore', { undo_ids: lastOp.undo_ids });
+            operationHistory.shift();
+            applyTreeDelta(data.delta);
+            reportBatch(data, '撤销');
+        } catch (error) {
+            showAlert(`撤销失败: ${error.message}`, 'error');
+        }
     } else {
         showAlert('该操作不支持撤销', 'error');
     }
@@ -642,7 +1326,11 @@ async function emptyTrash() {
 
         if (data.success) {
             loadTree();
-            showAlert(data.message, 'success');
+            if (data.job) {
+                trackJob(data.job);
+            } else {
+                showAlert(data.message, 'success');
+            }
         } else {
             showAlert(`清空失败: ${data.error}`, 'error');
         }
@@ -668,7 +1356,11 @@ async function permanentDeleteItem(undoId) {
 
         if (data.success) {
             loadTree();
-            showAlert('永久删除成功！', 'success');
+            if (data.job) {
+                trackJob(data.job);
+            } else {
+                showAlert('永久删除成功！', 'success');
+            }
         } else {
             showAlert(`删除失败: ${data.error}`, 'error');
         }
@@ -677,6 +1369,67 @@ async function permanentDeleteItem(undoId) {
     }
 }
 
+// 后台删除任务（清空回收站、永久删除文件夹）的进度
+const JOB_LABELS = { 'empty-trash': '清空回收站', 'permanent-delete': '永久删除' };
+const trackedJobs = new Set();
+
+function formatJobProgress(job) {
+    const label = JOB_LABELS[job.kind] || '后台删除';
+    const counts = job.total ? `${job.deleted} / ${job.total}` : `${job.deleted}`;
+    const percent = job.progress !== null ? `（${Math.round(job.progress * 100)}%）` : '';
+    return `${label}: 已删除 ${counts} 个条目${percent}`;
+}
+
+// 显示任务进度并每秒刷新，任务结束后提示结果
+async function trackJob(job) {
+    if (trackedJobs.has(job.id)) {
+        return;
+    }
+    trackedJobs.add(job.id);
+    const label = JOB_LABELS[job.kind] || '后台删除';
+    const alert = document.createElement('div');
+    alert.className = 'alert alert-info show';
+    alert.textContent = formatJobProgress(job);
+    document.getElementById('alertContainer').appendChild(alert);
+
+    try {
+        while (job.state === 'running') {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const response = await fetch(`/api/jobs/${job.id}`);
+            const data = await response.json();
+            if (!data.success) {
+                throw new Error(data.error);
+            }
+            job = data.job;
+            alert.textContent = formatJobProgress(job);
+        }
+        if (job.state === 'done') {
+            showAlert(`${label}完成，共删除 ${job.deleted} 个条目`, 'success');
+        } else {
+            showAlert(`${label}失败: ${job.error}`, 'error');
+        }
+    } catch (error) {
+        showAlert(`查询任务进度失败: ${error.message}`, 'error');
+    } finally {
+        alert.remove();
+        trackedJobs.delete(job.id);
+        loadStats();
+    }
+}
+
+// 页面加载时继续显示进行中的任务（例如刷新页面或服务重启后）
+async function resumeJobTracking() {
+    try {
+        const response = await fetch('/api/jobs?active=1');
+        const data = await response.json();
+        if (data.success) {
+            data.jobs.forEach(job => trackJob(job));
+        }
+    } catch (error) {
+        console.error('加载后台任务失败:', error);
+    }
+}
+
 // 键盘快捷键
 document.addEventListener('keydown', (e) => {
     // Ctrl+Z 或 Cmd+Z (Mac) 撤销
@@ -693,8 +1446,15 @@ async function loadStats() {
         const data = await response.json();
 
         if (data.success) {
-            document.getElementById('storageInfo').innerHTML = 
-                `📦 已用空间: ${data.total_size_human}`;
+            const storageInfo = document.getElementById('storageInfo');
+            storageInfo.innerHTML = `📦 已用空间: ${data.total_size_human}`;
+            // 鼠标悬停显示分布
+            if (data.live) {
+                const lines = [`文件: ${data.live.size_human}（${data.live.count} 个）`,
+                               `回收站: ${data.trash.size_human}（${data.trash.count} 个）`];
+                data.by_type.slice(0, 5).forEach(item => lines.push(`${item.type}: ${item.size_human}`));
+                storageInfo.title = lines.join('\n');
+            }
         }
     } catch (error) {
         console.error('加载统计失败:', error);
@@ -812,6 +1572,10 @@ function handleDragStart(e) {
         path: itemDiv.dataset.path,
         isDir: itemDiv.dataset.isDir === 'true'
     };
+    // 拖动多选中的条目时移动全部选中的条目
+    if (selectedItems.has(draggedItem.path) && selectedItems.size > 1) {
+        draggedItem.paths = selectedRoots().map(item => item.path);
+    }
     
     const contentDiv = e.target.closest('.tree-item-content');
     if (contentDiv) {
@@ -937,6 +1701,15 @@ async function handleDrop(e) {
     
     target.classList.remove('drag-over', 'drag-over-folder');
     
+    if (draggedItem.paths) {
+        const sources = draggedItem.paths.filter(path => path !== targetFolder && !targetFolder.startsWith(path + '/'));
+        draggedItem = null;
+        if (sources.length > 0) {
+            await batchMove(sources, targetFolder);
+        }
+        return;
+    }
+    
     // 执行移动
     try {
         const response = await fetch('/api/move', {
@@ -1003,6 +1776,7 @@ function showContextMenu(x, y, isRoot) {
     document.getElementById('menuRename').style.display = 'none';
     document.getElementById('menuMove').style.display = 'none';
     document.getElementById('menuEditImage').style.display = 'none';
+    document.getElementById('menuPdfViewer').style.display = 'none';
     document.getElementById('menuPdfToJpg').style.display = 'none';
     document.getElementById('menuRestore').style.display = 'none';
     document.getElementById('menuRestoreAll').style.display = 'none';
@@ -1042,6 +1816,7 @@ function showContextMenu(x, y, isRoot) {
         
         // 如果是PDF文件，显示导出为JPG选项
         if (contextMenuTarget && contextMenuTarget.path.toLowerCase().endsWith('.pdf')) {
+            document.getElementById('menuPdfViewer').style.display = 'flex';
             document.getElementById('menuPdfToJpg').style.display = 'flex';
         }
     } else {
@@ -1140,6 +1915,14 @@ function contextMenuEditImage() {
     }
 }
 
+// 右键菜单：PDF分页浏览
+function contextMenuPdfViewer() {
+    hideContextMenu();
+    if (contextMenuTarget && !contextMenuTarget.isRoot && !contextMenuTarget.isDir) {
+        openPdfViewer(contextMenuTarget.path);
+    }
+}
+
 // 右键菜单：PDF导出为JPG
 function contextMenuPdfToJpg() {
     hideContextMenu();
@@ -1156,11 +1939,12 @@ function isImageFile(path) {
 }
 
 // 显示创建文件模态框
-function showCreateFileModal(parent = '') {
+async function showCreateFileModal(parent = '') {
     const modal = document.getElementById('createFileModal');
     modal.classList.add('show');
     const input = document.getElementById('fileNameInput');
     input.value = '';
+    await updateFolderSelects();
     if (parent) {
         document.getElementById('createFileFolderSelect').value = parent;
     } else {
@@ -1271,10 +2055,11 @@ document.getElementById('fileBrowser').addEventListener('contextmenu', (e) => {
 document.getElementById('searchInput').addEventListener('input', (e) => {
     const query = e.target.value.trim();
     
-    // 清除之前的搜索定时器
+    // 清除之前的搜索定时器，取消还在返回结果的搜索
     if (searchTimeout) {
         clearTimeout(searchTimeout);
     }
+    cancelSearch();
     
     const resultsDiv = document.getElementById('searchResults');
     
@@ -1284,23 +2069,131 @@ document.getElementById('searchInput').addEventListener('input', (e) => {
     }
     
     // 延迟搜索，避免频繁请求
-    searchTimeout = setTimeout(async () => {
-        try {
-            const response = await fetch(`/api/search?q=${encodeURIComponent(query)}`);
+    searchTimeout = setTimeout(() => runSearch(query), 300);
+});
+
+// 切换搜索文件名 / 搜索文件内容
+function toggleSearchMode() {
+    searchContentMode = !searchContentMode;
+    const button = document.getElementById('searchModeBtn');
+    const input = document.getElementById('searchInput');
+    button.textContent = searchContentMode ? '📄' : '🔍';
+    button.title = searchContentMode ? '当前：搜索文件内容（点击切换为搜索文件名）' : '当前：搜索文件名（点击切换为搜索文件内容）';
+    button.classList.toggle('active', searchContentMode);
+    input.placeholder = searchContentMode ? '搜索文件内容...' : '搜索文件或文件夹...';
+    // 匹配方式只对文件名搜索有效
+    document.getElementById('searchMatchMode').disabled = searchContentMode;
+    rerunSearch();
+    input.focus();
+}
+
+// 匹配方式改变后重新搜索
+function rerunSearch() {
+    const query = document.getElementById('searchInput').value.trim();
+    if (query) {
+        runSearch(query);
+    }
+}
+
+// 取消正在进行的搜索（服务器端随之停止扫描）
+function cancelSearch() {
+    if (searchAbortController) {
+        searchAbortController.abort();
+        searchAbortController = null;
+    }
+}
+
+// 显示搜索错误
+function showSearchError(message) {
+    const resultsDiv = document.getElementById('searchResults');
+    resultsDiv.innerHTML = `<div class="search-result-item">搜索失败: ${escapeHtml(message)}</div>`;
+    resultsDiv.classList.add('show');
+}
+
+// 执行搜索
+async function runSearch(query) {
+    cancelSearch();
+    const controller = new AbortController();
+    searchAbortController = controller;
+    try {
+        if (searchContentMode) {
+            const response = await fetch(`/api/search/content?q=${encodeURIComponent(query)}`, { signal: controller.signal });
             const data = await response.json();
-            
             if (data.success) {
-                displaySearchResults(data.results, data.count);
+                displaySearchResults(data.results, data.count, data.indexing);
             } else {
-                resultsDiv.innerHTML = `<div class="search-result-item">搜索失败: ${data.error}</div>`;
-                resultsDiv.classList.add('show');
+                showSearchError(data.error);
             }
-        } catch (error) {
-            resultsDiv.innerHTML = `<div class="search-result-item">搜索失败: ${error.message}</div>`;
-            resultsDiv.classList.add('show');
+        } else {
+            await streamNameSearch(query, controller.signal);
         }
-    }, 300);
-});
+    } catch (error) {
+        if (error.name !== 'AbortError') {
+            showSearchError(error.message);
+        }
+    } finally {
+        if (searchAbortController === controller) {
+            searchAbortController = null;
+        }
+    }
+}
+
+// 流式搜索文件名：逐行读取NDJSON，结果到达后立即追加显示
+async function streamNameSearch(query, signal) {
+    const params = new URLSearchParams({ q: query, mode: document.getElementById('searchMatchMode').value });
+    const response = await fetch(`/api/search/stream?${params}`, { signal });
+    if (!response.ok) {
+        const data = await response.json();
+        throw new Error(data.error || `HTTP ${response.status}`);
+    }
+    
+    const resultsDiv = document.getElementById('searchResults');
+    resultsDiv.innerHTML = '<div class="search-result-count">搜索中...</div><div class="search-result-list"></div>';
+    resultsDiv.classList.add('show');
+    const countDiv = resultsDiv.querySelector('.search-result-count');
+    const listDiv = resultsDiv.querySelector('.search-result-list');
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let count = 0;
+    let summary = null;
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        let html = '';
+        for (const line of lines) {
+            if (!line) continue;
+            const item = JSON.parse(line);
+            if (item.done) {
+                summary = item;
+            } else {
+                html += searchResultItemHtml(item, query);
+                count++;
+            }
+        }
+        if (html) {
+            listDiv.insertAdjacentHTML('beforeend', html);
+            countDiv.textContent = `已找到 ${count} 个结果，搜索中...`;
+        }
+    }
+    
+    if (!summary) {
+        countDiv.textContent = `找到 ${count} 个结果（搜索中断）`;
+    } else if (summary.error) {
+        countDiv.textContent = `找到 ${count} 个结果（${summary.error}）`;
+    } else if (count === 0) {
+        countDiv.remove();
+        listDiv.innerHTML = '<div class="search-result-item">未找到匹配的文件或文件夹</div>';
+    } else {
+        countDiv.textContent = summary.truncated
+            ? `结果过多，仅显示前 ${count} 个，请输入更精确的关键词`
+            : `找到 ${count} 个结果`;
+    }
+}
 
 // 高亮匹配的文字
 function highlightText(text, query) {
@@ -1313,46 +2206,61 @@ function highlightText(text, query) {
     return escapedText.replace(regex, '<span class="search-highlight">$1</span>');
 }
 
+// 内容搜索的匹配片段：先转义HTML，再把服务器返回的 \x01 / \x02 标记替换为高亮标签
+function renderSnippet(snippet) {
+    return escapeHtml(snippet)
+        .replace(/\x01/g, '<span class="search-highlight">')
+        .replace(/\x02/g, '</span>');
+}
+
 // 显示搜索结果
-function displaySearchResults(results, count) {
+function displaySearchResults(results, count, indexing = false) {
     const resultsDiv = document.getElementById('searchResults');
     const query = document.getElementById('searchInput').value.trim();
+    const indexingNote = indexing ? '<div class="search-result-count">正在建立全文索引，结果可能不完整</div>' : '';
     
     if (results.length === 0) {
-        resultsDiv.innerHTML = '<div class="search-result-item">未找到匹配的文件或文件夹</div>';
+        const emptyText = searchContentMode ? '未找到包含该内容的文件' : '未找到匹配的文件或文件夹';
+        resultsDiv.innerHTML = `${indexingNote}<div class="search-result-item">${emptyText}</div>`;
         resultsDiv.classList.add('show');
         return;
     }
     
-    let html = `<div class="search-result-count">找到 ${count} 个结果</div>`;
-    
+    let html = `${indexingNote}<div class="search-result-count">找到 ${count} 个结果</div>`;
     results.forEach(result => {
-        let iconHtml;
-        if (result.is_dir) {
-            iconHtml = '📁';
-        } else if (result.type === 'image') {
-            iconHtml = `<img src="/api/preview?path=${encodeURIComponent(result.path)}" alt="${escapeHtml(result.name)}" loading="lazy" onerror="this.outerHTML='🖼️'">`;
-        } else {
-            iconHtml = getFileIcon(result.type, result.ext);
-        }
-        const highlightedName = highlightText(result.name, query);
-        const highlightedPath = highlightText(result.path, query);
-        
-        html += `
-            <div class="search-result-item" onclick="navigateToItem('${escapeHtml(result.path)}', ${result.is_dir})">
-                <span class="search-result-icon ${result.type === 'image' ? 'search-result-thumbnail' : ''}">${iconHtml}</span>
-                <div class="search-result-info">
-                    <div class="search-result-name">${highlightedName}</div>
-                    <div class="search-result-path">${highlightedPath}</div>
-                </div>
-            </div>
-        `;
+        html += searchResultItemHtml(result, query);
     });
     
     resultsDiv.innerHTML = html;
     resultsDiv.classList.add('show');
 }
 
+// 单个搜索结果的HTML
+function searchResultItemHtml(result, query) {
+    let iconHtml;
+    if (result.is_dir) {
+        iconHtml = '📁';
+    } else if (result.type === 'image') {
+        iconHtml = `<img src="/api/thumbnail?path=${encodeURIComponent(result.path)}&size=64&v=${encodeURIComponent(`${result.modified}-${result.size}`)}" alt="${escapeHtml(result.name)}" loading="lazy" onerror="this.outerHTML='🖼️'">`;
+    } else {
+        iconHtml = getFileIcon(result.type, result.ext);
+    }
+    const highlightedName = highlightText(result.name, query);
+    const highlightedPath = highlightText(result.path, query);
+    
+    return `
+        <div class="search-result-item" onclick="navigateToItem('${escapeHtml(result.path)}', ${result.is_dir})">
+            <span class="search-result-icon ${result.type === 'image' ? 'search-result-thumbnail' : ''}">${iconHtml}</span>
+            <div class="search-result-info">
+                <div class="search-result-name">${highlightedName}</div>
+                <div class="search-result-path">${highlightedPath}</div>
+                ${result.snippet !== undefined ? `<div class="search-result-snippet">${renderSnippet(result.snippet)}</div>` : ''}
+                ${result.truncated ? '<div class="search-result-note">文件超过全文索引的大小上限，只搜索了开头部分</div>' : ''}
+            </div>
+        </div>
+    `;
+}
+
 // 导航到指定文件/文件夹
 function navigateToItem(path, isDir) {
     // 保存当前展开状态
@@ -1370,11 +2278,13 @@ function navigateToItem(path, isDir) {
     }
     
     // 重新加载树并展开路径
-    loadTree().then(() => {
-        // 展开所有父文件夹
-        pathsToExpand.forEach(parentPath => {
-            expandPath(parentPath);
-        });
+    loadTree().then(async () => {
+        // 依次展开所有父文件夹（子项按需加载）
+        for (const parentPath of pathsToExpand) {
+            await revealItem(parentPath);
+            await expandPath(parentPath);
+        }
+        await revealItem(path);
         
         // 滚动到目标项并选中
         setTimeout(() => {
@@ -1398,20 +2308,47 @@ function saveExpandedState() {
     });
 }
 
-// 展开指定路径
-function expandPath(path) {
-    document.querySelectorAll('.tree-item').forEach(item => {
+// 查找指定路径的树节点
+function findTreeItem(path) {
+    for (const item of document.querySelectorAll('.tree-item')) {
         if (item.dataset.path === path) {
-            const toggle = item.querySelector('.tree-toggle');
-            const children = item.querySelector('.tree-children');
-            
-            if (toggle && children && toggle.classList.contains('collapsed')) {
-                toggle.classList.remove('collapsed');
-                toggle.classList.add('expanded');
-                children.classList.add('expanded');
-            }
+            return item;
         }
-    });
+    }
+    return null;
+}
+
+// 确保指定路径的节点已加载（不在已加载的页中时继续加载下一页）
+async function revealItem(path) {
+    const parentPath = path.includes('/') ? path.substring(0, path.lastIndexOf('/')) : '';
+    let container;
+    if (parentPath) {
+        const parentItem = findTreeItem(parentPath);
+        container = parentItem ? parentItem.querySelector(':scope > .tree-children') : null;
+    } else {
+        container = document.getElementById('fileBrowser');
+    }
+    if (!container) return false;
+    
+    while (!findTreeItem(path)) {
+        if (!await loadMoreItems(container)) {
+            return false;
+        }
+    }
+    return true;
+}
+
+// 展开指定路径
+async function expandPath(path) {
+    const item = findTreeItem(path);
+    if (!item) {
+        expandedPaths.delete(path);
+        return;
+    }
+    const toggle = item.querySelector(':scope > .tree-item-content .tree-toggle');
+    if (toggle && toggle.classList.contains('collapsed')) {
+        await expandFolder(item);
+    }
 }
 
 // 滚动到指定项
@@ -1434,11 +2371,12 @@ function scrollToItem(path) {
     });
 }
 
-// 恢复展开状态
-function restoreExpandedState() {
-    expandedPaths.forEach(path => {
-        expandPath(path);
-    });
+// 恢复展开状态（先展开上层文件夹，再展开下层）
+async function restoreExpandedState() {
+    const paths = Array.from(expandedPaths).sort((a, b) => a.split('/').length - b.split('/').length);
+    for (const path of paths) {
+        await expandPath(path);
+    }
 }
 
 // PDF导出为JPG
@@ -1597,6 +2535,400 @@ document.addEventListener('click', (e) => {
     }
 });
 
+// ==================== PDF分页浏览 ====================
+
+// 每次向后预渲染的页数（一次请求、一次 pdftoppm 调用）
+const PDF_PREFETCH_PAGES = 3;
+
+let pdfViewer = { path: '', page: 1, pages: 0, prefetched: 0 };
+
+function pdfPageUrl(path, page) {
+    return `/api/pdf/page?path=${encodeURIComponent(path)}&page=${page}`;
+}
+
+// 打开PDF分页浏览（只获取页数，页面在翻到时才渲染）
+async function openPdfViewer(path) {
+    try {
+        const response = await fetch(`/api/pdf/info?path=${encodeURIComponent(path)}`);
+        const data = await response.json();
+        if (!data.success) {
+            showAlert(`打开失败: ${data.error}`, 'error');
+            return;
+        }
+        if (data.pages === 0) {
+            showAlert('PDF没有页面', 'error');
+            return;
+        }
+        pdfViewer = { path, page: 1, pages: data.pages, prefetched: 0 };
+        document.getElementById('pdfViewerTitle').textContent = data.title || path.split('/').pop();
+        document.getElementById('pdfViewerTotal').textContent = data.pages;
+        document.getElementById('pdfViewerPage').max = data.pages;
+        document.getElementById('pdfViewerModal').classList.add('show');
+        showPdfPage(1);
+    } catch (error) {
+        showAlert(`打开失败: ${error.message}`, 'error');
+    }
+}
+
+function showPdfPage(page) {
+    page = Math.min(Math.max(1, page), pdfViewer.pages);
+    pdfViewer.page = page;
+    document.getElementById('pdfViewerPage').value = page;
+
+    const img = document.getElementById('pdfViewerImage');
+    const loading = document.getElementById('pdfViewerLoading');
+    loading.style.display = 'block';
+    img.onload = () => { loading.style.display = 'none'; };
+    img.onerror = () => {
+        loading.style.display = 'none';
+        showAlert(`第 ${page} 页加载失败`, 'error');
+    };
+    img.src = pdfPageUrl(pdfViewer.path, page);
+
+    prefetchPdfPages(page + 1);
+}
+
+// 在后台预渲染后面几页，翻页时直接命中缓存
+function prefetchPdfPages(first) {
+    const last = Math.min(first + PDF_PREFETCH_PAGES - 1, pdfViewer.pages);
+    if (first > last || last <= pdfViewer.prefetched) {
+        return;
+    }
+    first = Math.max(first, pdfViewer.prefetched + 1);
+    pdfViewer.prefetched = last;
+    fetch('/api/pdf/pages', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ path: pdfViewer.path, first, last })
+    }).catch(() => {});
+}
+
+function pdfViewerGo(delta) {
+    showPdfPage(pdfViewer.page + delta);
+}
+
+function pdfViewerJump(value) {
+    const page = parseInt(value, 10);
+    if (!isNaN(page)) {
+        // 跳转后从新位置重新开始预渲染
+        pdfViewer.prefetched = Math.min(pdfViewer.prefetched, page);
+        showPdfPage(page);
+    }
+}
+
+function closePdfViewer() {
+    document.getElementById('pdfViewerModal').classList.remove('show');
+    document.getElementById('pdfViewerImage').removeAttribute('src');
+    pdfViewer = { path: '', page: 1, pages: 0, prefetched: 0 };
+}
+
+// 左右方向键翻页，Esc关闭
+document.addEventListener('keydown', (e) => {
+    if (!document.getElementById('pdfViewerModal').classList.contains('show')) {
+        return;
+    }
+    if (e.target.tagName === 'INPUT') {
+        return;
+    }
+    if (e.key === 'ArrowLeft') {
+        pdfViewerGo(-1);
+    } else if (e.key === 'ArrowRight') {
+        pdfViewerGo(1);
+    } else if (e.key === 'Escape') {
+        closePdfViewer();
+    }
+});
+
+// ==================== 文本分页浏览 ====================
+
+// 行高（像素，与 .text-viewer-lines 的 line-height 一致）
+const TEXT_VIEWER_LINE_HEIGHT = 20;
+// 每次请求的行数
+const TEXT_VIEWER_PAGE_LINES = 500;
+// 最多缓存的页数（离开可见范围的页按加载顺序丢弃）
+const TEXT_VIEWER_CACHED_PAGES = 20;
+// 滚动区域的最大高度：浏览器元素高度有上限（约3300万像素），行数很多时按比例把滚动位置映射到行号
+const TEXT_VIEWER_MAX_SCROLL_HEIGHT = 10000000;
+// 实时跟随时页面中保留的最多行数（更早的行被丢弃）
+const TEXT_FOLLOW_MAX_LINES = 10000;
+
+let textViewer = { path: '', totalLines: 0, pages: new Map(), loading: new Set(), firstLine: 0, follow: null };
+let textViewerFrame = null;
+
+function textPageUrl(path, page) {
+    return `/api/preview/text?path=${encodeURIComponent(path)}&line=${page * TEXT_VIEWER_PAGE_LINES}&count=${TEXT_VIEWER_PAGE_LINES}`;
+}
+
+// 打开文本分页浏览（只加载第一页和总行数，滚动到哪里加载哪里），atEnd 为true时滚动到最后一行
+async function openTextViewer(path, atEnd = false) {
+    try {
+        const response = await fetch(textPageUrl(path, 0));
+        const data = await response.json();
+        if (!data.success) {
+            showAlert(`打开失败: ${data.error}`, 'error');
+            return;
+        }
+        stopTextFollow();
+        textViewer = { path, totalLines: 0, pages: new Map(), loading: new Set(), firstLine: 0, follow: null };
+        storeTextPage(0, data);
+
+        document.getElementById('textViewerTitle').textContent = path.split('/').pop();
+        document.getElementById('textViewerInfo').textContent = `${data.encoding.toUpperCase()} · ${data.size_human}`;
+        setTextViewerTotal(data.total_lines);
+        const body = document.getElementById('textViewerBody');
+        document.getElementById('textViewerModal').classList.add('show');
+        body.scrollTop = 0;
+        body.scrollLeft = 0;
+        if (atEnd) {
+            textViewerJump(data.total_lines);
+        }
+        renderTextViewer();
+    } catch (error) {
+        showAlert(`打开失败: ${error.message}`, 'error');
+    }
+}
+
+function setTextViewerTotal(totalLines) {
+    textViewer.totalLines = totalLines;
+    document.getElementById('textViewerTotal').textContent = totalLines;
+    document.getElementById('textViewerLine').max = Math.max(totalLines, 1);
+    document.getElementById('textViewerSpacer').style.height =
+        `${Math.min(totalLines * TEXT_VIEWER_LINE_HEIGHT, TEXT_VIEWER_MAX_SCROLL_HEIGHT)}px`;
+}
+
+function storeTextPage(page, data) {
+    textViewer.pages.set(page, { lines: data.lines, truncated: new Set(data.truncated) });
+    while (textViewer.pages.size > TEXT_VIEWER_CACHED_PAGES) {
+        textViewer.pages.delete(textViewer.pages.keys().next().value);
+    }
+}
+
+async function loadTextPage(page) {
+    if (textViewer.loading.has(page)) {
+        return;
+    }
+    const path = textViewer.path;
+    textViewer.loading.add(page);
+    try {
+        const response = await fetch(textPageUrl(path, page));
+        const data = await response.json();
+        if (textViewer.path !== path) {
+            return;
+        }
+        if (!data.success) {
+            showAlert(`读取失败: ${data.error}`, 'error');
+            return;
+        }
+        storeTextPage(page, data);
+        scheduleTextViewerRender();
+    } catch (error) {
+        showAlert(`读取失败: ${error.message}`, 'error');
+    } finally {
+        textViewer.loading.delete(page);
+    }
+}
+
+// 可见区域能显示的行数，以及滚动位置对应的第一行
+function textViewerLayout() {
+    const body = document.getElementById('textViewerBody');
+    const visible = Math.ceil(body.clientHeight / TEXT_VIEWER_LINE_HEIGHT) + 1;
+    const maxFirst = Math.max(0, textViewer.totalLines - visible + 1);
+    const scrollable = body.scrollHeight - body.clientHeight;
+    let first;
+    if (textViewer.totalLines * TEXT_VIEWER_LINE_HEIGHT <= TEXT_VIEWER_MAX_SCROLL_HEIGHT) {
+        first = Math.floor(body.scrollTop / TEXT_VIEWER_LINE_HEIGHT);
+    } else {
+        first = scrollable > 0 ? Math.round(body.scrollTop / scrollable * maxFirst) : 0;
+    }
+    return { body, visible, maxFirst, scrollable, first: Math.min(first, maxFirst) };
+}
+
+// 只渲染可见的行，缺少的页在后台加载
+function renderTextViewer() {
+    const { body, visible, first } = textViewerLayout();
+    textViewer.firstLine = first;
+    const last = Math.min(first + visible, textViewer.totalLines);
+
+    let html = '';
+    const follow = textViewer.follow;
+    const baseLine = follow ? follow.baseLine : 0;
+    const numberWidth = String(baseLine + textViewer.totalLines).length;
+    for (let line = first; line < last; line++) {
+        if (follow) {
+            const number = String(baseLine + line + 1).padStart(numberWidth, ' ');
+            const text = line < follow.lines.length ? follow.lines[line] : follow.partial;
+            html += `<span class="text-line-number">${number}</span>${escapeHtml(text)}\n`;
+            continue;
+        }
+        const page = Math.floor(line / TEXT_VIEWER_PAGE_LINES);
+        const cached = textViewer.pages.get(page);
+        const number = String(line + 1).padStart(numberWidth, ' ');
+        if (!cached) {
+            loadTextPage(page);
+            html += `<span class="text-line-number">${number}</span><span class="text-line-loading">…</span>\n`;
+            continue;
+        }
+        const index = line - page * TEXT_VIEWER_PAGE_LINES;
+        const text = escapeHtml(cached.lines[index] ?? '');
+        const mark = cached.truncated.has(index) ? '<span class="text-line-truncated">（行太长，已截断）</span>' : '';
+        html += `<span class="text-line-number">${number}</span>${text}${mark}\n`;
+    }
+
+    const linesEl = document.getElementById('textViewerLines');
+    linesEl.innerHTML = html;
+    // 行内容跟随滚动位置（不超出占位高度，以免撑大滚动区域），滚动区域本身只是占位
+    const spacerHeight = Math.min(textViewer.totalLines * TEXT_VIEWER_LINE_HEIGHT, TEXT_VIEWER_MAX_SCROLL_HEIGHT);
+    const offset = Math.min(body.scrollTop - (body.scrollTop % TEXT_VIEWER_LINE_HEIGHT),
+                            Math.max(0, spacerHeight - (last - first) * TEXT_VIEWER_LINE_HEIGHT));
+    linesEl.style.transform = `translateY(${offset}px)`;
+    const lineInput = document.getElementById('textViewerLine');
+    if (document.activeElement !== lineInput) {
+        lineInput.value = baseLine + first + 1;
+    }
+}
+
+function scheduleTextViewerRender() {
+    if (textViewerFrame) {
+        return;
+    }
+    textViewerFrame = requestAnimationFrame(() => {
+        textViewerFrame = null;
+        renderTextViewer();
+    });
+}
+
+function textViewerJump(value) {
+    const line = parseInt(value, 10);
+    if (isNaN(line)) {
+        return;
+    }
+    const baseLine = textViewer.follow ? textViewer.follow.baseLine : 0;
+    const target = Math.min(Math.max(line - 1 - baseLine, 0), textViewer.totalLines);
+    const { body, maxFirst, scrollable } = textViewerLayout();
+    if (textViewer.totalLines * TEXT_VIEWER_LINE_HEIGHT <= TEXT_VIEWER_MAX_SCROLL_HEIGHT) {
+        body.scrollTop = target * TEXT_VIEWER_LINE_HEIGHT;
+    } else {
+        body.scrollTop = maxFirst > 0 ? Math.ceil(Math.min(target, maxFirst) / maxFirst * scrollable) : 0;
+    }
+    scheduleTextViewerRender();
+}
+
+function closeTextViewer() {
+    stopTextFollow();
+    document.getElementById('textViewerModal').classList.remove('show');
+    document.getElementById('textViewerLines').innerHTML = '';
+    textViewer = { path: '', totalLines: 0, pages: new Map(), loading: new Set(), firstLine: 0, follow: null };
+}
+
+// ==================== 实时跟随 ====================
+
+// 开始/停止跟随：跟随时只显示文件末尾和新追加的内容，停止后回到分页浏览并定位到最后一行
+function toggleTextFollow() {
+    if (textViewer.follow) {
+        stopTextFollow();
+        openTextViewer(textViewer.path, true);
+    } else {
+        startTextFollow();
+    }
+}
+
+function startTextFollow() {
+    const path = textViewer.path;
+    // 断线时 EventSource 自动重连，并通过 Last-Event-ID 从断开的位置继续
+    const source = new EventSource(`/api/follow?path=${encodeURIComponent(path)}`);
+    textViewer.follow = { source, lines: [], partial: '', baseLine: 0 };
+    textViewer.pages.clear();
+    setTextViewerTotal(0);
+    const info = document.getElementById('textViewerInfo');
+    const button = document.getElementById('textViewerFollow');
+    button.textContent = '停止跟随';
+    button.classList.add('btn-success');
+
+    source.addEventListener('start', (e) => {
+        const data = JSON.parse(e.data);
+        info.textContent = `${data.encoding.toUpperCase()} · 实时跟随中`;
+        if (!data.resumed) {
+            resetTextFollow(data.line || 0);
+        }
+    });
+    source.addEventListener('append', (e) => {
+        appendTextFollow(JSON.parse(e.data).text);
+    });
+    source.addEventListener('reset', () => {
+        info.textContent = '文件已被截断或轮转，从头开始跟随';
+        resetTextFollow(0);
+    });
+    source.addEventListener('missing', () => {
+        info.textContent = '文件已被删除或轮转，等待新文件…';
+    });
+    source.onerror = () => {
+        // 服务器拒绝（例如跟随的连接过多）时不再重连
+        if (source.readyState === EventSource.CLOSED && textViewer.follow && textViewer.follow.source === source) {
+            showAlert('实时跟随失败，请稍后重试', 'error');
+            toggleTextFollow();
+        }
+    };
+}
+
+function stopTextFollow() {
+    if (!textViewer.follow) {
+        return;
+    }
+    textViewer.follow.source.close();
+    textViewer.follow = null;
+    const button = document.getElementById('textViewerFollow');
+    button.textContent = '实时跟随';
+    button.classList.remove('btn-success');
+}
+
+function resetTextFollow(baseLine) {
+    const follow = textViewer.follow;
+    follow.lines = [];
+    follow.partial = '';
+    follow.baseLine = baseLine;
+    updateTextFollow(true);
+}
+
+// 追加新内容：按换行符拆分，最后一段不完整的行等待后续内容
+function appendTextFollow(text) {
+    const follow = textViewer.follow;
+    if (!follow) {
+        return;
+    }
+    const body = document.getElementById('textViewerBody');
+    const atBottom = body.scrollTop + body.clientHeight >= body.scrollHeight - TEXT_VIEWER_LINE_HEIGHT * 2;
+    const parts = (follow.partial + text).split('\n');
+    follow.partial = parts.pop();
+    for (const part of parts) {
+        follow.lines.push(part.endsWith('\r') ? part.slice(0, -1) : part);
+    }
+    const overflow = follow.lines.length - TEXT_FOLLOW_MAX_LINES;
+    if (overflow > 0) {
+        follow.lines.splice(0, overflow);
+        follow.baseLine += overflow;
+    }
+    updateTextFollow(atBottom);
+}
+
+function updateTextFollow(scrollToEnd) {
+    const follow = textViewer.follow;
+    setTextViewerTotal(follow.lines.length + (follow.partial ? 1 : 0));
+    document.getElementById('textViewerTotal').textContent = follow.baseLine + textViewer.totalLines;
+    document.getElementById('textViewerLine').max = Math.max(follow.baseLine + textViewer.totalLines, 1);
+    // 停留在底部时自动滚动到最新内容，向上翻看时不打扰
+    if (scrollToEnd) {
+        const body = document.getElementById('textViewerBody');
+        body.scrollTop = body.scrollHeight;
+    }
+    scheduleTextViewerRender();
+}
+
+document.addEventListener('keydown', (e) => {
+    if (e.key === 'Escape' && document.getElementById('textViewerModal').classList.contains('show')) {
+        closeTextViewer();
+    }
+});
+
 // ==================== 图像编辑功能 ====================
 
 let editorCanvas, editorCtx;
@@ -4844,4 +6176,5 @@ document.addEventListener('DOMContentLoaded', () => {
     loadTree();
     loadStats();
     loadServerInfo();
+    resumeJobTracking();
 });
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全文索引测试
+检查大文件分块索引（整个文件都可以搜索、追加内容后只写入新增的块）、超过大小上限时的标记，
+以及短词索引随文件修改和删除保持一致。
+
+用法:
+    python -m pytest tests
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import content_index  # noqa: E402
+
+CHUNK_SIZE = 4096
+
+
+def log_lines(start, count, marker=None):
+    lines = []
+    for i in range(start, start + count):
+        lines.append(f'2024-01-01 12:00:00 INFO request {i} handled\n')
+        if marker and i == start + count // 2:
+            lines.append(f'2024-01-01 12:00:00 ERROR {marker}\n')
+    return ''.join(lines)
+
+
+class ContentIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.upload_folder = os.path.join(self.folder, 'uploads')
+        os.makedirs(self.upload_folder)
+        self.index = self.open_index()
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def open_index(self, **kwargs):
+        kwargs.setdefault('chunk_size', CHUNK_SIZE)
+        return content_index.ContentIndex(os.path.join(self.folder, 'content.db'), self.upload_folder, **kwargs)
+
+    def write(self, name, text, mode='w'):
+        with open(os.path.join(self.upload_folder, name), mode, encoding='utf-8') as f:
+            f.write(text)
+        self.index.sync(name)
+
+    def paths(self, query):
+        return [result['path'] for result in self.index.search(query)]
+
+    def chunks(self, name):
+        return self.index._conn.execute(
+            'SELECT c.* FROM chunks c JOIN documents d ON d.id = c.doc_id WHERE d.path = ? ORDER BY c.offset',
+            (name,)).fetchall()
+
+    def test_large_file_searchable_past_first_chunk(self):
+        self.write('app.log', log_lines(0, 2000, marker='disk-full-on-volume') + 'tail 末尾 marker-at-end\n')
+        chunks = self.chunks('app.log')
+        self.assertGreater(len(chunks), 10)
+        # 块在行边界处切分，首尾相接覆盖整个文件
+        size = os.path.getsize(os.path.join(self.upload_folder, 'app.log'))
+        self.assertEqual(sum(c['length'] for c in chunks), size)
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertEqual(previous['offset'] + previous['length'], chunk['offset'])
+
+        self.assertEqual(self.paths('disk-full-on-volume'), ['app.log'])
+        self.assertEqual(self.paths('marker-at-end'), ['app.log'])
+        self.assertEqual(self.paths('末尾'), ['app.log'])
+        # 多个块都匹配时只返回一个结果，片段中标记了匹配的词
+        results = self.index.search('handled')
+        self.assertEqual(len(results), 1)
+        self.assertIn(f'{content_index.MARK_START}handled{content_index.MARK_END}', results[0]['snippet'])
+        self.assertNotIn('truncated', results[0])
+
+    def test_append_only_rewrites_new_chunks(self):
+        self.write('app.log', log_lines(0, 1000))
+        before = self.chunks('app.log')
+        self.write('app.log', log_lines(1000, 500, marker='appended-error'), mode='a')
+        after = self.chunks('app.log')
+        self.assertGreater(len(after), len(before))
+        # 除最后一块（追加前不满一块）以外，原来的块保留原来的索引
+        self.assertEqual([c['id'] for c in after[:len(before) - 1]], [c['id'] for c in before[:-1]])
+        self.assertEqual(self.paths('appended-error'), ['app.log'])
+        self.assertEqual(self.paths('request 999 handled'), ['app.log'])
+
+    def test_rewrite_and_shrink(self):
+        self.write('app.log', log_lines(0, 1000, marker='old-marker'))
+        self.write('app.log', 'short 新内容 new-marker\n')
+        self.assertEqual(len(self.chunks('app.log')), 1)
+        self.assertEqual(self.paths('old-marker'), [])
+        self.assertEqual(self.paths('new-marker'), ['app.log'])
+        self.assertEqual(self.paths('内容'), ['app.log'])
+        self.assertEqual(self.paths('旧'), [])
+        # 短词索引中被删除的块不再匹配
+        count = self.index._conn.execute('SELECT COUNT(*) FROM chunks').fetchone()[0]
+        self.assertEqual(count, 1)
+
+    def test_delete_file(self):
+        self.write('a.txt', log_lines(0, 500, marker='gone-marker') + '删除\n')
+        os.remove(os.path.join(self.upload_folder, 'a.txt'))
+        self.index.sync('a.txt')
+        self.assertEqual(self.paths('gone-marker'), [])
+        self.assertEqual(self.paths('删除'), [])
+        self.assertEqual(self.index._conn.execute('SELECT COUNT(*) FROM chunks').fetchone()[0], 0)
+
+    def test_long_line_split_at_character_boundary(self):
+        self.write('wide.txt', '中文' * 5000 + ' findme\n')
+        self.assertGreater(len(self.chunks('wide.txt')), 1)
+        self.assertEqual(self.paths('findme'), ['wide.txt'])
+        self.assertEqual(self.paths('中文'), ['wide.txt'])
+
+    def test_binary_file_skipped(self):
+        with open(os.path.join(self.upload_folder, 'data.txt'), 'wb') as f:
+            f.write(b'\0\1\2 binary-marker')
+        self.index.sync('data.txt')
+        self.assertEqual(self.paths('binary-marker'), [])
+
+    def test_truncated_file_marked(self):
+        self.index.close()
+        self.index = self.open_index(max_file_size=CHUNK_SIZE * 3)
+        self.write('big.log', 'early-marker\n' + log_lines(0, 1000, marker='late-marker'))
+        results = self.index.search('early-marker')
+        self.assertEqual([r['path'] for r in results], ['big.log'])
+        self.assertTrue(results[0]['truncated'])
+        self.assertEqual(self.paths('late-marker'), [])
+
+    def test_old_schema_rebuilt(self):
+        self.index.close()
+        os.remove(os.path.join(self.folder, 'content.db'))
+        import sqlite3
+        conn = sqlite3.connect(os.path.join(self.folder, 'content.db'))
+        conn.executescript("""
+            CREATE TABLE documents (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE,
+                                    size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL);
+            CREATE VIRTUAL TABLE content_fts USING fts5(body, tokenize='trigram');
+            CREATE TABLE index_state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            INSERT INTO documents VALUES (1, 'old.txt', 1, 1);
+            INSERT INTO content_fts (rowid, body) VALUES (1, 'stale body');
+            INSERT INTO index_state VALUES ('complete', '1');
+        """)
+        conn.commit()
+        conn.close()
+        self.index = self.open_index()
+        self.assertFalse(self.index.ready)
+        self.assertEqual(self.paths('stale body'), [])
+        self.write('new.txt', 'fresh body\n')
+        self.assertEqual(self.paths('fresh body'), ['new.txt'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件响应测试
+通过Flask测试客户端检查 http_utils.file_response 的范围请求（单范围、后缀范围、多范围、无法满足）
+和条件请求（If-None-Match、If-Modified-Since、If-Range、If-Match）以及HEAD请求。
+
+用法:
+    python -m pytest tests
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from email.parser import BytesParser
+from email.policy import HTTP
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, request  # noqa: E402
+from werkzeug.http import http_date  # noqa: E402
+from src import http_utils  # noqa: E402
+
+CONTENT = bytes(range(256)) * 40  # 10240 字节
+SIZE = len(CONTENT)
+
+
+def make_app(filepath):
+    app = Flask(__name__)
+
+    @app.route('/file', methods=['GET', 'HEAD'])
+    def serve():
+        return http_utils.file_response(request, filepath, mimetype='application/octet-stream')
+
+    return app
+
+
+class ParseRangesTest(unittest.TestCase):
+    """Range 头解析"""
+
+    def test_simple_and_open_ended(self):
+        self.assertEqual(http_utils.parse_ranges('bytes=0-99', SIZE), [(0, 99)])
+        self.assertEqual(http_utils.parse_ranges('bytes=10000-', SIZE), [(10000, SIZE - 1)])
+
+    def test_suffix_range(self):
+        self.assertEqual(http_utils.parse_ranges('bytes=-100', SIZE), [(SIZE - 100, SIZE - 1)])
+        # 后缀长度超过文件大小时返回整个文件
+        self.assertEqual(http_utils.parse_ranges('bytes=-99999', SIZE), [(0, SIZE - 1)])
+
+    def test_end_clamped_to_size(self):
+        self.assertEqual(http_utils.parse_ranges('bytes=10000-99999', SIZE), [(10000, SIZE - 1)])
+
+    def test_overlapping_and_adjacent_ranges_merged(self):
+        self.assertEqual(http_utils.parse_ranges('bytes=0-10,5-20,21-30,100-110', SIZE), [(0, 30), (100, 110)])
+
+    def test_unsatisfiable(self):
+        self.assertEqual(http_utils.parse_ranges(f'bytes={SIZE}-', SIZE), [])
+        self.assertEqual(http_utils.parse_ranges('bytes=-0', SIZE), [])
+
+    def test_invalid_header_ignored(self):
+        for header in (None, '', 'items=0-1', 'bytes=', 'bytes=abc', 'bytes=5-1', 'bytes=1-2-3'):
+            self.assertIsNone(http_utils.parse_ranges(header, SIZE), header)
+
+    def test_too_many_ranges_ignored(self):
+        header = 'bytes=' + ','.join(f'{i * 10}-{i * 10}' for i in range(http_utils.MAX_RANGES + 1))
+        self.assertIsNone(http_utils.parse_ranges(header, SIZE))
+
+
+class FileResponseTest(unittest.TestCase):
+    """通过测试客户端请求文件"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.folder, 'data.bin')
+        with open(self.filepath, 'wb') as f:
+            f.write(CONTENT)
+        self.client = make_app(self.filepath).test_client()
+        response = self.client.get('/file')
+        self.etag = response.headers['ETag']
+        self.last_modified = response.headers['Last-Modified']
+        response.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def get(self, headers=None, method='GET'):
+        response = self.client.open('/file', method=method, headers=headers or {})
+        body = response.get_data()
+        response.close()
+        return response, body
+
+    # ==================== 完整响应和HEAD ====================
+
+    def test_full_response(self):
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, CONTENT)
+        self.assertEqual(response.headers['Content-Length'], str(SIZE))
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertTrue(self.etag.startswith('"'))
+
+    def test_head(self):
+        response, body = self.get(method='HEAD')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, b'')
+        self.assertEqual(response.headers['Content-Length'], str(SIZE))
+        self.assertEqual(response.headers['ETag'], self.etag)
+
+    def test_head_ignores_range(self):
+        response, body = self.get({'Range': 'bytes=0-9'}, method='HEAD')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, b'')
+        self.assertEqual(response.headers['Content-Length'], str(SIZE))
+
+    # ==================== 范围请求 ====================
+
+    def test_single_range(self):
+        response, body = self.get({'Range': 'bytes=100-199'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, CONTENT[100:200])
+        self.assertEqual(response.headers['Content-Range'], f'bytes 100-199/{SIZE}')
+        self.assertEqual(response.headers['Content-Length'], '100')
+
+    def test_suffix_range(self):
+        response, body = self.get({'Range': 'bytes=-50'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, CONTENT[-50:])
+        self.assertEqual(response.headers['Content-Range'], f'bytes {SIZE - 50}-{SIZE - 1}/{SIZE}')
+
+    def test_end_clamped(self):
+        response, body = self.get({'Range': f'bytes={SIZE - 10}-{SIZE + 1000}'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, CONTENT[-10:])
+        self.assertEqual(response.headers['Content-Range'], f'bytes {SIZE - 10}-{SIZE - 1}/{SIZE}')
+
+    def test_range_covering_whole_file_returns_200(self):
+        response, body = self.get({'Range': 'bytes=0-'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, CONTENT)
+
+    def test_multiple_ranges(self):
+        response, body = self.get({'Range': 'bytes=0-9,-5,100-119'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.mimetype, 'multipart/byteranges')
+        self.assertEqual(response.headers['Content-Length'], str(len(body)))
+
+        boundary = response.mimetype_params['boundary']
+        message = BytesParser(policy=HTTP).parsebytes(
+            f'Content-Type: multipart/byteranges; boundary={boundary}\r\n\r\n'.encode('latin-1') + body)
+        parts = [(part['Content-Range'], part['Content-Type'], part.get_payload(decode=True))
+                 for part in message.iter_parts()]
+        self.assertEqual(parts, [
+            (f'bytes 0-9/{SIZE}', 'application/octet-stream', CONTENT[0:10]),
+            (f'bytes 100-119/{SIZE}', 'application/octet-stream', CONTENT[100:120]),
+            (f'bytes {SIZE - 5}-{SIZE - 1}/{SIZE}', 'application/octet-stream', CONTENT[-5:]),
+        ])
+
+    def test_unsatisfiable_range(self):
+        response, body = self.get({'Range': f'bytes={SIZE}-{SIZE + 10}'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['Content-Range'], f'bytes */{SIZE}')
+        self.assertEqual(body, b'')
+
+    def test_invalid_range_returns_full_file(self):
+        response, body = self.get({'Range': 'bytes=abc'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, CONTENT)
+
+    # ==================== 条件请求 ====================
+
+    def test_if_none_match(self):
+        response, body = self.get({'If-None-Match': self.etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(body, b'')
+        self.assertEqual(response.headers['ETag'], self.etag)
+
+    def test_if_none_match_weak_comparison(self):
+        response, _ = self.get({'If-None-Match': f'"other", W/{self.etag}'})
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_none_match_mismatch(self):
+        response, body = self.get({'If-None-Match': '"other"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, CONTENT)
+
+    def test_if_none_match_takes_precedence_over_if_modified_since(self):
+        response, _ = self.get({'If-None-Match': '"other"', 'If-Modified-Since': self.last_modified})
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_modified_since(self):
+        response, _ = self.get({'If-Modified-Since': self.last_modified})
+        self.assertEqual(response.status_code, 304)
+        response, body = self.get({'If-Modified-Since': http_date(0)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, CONTENT)
+
+    def test_head_not_modified(self):
+        response, _ = self.get({'If-None-Match': self.etag}, method='HEAD')
+        self.assertEqual(response.status_code, 304)
+
+    def test_modified_file_changes_etag(self):
+        with open(self.filepath, 'ab') as f:
+            f.write(b'more')
+        response, body = self.get({'If-None-Match': self.etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, CONTENT + b'more')
+        self.assertNotEqual(response.headers['ETag'], self.etag)
+
+    def test_if_range_matching(self):
+        response, body = self.get({'Range': 'bytes=0-9', 'If-Range': self.etag})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, CONTENT[:10])
+        response, _ = self.get({'Range': 'bytes=0-9', 'If-Range': self.last_modified})
+        self.assertEqual(response.status_code, 206)
+
+    def test_if_range_stale(self):
+        for validator in ('"stale"', f'W/{self.etag}', http_date(0)):
+            response, body = self.get({'Range': 'bytes=0-9', 'If-Range': validator})
+            self.assertEqual(response.status_code, 200, validator)
+            self.assertEqual(body, CONTENT)
+
+    def test_if_match(self):
+        response, _ = self.get({'If-Match': self.etag, 'Range': 'bytes=0-9'})
+        self.assertEqual(response.status_code, 206)
+        response, body = self.get({'If-Match': '"other"'})
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(body, b'')
+
+
+class EmptyFileTest(unittest.TestCase):
+    """空文件没有可以满足的范围"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        filepath = os.path.join(self.folder, 'empty.bin')
+        open(filepath, 'wb').close()
+        self.client = make_app(filepath).test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_empty_file(self):
+        response = self.client.get('/file')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(), b'')
+        self.assertEqual(response.headers['Content-Length'], '0')
+        response = self.client.get('/file', headers={'Range': 'bytes=0-'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['Content-Range'], 'bytes */0')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件名索引测试
+检查正则匹配方式拒绝会引起灾难性回溯的表达式，以及扫描超时后停止。
+
+用法:
+    python -m pytest tests
+"""
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import name_index  # noqa: E402
+
+
+def make_row(name):
+    return {'path': name, 'name': name, 'is_dir': 0, 'size': 1, 'mtime': 0, 'type': 'file',
+            'ext': os.path.splitext(name)[1], 'undo_id': None, 'original_path': None, 'hidden': 0}
+
+
+def make_index(names, **kwargs):
+    index = name_index.NameIndex(**kwargs)
+    index.apply([], [make_row(name) for name in names], reset=True)
+    deadline = time.monotonic() + 10
+    while not index.ready:
+        if time.monotonic() > deadline:
+            raise RuntimeError('文件名索引没有建立')
+        time.sleep(0.01)
+    return index
+
+
+class RegexGuardTest(unittest.TestCase):
+    """正则表达式结构检查"""
+
+    PATHOLOGICAL = (
+        r'(a|aa)*c',       # 有歧义的分支重复：每多一个字符耗时翻倍
+        r'(a+)+b',         # 嵌套重复
+        r'(x+x+)+y',
+        r'(\w+\s?)*$',
+        'a?' * 20 + 'a' * 20,
+        r'a*a*a*c',        # 多项式回溯
+        r'(a)\1',          # 反向引用
+        r'(?P<x>a)(?(x)b|c)',
+    )
+
+    ALLOWED = (
+        r'^img_?\d+\.jpe?g$',
+        r'.*foo.*bar.*',
+        r'(foo|bar)?\.txt',
+        r'^(?:report|summary)_\d{2,4}\.(pdf|docx?)$',
+        r'\d{4}-\d{2}-\d{2}',
+        r'(ab)+c',
+    )
+
+    def test_pathological_patterns_rejected(self):
+        for pattern in self.PATHOLOGICAL:
+            with self.assertRaises(ValueError, msg=pattern):
+                name_index.compile_query(pattern, 'regex')
+
+    def test_common_patterns_allowed(self):
+        for pattern in self.ALLOWED:
+            name_index.compile_query(pattern, 'regex')
+
+    def test_invalid_pattern(self):
+        with self.assertRaises(ValueError):
+            name_index.compile_query('(abc', 'regex')
+
+    def test_pathological_search_fails_fast(self):
+        index = make_index(['a' * 30, 'a' * 40 + '.txt', 'readme.md'])
+        started = time.monotonic()
+        with self.assertRaises(ValueError):
+            index.search(r'(a|aa)*c', mode='regex')
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_allowed_worst_case_is_bounded(self):
+        # 允许的表达式在最长的名称上最坏也只需要多项式时间
+        index = make_index(['a' * name_index.MAX_NAME_LENGTH])
+        started = time.monotonic()
+        self.assertEqual(index.search(r'.*a.*ac', mode='regex')['results'], [])
+        self.assertLess(time.monotonic() - started, 2)
+
+
+class RegexSearchTest(unittest.TestCase):
+    """正则扫描结果和超时"""
+
+    def test_results(self):
+        index = make_index(['IMG_001.jpg', 'img_2.jpeg', 'notes.txt', 'img_x.jpg'])
+        names = [r['name'] for r in index.search(r'^img_?\d+\.jpe?g$', mode='regex')['results']]
+        self.assertEqual(names, ['IMG_001.jpg', 'img_2.jpeg'])
+
+    def test_results_across_segments(self):
+        names = [f'file_{i:05d}.log' for i in range(5000)]
+        index = make_index(names)
+        results = list(index.iter_search(r'_0(0|4)9\d\d\.log$', mode='regex'))
+        expected = [name for name in names if name[6] in '04' and name[7] == '9']
+        self.assertEqual([r['name'] for r in results], expected)
+
+    def test_timeout(self):
+        names = ['a' * 200 + f'{i:05d}' for i in range(2000)]
+        index = make_index(names, regex_timeout=0.05)
+        with self.assertRaises(name_index.QueryTimeout):
+            index.search(r'a*a*c', mode='regex')
+        with self.assertRaises(name_index.QueryTimeout):
+            list(index.iter_search(r'a*a*c', mode='regex'))
+        # 不会回溯的查询不受影响
+        self.assertEqual(len(index.search('00042', mode='substring')['results']), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
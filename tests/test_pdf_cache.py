@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF单页缓存测试
+检查预渲染页码范围时只渲染缓存中缺少的连续段，以及按页请求和预渲染并发时同一页只渲染一次。
+渲染函数替换为写入假图片的函数，不需要 poppler。
+
+用法:
+    python -m pytest tests
+"""
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import pdf_cache  # noqa: E402
+
+DPI = 110
+
+
+class FakeConverter(pdf_cache.PdfConverter):
+    """记录每次渲染的页码范围，可以让渲染停在中途"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+        self.started = threading.Event()
+        self.proceed = threading.Event()
+        self.proceed.set()
+
+    def _render(self, pdf_path, first_page, last_page, dpi, fmt, output_folder):
+        with self._lock:
+            self.calls.append((first_page, last_page))
+        self.started.set()
+        self.proceed.wait()
+        paths = []
+        for page in range(first_page, last_page + 1):
+            path = os.path.join(output_folder, f'page-{page}.{fmt}')
+            with open(path, 'wb') as f:
+                f.write(f'page {page}'.encode())
+            paths.append(path)
+        return paths
+
+
+class RenderRangeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.pdf_path = os.path.join(self.folder, 'doc.pdf')
+        with open(self.pdf_path, 'wb') as f:
+            f.write(b'%PDF-1.4 fake')
+        self.converter = FakeConverter(os.path.join(self.folder, 'cache'), 64 * 1024 * 1024)
+
+    def tearDown(self):
+        self.converter.proceed.set()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def cached(self, page):
+        return self.converter.cache.get(self.converter.page_name(self.pdf_path, page, DPI))
+
+    def test_runs(self):
+        self.assertEqual(pdf_cache._runs([]), [])
+        self.assertEqual(pdf_cache._runs([1, 2, 3, 5, 7, 8]), [(1, 3), (5, 5), (7, 8)])
+
+    def test_only_missing_runs_rendered(self):
+        for page in (3, 4, 7):
+            self.converter.get_page(self.pdf_path, page, DPI)
+        self.converter.calls.clear()
+
+        rendered = self.converter.render_range(self.pdf_path, 1, 9, DPI)
+        self.assertEqual(rendered, [1, 2, 5, 6, 8, 9])
+        self.assertEqual(self.converter.calls, [(1, 2), (5, 6), (8, 9)])
+        for page in range(1, 10):
+            with open(self.cached(page), 'rb') as f:
+                self.assertEqual(f.read(), f'page {page}'.encode())
+
+        # 全部命中缓存时不再渲染
+        self.converter.calls.clear()
+        self.assertEqual(self.converter.render_range(self.pdf_path, 1, 9, DPI), [])
+        self.assertEqual(self.converter.calls, [])
+
+    def test_concurrent_requests_share_render(self):
+        converter = self.converter
+        converter.proceed.clear()
+        results = {}
+
+        def prerender():
+            results['range'] = converter.render_range(self.pdf_path, 1, 5, DPI)
+
+        def overlapping():
+            results['overlap'] = converter.render_range(self.pdf_path, 4, 8, DPI)
+
+        def single():
+            results['page'] = converter.get_page(self.pdf_path, 3, DPI)
+
+        first = threading.Thread(target=prerender)
+        first.start()
+        self.assertTrue(converter.started.wait(5))
+        others = [threading.Thread(target=overlapping), threading.Thread(target=single)]
+        for thread in others:
+            thread.start()
+        # 第一个请求还在渲染 1~5 页时，重叠的请求只渲染 6~8 页，单页请求等待
+        deadline = time.monotonic() + 5
+        while len(converter.calls) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        converter.proceed.set()
+        for thread in [first] + others:
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+
+        self.assertEqual(sorted(converter.calls), [(1, 5), (6, 8)])
+        self.assertEqual(results['range'], [1, 2, 3, 4, 5])
+        self.assertEqual(results['overlap'], [6, 7, 8])
+        self.assertEqual(results['page'][0], self.cached(3))
+        for page in range(1, 9):
+            self.assertTrue(self.cached(page))
+
+    def test_failed_render_releases_pages(self):
+        converter = self.converter
+        original = converter._render
+
+        def failing(*args):
+            raise RuntimeError('pdftoppm failed')
+
+        converter._render = failing
+        with self.assertRaises(RuntimeError):
+            converter.render_range(self.pdf_path, 1, 3, DPI)
+        # 失败后登记被释放，之后的请求重新渲染而不是一直等待
+        converter._render = original
+        self.assertEqual(converter.render_range(self.pdf_path, 1, 3, DPI), [1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本分页预览测试
+检查按行号、按字节范围读取和追加内容后的读取，以及文件在读取过程中被截断（copytruncate 轮转）时
+只返回较少的内容而不会使进程崩溃。
+
+用法:
+    python -m pytest tests
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import text_preview  # noqa: E402
+
+LINES = [f'{i} 第{i}行 ' + 'x' * (i % 300) for i in range(20000)]
+
+
+class TextPreviewTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'app.log')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(LINES) + '\n')
+        self.preview = text_preview.TextPreview()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_read_by_line(self):
+        for line in (0, 1, 9999, 19990):
+            page = self.preview.read(self.path, line=line, count=20)
+            self.assertEqual(page['line'], line)
+            self.assertEqual(page['lines'], LINES[line:line + 20])
+            self.assertEqual(page['total_lines'], len(LINES))
+
+    def test_read_by_offset(self):
+        data = ('\n'.join(LINES) + '\n').encode('utf-8')
+        line = 12345
+        offset = data.index(f'\n{line} '.encode('utf-8')) + 5
+        page = self.preview.read(self.path, offset=offset, length=1000)
+        # 从 offset 所在行的行首开始
+        self.assertEqual(page['line'], line)
+        self.assertEqual(page['lines'][0], LINES[line])
+        self.assertEqual(page['offset'], offset - 4)
+
+    def test_appended_lines(self):
+        self.preview.read(self.path, line=0, count=1)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('appended 追加\n')
+        page = self.preview.read(self.path, line=len(LINES), count=10)
+        self.assertEqual(page['lines'], ['appended 追加'])
+        self.assertTrue(page['eof'])
+
+    def test_truncated_while_reading(self):
+        self.preview.read(self.path, line=0, count=1)
+        stale = os.stat(self.path)
+        real_fstat = os.fstat
+
+        def truncate_after_fstat(fd):
+            # 在取得文件大小之后、读取内容之前截断文件
+            os.truncate(self.path, 100)
+            return stale if real_fstat(fd).st_ino == stale.st_ino else real_fstat(fd)
+
+        with mock.patch.object(text_preview.os, 'fstat', truncate_after_fstat):
+            page = self.preview.read(self.path, line=15000, count=50)
+        self.assertEqual(page['lines'], [])
+        with mock.patch.object(text_preview.os, 'fstat', truncate_after_fstat):
+            page = self.preview.read(self.path, offset=stale.st_size // 2, length=1000)
+        self.assertLessEqual(len(page['lines']), 1)
+
+        # 截断之后重新建立索引
+        page = self.preview.read(self.path, line=0, count=50)
+        self.assertEqual(page['size'], 100)
+        self.assertEqual(page['lines'][0], LINES[0])
+
+    def test_file_view(self):
+        with open(self.path, 'rb') as f:
+            data = f.read()
+            view = text_preview.FileView(f.fileno(), len(data))
+            self.assertEqual(view[10:20], data[10:20])
+            self.assertEqual(view[len(data) - 5:], data[-5:])
+            for start in (0, 1000, len(data) // 2, len(data) - 10):
+                self.assertEqual(view.find(b'\n', start, len(data)), data.find(b'\n', start))
+                self.assertEqual(view.rfind(b'\n', 0, start), data.rfind(b'\n', 0, start))
+            self.assertEqual(view.find('第19999行'.encode('utf-8'), 0, len(data)),
+                             data.find('第19999行'.encode('utf-8')))
+            self.assertEqual(view.find(b'missing', 0, len(data)), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()